@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import filecmp
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Optional
+from unittest import mock
+
+import pandas as pd
+import yaml
+
+from kg_converter.__version__ import __version__
+from kg_converter.download import download
+from kg_converter.transform_utils.kegg import ENGINES, KEGGTransform, loader
+from kg_converter.transform_utils.kegg.lookup import KEGGLookup
+from kg_converter.transform_utils.kegg.registry import GraphRegistry
+from kg_converter.utils import columnar_utils, download_utils, fetch_utils
+from kg_converter.utils.memory_utils import peak_rss
+from kg_converter.utils.mock_kegg_utils import KEGG_REST_URL, LocalKEGG, MockKEGGServer
+from kg_converter.utils.synthetic_utils import write_synthetic_kegg
+
+
+def measure(func: Callable[[], Any], repeat: int = 3) -> Dict[str, Any]:
+    """Time a function and record its peak memory.
+
+    Args:
+        func: Function to benchmark, called without arguments.
+        repeat: Number of timed calls.
+
+    Returns:
+        Dictionary with the timings in seconds, the peak traced allocation of one extra call
+        and the peak RSS of the process afterwards, in MiB.
+
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+
+    # Memory is traced on a separate call, tracemalloc slowing down the timed ones
+    tracemalloc.start()
+    try:
+        func()
+        peak_traced = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'seconds': seconds,
+        'min_seconds': min(seconds),
+        'median_seconds': statistics.median(seconds),
+        'peak_traced_mib': peak_traced / 2 ** 20,
+        'peak_rss_mib': peak_rss() / 2 ** 20
+    }
+
+
+def benchmark(output: str, scale: float = 0.01, seed: int = 0, repeat: int = 3,
+              data_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Benchmark the KEGG download parsers and transform on synthetic data and write the results as JSON.
+
+    Args:
+        output: JSON file to write the results to.
+        scale: Scale of the synthetic data, 1.0 being roughly a full KEGG release.
+        seed: Random seed of the synthetic data.
+        repeat: Number of timed calls per benchmark.
+        data_dir: Directory for the synthetic data and transform output, a temporary directory by default.
+
+    Returns:
+        The results written to the JSON file.
+
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_dir = data_dir or tmp_dir
+        raw_dir = os.path.join(base_dir, 'raw')
+        transformed_dir = os.path.join(base_dir, 'transformed')
+        rows = write_synthetic_kegg(raw_dir, scale=scale, seed=seed)
+        logging.info('Wrote synthetic KEGG data at scale {} to {}'.format(scale, raw_dir))
+
+        t = KEGGTransform(raw_dir, transformed_dir)
+        ko_table = pd.read_csv(t.full_ko, low_memory=False, sep='\t', usecols=['ENTRY', 'DEFINITION', 'DBLINKS'])
+        rn_table = pd.read_csv(t.full_rn, low_memory=False, sep='\t',
+                               usecols=['ENTRY', 'DEFINITION', 'EQUATION', 'DBLINKS'])
+        # post_data is timed on the largest link file, with the lookup built beforehand
+        lookup = KEGGLookup({'cpd': t.cpd_list, 'rn': t.rn_list}, {'rn': t.prune_columns(rn_table, 'rn')})
+
+        cases: Dict[str, Callable[[], Any]] = {}
+        for engine in ENGINES:
+            cases['KEGGTransform.run[{}]'.format(engine)] = KEGGTransform(raw_dir, transformed_dir, engine=engine).run
+        # post_data writes to its own directory, the graph files timed below being those of a full run
+        post_data_t = KEGGTransform(raw_dir, os.path.join(base_dir, 'post_data'))
+        cases['KEGGTransform.post_data'] = lambda: post_data_t.post_data(post_data_t.rn_cpd_link, GraphRegistry(),
+                                                                         lookup, 'w')
+        cases['KEGGTransform.prune_columns'] = lambda: t.prune_columns(ko_table, 'ko')
+        # Loading the 'kegg-*.tsv' tables for the lookup: pandas.read_csv against the typed loader, whose
+        # buffers come from the Arrow memory pool and are only seen in peak_rss_mib, not tracemalloc
+        _, desc_tables, _ = t.input_tables()
+        cases['load kegg tables[pandas]'] = lambda: [pd.read_csv(table, low_memory=False, sep='\t', usecols=usecols)
+                                                     for table, usecols, _ in desc_tables.values()]
+        if loader.available():
+            cases['load kegg tables[pyarrow]'] = lambda: [loader.read_descriptions(table, type)
+                                                          for table, _, type in desc_tables.values()]
+        # Loading the transform output: parsing the TSV files against reading columnar copies
+        graph_files = [t.output_node_file, t.output_edge_file]
+        cases['load graph[tsv]'] = lambda: [pd.read_csv(f, sep='\t', dtype=str, keep_default_na=False)
+                                            for f in graph_files]
+        for output_format in ['parquet', 'arrow']:
+            cases['write_columnar[{}]'.format(output_format)] = \
+                lambda output_format=output_format: columnar_utils.write_columnar(
+                    *graph_files, t.node_header, t.edge_header, output_format)
+            cases['load graph[{}]'.format(output_format)] = \
+                lambda output_format=output_format: [columnar_utils.read_graph_table(
+                    columnar_utils.columnar_file(f, output_format)) for f in graph_files]
+
+        local_kegg = LocalKEGG(raw_dir, scale, seed)
+        cases['parse_response'] = lambda: download_utils.parse_response(KEGG_REST_URL + 'list/cpd')
+        cases['stream_response'] = lambda: download_utils.stream_response(KEGG_REST_URL + 'list/cpd',
+                                                                          os.path.join(tmp_dir, 'stream_response.tsv'))
+        # No rate limit, to time the fetch and parse machinery alone
+        cases['parse_response_get'] = lambda: download_utils.parse_response_get(KEGG_REST_URL + 'get/', raw_dir, 'ko',
+                                                                                rate=float('inf'))
+
+        results = {}
+        with mock.patch.object(download_utils.urllib3, 'PoolManager', return_value=local_kegg):
+            for name, func in cases.items():
+                logging.info('Benchmarking {}'.format(name))
+                results[name] = measure(func, repeat)
+
+    return write_report(output, scale, seed, repeat, rows, results)
+
+
+def write_report(output: str, scale: float, seed: int, repeat: int, rows: Dict[str, int],
+                 results: Dict[str, Any]) -> Dict[str, Any]:
+    """Write benchmark results as JSON, along with the versions and platform they were measured on.
+
+    Returns:
+        The report written.
+
+    """
+    report = {
+        'version': __version__,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'scale': scale,
+        'seed': seed,
+        'repeat': repeat,
+        'rows': rows,
+        'benchmarks': results
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    return report
+
+
+def benchmark_download(output: str, scale: float = 0.01, seed: int = 0, repeat: int = 3,
+                       yaml_file: str = 'download.yaml', jobs: int = download_utils.DEFAULT_JOBS,
+                       concurrency: int = fetch_utils.DEFAULT_CONCURRENCY, rate: float = math.inf,
+                       latency: float = 0.0, rate_limit: float = math.inf, truncate: float = 0.0) -> Dict[str, Any]:
+    """Benchmark end-to-end downloads of a download.yaml against a local mock KEGG server, and write the
+    throughput as JSON.
+
+    The KEGG items of the download.yaml are pointed at a MockKEGGServer serving synthetic data, and
+    downloaded into a new directory on each run. The downloaded files are compared with the served data.
+
+    Args:
+        output: JSON file to write the results to.
+        scale: Scale of the synthetic data, 1.0 being roughly a full KEGG release.
+        seed: Random seed of the synthetic data.
+        repeat: Number of timed downloads.
+        yaml_file: download.yaml to take the KEGG items from.
+        jobs: Number of files downloaded at once.
+        concurrency: Number of KEGG 'GET' requests in flight.
+        rate: Maximum number of requests per second of the client.
+        latency: Seconds the server waits before answering each request.
+        rate_limit: Requests per second over which the server answers 403.
+        truncate: Fraction of the responses the server cuts short.
+
+    Returns:
+        The results written to the JSON file.
+
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw_dir = os.path.join(tmp_dir, 'corpus')
+        rows = write_synthetic_kegg(raw_dir, scale=scale, seed=seed)
+
+        with open(yaml_file) as f:
+            items = [item for item in yaml.safe_load(f) if item.get('url', '').startswith(KEGG_REST_URL)]
+
+        runs = []
+        with MockKEGGServer(LocalKEGG(raw_dir, scale, seed), latency=latency, rate_limit=rate_limit,
+                            truncate=truncate, seed=seed) as server:
+            local_yaml = os.path.join(tmp_dir, 'download.yaml')
+            with open(local_yaml, 'w') as f:
+                yaml.safe_dump([dict(item, url=item['url'].replace(KEGG_REST_URL, server.url)) for item in items], f)
+
+            for i in range(repeat):
+                output_dir = os.path.join(tmp_dir, 'run{}'.format(i))
+                before = dict(server.stats)
+                start = time.perf_counter()
+                download(local_yaml, output_dir, concurrency=concurrency, rate=rate, jobs=jobs)
+                seconds = time.perf_counter() - start
+                run = {k: v - before[k] for k, v in server.stats.items()}
+                run['seconds'] = seconds
+                run['verified'] = all(filecmp.cmp(os.path.join(raw_dir, fn), os.path.join(output_dir, fn),
+                                                  shallow=False) for fn in os.listdir(output_dir))
+                runs.append(run)
+                logging.info('Download {}: {:.2f} s, {} requests'.format(i, seconds, run['requests']))
+
+    # Entries fetched with 'get', one row each in the kegg-*.tsv tables
+    entries = sum(n for fn, n in rows.items() if fn.startswith('kegg-'))
+    seconds = statistics.median(run['seconds'] for run in runs)
+    results = {'download': {
+        'runs': runs,
+        'median_seconds': seconds,
+        'requests_per_second': statistics.median(run['requests'] / run['seconds'] for run in runs),
+        'entries_per_second': entries / seconds,
+        'mib_per_second': statistics.median(run['bytes'] / run['seconds'] for run in runs) / 2 ** 20,
+        'verified': all(run['verified'] for run in runs),
+        'peak_rss_mib': peak_rss() / 2 ** 20,
+        'jobs': jobs,
+        'concurrency': concurrency,
+        # null for no limit
+        'rate': rate if math.isfinite(rate) else None,
+        'latency': latency,
+        'rate_limit': rate_limit if math.isfinite(rate_limit) else None,
+        'truncate': truncate
+    }}
+    return write_report(output, scale, seed, repeat, rows, results)
@@ -3,19 +3,27 @@
 
 
 from .utils import download_from_yaml
+from .utils.download_utils import DEFAULT_JOBS
+from .utils.fetch_utils import DEFAULT_CONCURRENCY, KEGG_RATE
 
 
-def download(yaml_file: str, output_dir: str, ignore_cache: bool = False) -> None:
+def download(yaml_file: str, output_dir: str, ignore_cache: bool = False,
+             concurrency: int = DEFAULT_CONCURRENCY, rate: float = KEGG_RATE, jobs: int = DEFAULT_JOBS,
+             sync: bool = False) -> None:
     """Downloads data files from list of URLs (default: download.yaml) into data directory (default: data/).
 
     :param yaml_file: A string pointing to the yaml file utilized to facilitate the downloading of data.
     :param output_dir: A string pointing to the location to download data to.
     :param ignore_cache: Ignore cache and download files even if they exist [false]
+    :param concurrency: Number of KEGG 'GET' requests in flight [3]
+    :param rate: Maximum number of KEGG requests per second, across all downloads [3]
+    :param jobs: Number of files downloaded at once [4]
+    :param sync: Update cached files (KEGG ones to the current KEGG release), downloading only what changed [false]
 
     :return: sNone.
     """
 
     download_from_yaml(yaml_file=yaml_file, output_dir=output_dir,
-                       ignore_cache=ignore_cache)
+                       ignore_cache=ignore_cache, concurrency=concurrency, rate=rate, jobs=jobs, sync=sync)
 
     return None
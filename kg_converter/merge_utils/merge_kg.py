@@ -6,6 +6,8 @@ import yaml
 import networkx as nx
 from kgx.cli.cli_utils import merge
 
+from kg_converter.utils import profile_utils
+
 
 def parse_load_config(yaml_file: str) -> Dict:
     """Parse load config YAML.
@@ -33,5 +35,8 @@ def load_and_merge(yaml_file: str, processes: int = 1) -> nx.MultiDiGraph:
         networkx.MultiDiGraph: The merged graph.
 
     """
-    merged_graph = merge(yaml_file, processes=processes)
+    with profile_utils.stage('merge') as stage:
+        merged_graph = merge(yaml_file, processes=processes)
+        if merged_graph is not None:
+            stage.rows_out += merged_graph.number_of_nodes() + merged_graph.number_of_edges()
     return merged_graph
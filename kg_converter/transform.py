@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import logging
-from typing import List
+from typing import List, Optional
 
 
 from kg_converter.transform_utils.ontology import OntologyTransform
@@ -15,7 +15,10 @@ DATA_SOURCES = {
 }
 
 
-def transform(input_dir: str, output_dir: str, sources: List[str] = None) -> None:
+def transform(input_dir: str, output_dir: str, sources: List[str] = None, engine: str = 'row',
+              workers: int = 1, chunk_size: int = 50000, memory_budget: Optional[int] = None,
+              compress: bool = False, incremental: bool = False, output_format: str = 'tsv',
+              dedup: str = 'interned') -> None:
     """Call scripts in kg_converter/transform/[source name]/ to transform each source into a graph format that
     KGX can ingest directly, in either TSV or JSON format:
     https://github.com/NCATS-Tangerine/kgx/blob/master/data-preparation.md
@@ -24,6 +27,14 @@ def transform(input_dir: str, output_dir: str, sources: List[str] = None) -> Non
         input_dir: A string pointing to the directory to import data from.
         output_dir: A string pointing to the directory to output data to.
         sources: A list of sources to transform.
+        engine: Engine used by KEGGTransform, 'row' (line by line) or 'vectorized' (whole tables).
+        workers: Number of processes used by KEGGTransform.
+        chunk_size: Rows per chunk read by the 'streaming' engine.
+        memory_budget: Peak RSS (MiB) targeted by the 'streaming' engine, None for no limit.
+        compress: Write gzip-compressed nodes.tsv.gz and edges.tsv.gz.
+        incremental: Skip unchanged inputs, recomputing only the link files changed since the previous run.
+        output_format: Also write the nodes and edges as 'parquet' or 'arrow' tables, or only as 'tsv'.
+        dedup: Dedup backend of KEGGTransform, 'interned', 'hash', 'external' or 'bloom'.
 
     Returns:
         None.
@@ -36,8 +47,12 @@ def transform(input_dir: str, output_dir: str, sources: List[str] = None) -> Non
     for source in sources:
         if source in DATA_SOURCES:
             logging.info(f"Parsing {source}")
-            t = DATA_SOURCES[source](input_dir, output_dir)
             if source in ONTOLOGIES.keys():
+                t = DATA_SOURCES[source](input_dir, output_dir)
                 t.run(ONTOLOGIES[source])
             else:
+                t = DATA_SOURCES[source](input_dir, output_dir, engine=engine, workers=workers,
+                                         chunk_size=chunk_size, memory_budget=memory_budget,
+                                         compress=compress, incremental=incremental,
+                                         output_format=output_format, dedup=dedup)
                 t.run()
@@ -6,6 +6,7 @@ import os
 from typing import Optional
 
 from kg_converter.transform_utils.transform import Transform
+from kg_converter.utils.transform_utils import NodeEdgeWriter
 
 """
 Example script to transform downloaded data into a graph format that KGX can ingest directly, in either TSV or JSON 
@@ -35,18 +36,15 @@ class YourTransform(Transform):
         os.makedirs(self.output_dir, exist_ok=True)
 
         # transform data, something like:
+        # NodeEdgeWriter writes the headers (change default node/edge headers if necessary)
         with open(input_file, 'r') as f, \
-                open(self.output_node_file, 'w') as node, \
-                open(self.output_edge_file, 'w') as edge:
-
-            # write headers (change default node/edge headers if necessary
-            node.write("\t".join(self.node_header) + "\n")
-            edge.write("\t".join(self.edge_header) + "\n")
+                NodeEdgeWriter(self.output_node_file, self.node_header) as node, \
+                NodeEdgeWriter(self.output_edge_file, self.edge_header) as edge:
 
             # transform data, something like:
             for line in f:
                 pass
-                # transform line into nodes and edges
+                # transform line into nodes and edges, one list of values per row
                 # node.write(this_node1)
                 # node.write(this_node2)
                 # edge.write(this_edge)
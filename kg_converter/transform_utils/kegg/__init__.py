@@ -1,5 +1,6 @@
-from .kegg import KEGGTransform
+from .kegg import KEGGTransform, ENGINES
+from .dedup import DEDUP_BACKENDS
 
 __all__ = [
-    "KEGGTransform"
-]
\ No newline at end of file
+    "KEGGTransform", "ENGINES", "DEDUP_BACKENDS"
+]
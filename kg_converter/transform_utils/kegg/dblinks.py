@@ -0,0 +1,56 @@
+import re
+from typing import Dict, Optional
+
+import pandas as pd
+
+"""
+Normalisation of the DBLINKS field of KEGG entries into CURIEs.
+
+KEGG writes DBLINKS as 'LABEL: id id | LABEL: id', for example
+'RN: R00200 R00430 | GO: 0004743'. Every id becomes a CURIE using the prefix
+mapped to its label, giving 'KEGG.REACTION:R00200|KEGG.REACTION:R00430|GO:0004743'.
+Labels missing from the table keep their KEGG spelling as prefix.
+"""
+
+# KEGG DB label -> CURIE prefix
+DBLINK_PREFIXES = {
+    'RN': 'KEGG.REACTION',
+    'COG': 'COG',
+    'GO': 'GO',
+    'TC': 'tcdb',
+    'CAZy': 'cazy',
+    'UniProt': 'uniprot',
+    'RHEA': 'RHEA',
+    'CAS': 'CAS',
+    'PubChem': 'PUBCHEM.SUBSTANCE',
+    'ChEBI': 'CHEBI'
+}
+
+# One 'LABEL: id id' segment of a DBLINKS value
+SEGMENT = re.compile(r'\s*([^|:]+):([^|]*)')
+
+
+class DBLinksNormalizer:
+
+    def __init__(self, prefixes: Optional[Dict[str, str]] = None) -> None:
+        '''
+        :param prefixes: KEGG DB label -> CURIE prefix, DBLINK_PREFIXES by default.
+        '''
+        self.prefixes = DBLINK_PREFIXES if prefixes is None else prefixes
+
+    def expand(self, match) -> str:
+        '''
+        CURIEs of one DBLINKS segment, pipe-delimited.
+        '''
+        label = match.group(1).strip()
+        prefix = self.prefixes.get(label, label)
+        return '|'.join(prefix + ':' + x for x in match.group(2).split())
+
+    def __call__(self, dblinks: pd.Series) -> pd.Series:
+        '''
+        Rewrite a whole DBLINKS column in one pass of the compiled segment regex.
+
+        :param dblinks: DBLINKS values, NaN where missing.
+        :return: Pipe-delimited CURIEs, NaN where missing.
+        '''
+        return dblinks.str.replace(SEGMENT, self.expand, regex=True)
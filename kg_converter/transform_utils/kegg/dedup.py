@@ -0,0 +1,453 @@
+import abc
+import gzip
+import heapq
+import math
+import os
+import shutil
+import tempfile
+from hashlib import blake2b
+from itertools import islice
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+"""
+Key sets deduplicating the nodes and edges of the GraphRegistry at scale.
+
+    interned  Node CURIEs interned to integers, edges as packed pairs of them
+              (kept by GraphRegistry itself, exact, the default)
+    hash      Exact in-memory set of 64-bit hashes of the keys, in a numpy
+              open addressing table: no CURIE string is kept, 16 to 32 bytes
+              a key, but memory still grows with the keys
+    external  Nothing in memory: every row is written, and the duplicates are
+              found afterwards by an external sort of the (hash, row) pairs of
+              the output file in bounded runs, then dropped from it
+    bloom     Bloom filter sized for the expected number of keys: keys it has
+              not seen are new for sure, the others are written as candidates,
+              spilled to disk, and checked by an external sort restricted to
+              the rows of the output file whose hash is a candidate
+
+Deferred key sets (external, bloom) cannot tell whether a key is new when it
+is added. GraphRegistry.finish drops the duplicates they find from the output
+files, keeping first occurrences, so every backend gives the same output as
+long as two keys do not share a 64-bit hash.
+
+Keys are hashed, and sorted runs read back, in blocks of BLOCK_SIZE, and the
+merge of the runs buffers MERGE_SIZE items in all, so the memory used by the
+deferred key sets does not grow with the number of rows.
+"""
+
+DEDUP_BACKENDS = ['interned', 'hash', 'external', 'bloom']
+
+# Keys hashed at once
+BLOCK_SIZE = 1 << 16
+# (hash, row) pairs per sorted run of the external sort: 32 MiB on disk, about three times that while sorted
+RUN_SIZE = 1 << 21
+# Run items buffered in memory while merging, across all runs
+MERGE_SIZE = 1 << 16
+# Keys the Bloom filter is sized for when the input size is unknown, and its false positive rate at its size
+BLOOM_CAPACITY = 1 << 24
+BLOOM_ERROR_RATE = 0.01
+# Keys the hash table of HashSet is sized for when the input size is unknown, and the share of its slots
+# in use above which it doubles
+HASH_CAPACITY = 1 << 10
+HASH_LOAD_FACTOR = 0.5
+
+
+def key_digest(key: str) -> Tuple[int, int]:
+    '''
+    Two independent 64-bit hashes of a key, stable across runs and processes.
+    '''
+    digest = blake2b(key.encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+
+
+def key_hash(key: str) -> int:
+    '''
+    64-bit hash of a key, the first of key_digest.
+    '''
+    return key_digest(key)[0]
+
+
+def hash_blocks(keys: Iterable[str]) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    '''
+    Hashes of keys streamed block by block, without holding the keys.
+
+    :param keys: Key of each row, in order.
+    :return: Iterator over (hashes, row numbers) arrays of BLOCK_SIZE rows at most.
+    '''
+    keys = iter(keys)
+    row = 0
+    while True:
+        hashes = np.fromiter(map(key_hash, islice(keys, BLOCK_SIZE)), dtype=np.uint64)
+        if not len(hashes):
+            return
+        yield hashes, np.arange(row, row + len(hashes), dtype=np.uint64)
+        row += len(hashes)
+
+
+class RunFiles:
+
+    def __init__(self, tmp_dir: str, name: str, merge_size: int = MERGE_SIZE) -> None:
+        '''
+        Sorted runs of uint64 arrays (1D, or 2D sorted by row) spilled to disk.
+
+        :param tmp_dir: Directory of the runs.
+        :param name: Prefix of the run files.
+        :param merge_size: Run items buffered in memory by merge(), across all runs.
+        '''
+        self.tmp_dir = tmp_dir
+        self.name = name
+        self.merge_size = max(1, merge_size)
+        self.files: List[str] = []
+        self.size = 0
+
+    def save(self, array: np.ndarray) -> None:
+        file = os.path.join(self.tmp_dir, '{}{}.npy'.format(self.name, len(self.files)))
+        np.save(file, np.asarray(array, dtype=np.uint64))
+        self.files.append(file)
+        self.size += len(array)
+
+    def merge(self) -> Iterator:
+        '''
+        Items of all runs (ints, or tuples for 2D runs) in sorted order.
+        '''
+        block_size = max(1, self.merge_size // max(1, len(self.files)))
+        return heapq.merge(*(read_run(file, block_size) for file in self.files))
+
+
+def read_run(file: str, block_size: int) -> Iterator:
+    '''
+    Items of a run file, read back memory-mapped block by block.
+    '''
+    data = np.load(file, mmap_mode='r')
+    for start in range(0, len(data), block_size):
+        block = data[start:start + block_size].tolist()
+        yield from (map(tuple, block) if data.ndim > 1 else block)
+
+
+def sorted_duplicates(blocks: Iterable[Tuple[np.ndarray, np.ndarray]], tmp_dir: str, run_size: int = RUN_SIZE,
+                      merge_size: int = MERGE_SIZE) -> Iterator[int]:
+    '''
+    Rows repeating the hash of an earlier row, by external sort.
+
+    :param blocks: (hashes, row numbers) arrays, rows ascending across blocks.
+    :param tmp_dir: Directory of the sorted runs.
+    :param run_size: Number of (hash, row) pairs sorted in memory at once.
+    :param merge_size: Run items buffered in memory while merging.
+    :return: Iterator over the duplicate row numbers, ascending.
+    '''
+    # Sorted runs of (hash, row), the first row of each hash coming first
+    runs = RunFiles(tmp_dir, 'pairs', merge_size)
+    parts: List[Tuple[np.ndarray, np.ndarray]] = []
+    size = 0
+    for hashes, rows in blocks:
+        parts.append((hashes, rows))
+        size += len(hashes)
+        if size >= run_size:
+            runs.save(sorted_run(parts))
+            parts, size = [], 0
+    if size:
+        runs.save(sorted_run(parts))
+    del parts
+
+    # Every row but the first of each hash is a duplicate, spilled in runs sorted by row
+    dup_runs = RunFiles(tmp_dir, 'dups', merge_size)
+    buffer = np.empty(min(run_size, max(1, runs.size)), dtype=np.uint64)
+    n, previous = 0, None
+    for h, row in runs.merge():
+        if h == previous:
+            buffer[n] = row
+            n += 1
+            if n == len(buffer):
+                dup_runs.save(np.sort(buffer))
+                n = 0
+        previous = h
+    if n:
+        dup_runs.save(np.sort(buffer[:n]))
+    del buffer
+    yield from dup_runs.merge()
+
+
+def sorted_run(parts: List[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+    '''
+    (hash, row) pairs of blocks sorted by hash, then row.
+    '''
+    hashes = np.concatenate([hashes for hashes, _ in parts])
+    rows = np.concatenate([rows for _, rows in parts])
+    # Rows are ascending, a stable sort keeps them so within a hash
+    order = np.argsort(hashes, kind='stable')
+    run = np.empty((len(order), 2), dtype=np.uint64)
+    run[:, 0] = hashes[order]
+    run[:, 1] = rows[order]
+    return run
+
+
+class KeySet(abc.ABC):
+
+    # Whether add() only defers the decision to duplicates()
+    deferred = False
+
+    @abc.abstractmethod
+    def add(self, key: str) -> bool:
+        '''
+        Register a key.
+
+        :param key: Node CURIE, or subject and object CURIEs joined by a tab.
+        :return: True if the key is new, or may be for a deferred set.
+        '''
+
+    def duplicates(self, keys: Iterable[str]) -> Iterator[int]:
+        '''
+        Rows of a deferred set's output that repeat an earlier row.
+
+        :param keys: Key of each row of the output, in order.
+        :return: Iterator over the duplicate row numbers, ascending.
+        '''
+        return iter(())
+
+
+class HashSet(KeySet):
+
+    def __init__(self, capacity: int = HASH_CAPACITY) -> None:
+        '''
+        :param capacity: Number of keys the table is sized for, it doubles when they are exceeded.
+        '''
+        size = 1 << max(3, math.ceil(math.log2(max(1, capacity) / HASH_LOAD_FACTOR)))
+        # Hashes by slot, linear probing from their low bits, 0 for an empty slot
+        self.table = np.zeros(size, dtype=np.uint64)
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, key: str) -> bool:
+        # 0 marks empty slots, the hashes are only compared to one another
+        return self.insert(key_hash(key) or 1)
+
+    def insert(self, h: int) -> bool:
+        '''
+        Add a non-zero hash to the table.
+
+        :param h: 64-bit hash.
+        :return: True if the hash is new.
+        '''
+        table = self.table
+        mask = len(table) - 1
+        i = h & mask
+        while True:
+            slot = int(table[i])
+            if slot == h:
+                return False
+            if slot == 0:
+                break
+            i = (i + 1) & mask
+        table[i] = h
+        self.count += 1
+        if self.count > HASH_LOAD_FACTOR * len(table):
+            self.grow()
+        return True
+
+    def grow(self) -> None:
+        '''
+        Double the table, inserting the hashes again.
+        '''
+        hashes = self.table[self.table != 0]
+        self.table = np.zeros(2 * len(self.table), dtype=np.uint64)
+        self.count = 0
+        for h in hashes.tolist():
+            self.insert(h)
+
+
+class ExternalSortSet(KeySet):
+
+    deferred = True
+
+    def __init__(self, tmp_dir: Optional[str] = None, run_size: int = RUN_SIZE,
+                 merge_size: int = MERGE_SIZE) -> None:
+        '''
+        :param tmp_dir: Directory of the sorted runs, the system temporary directory by default.
+        :param run_size: Number of (hash, row) pairs sorted in memory at once.
+        :param merge_size: Run items buffered in memory while merging.
+        '''
+        self.tmp_dir = tmp_dir
+        self.run_size = max(1, run_size)
+        self.merge_size = merge_size
+
+    def add(self, key: str) -> bool:
+        return True
+
+    def duplicates(self, keys: Iterable[str]) -> Iterator[int]:
+        with tempfile.TemporaryDirectory(dir=self.tmp_dir) as tmp_dir:
+            yield from sorted_duplicates(hash_blocks(keys), tmp_dir, self.run_size, self.merge_size)
+
+
+class BloomSet(KeySet):
+
+    deferred = True
+
+    def __init__(self, capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE,
+                 tmp_dir: Optional[str] = None, run_size: int = RUN_SIZE, merge_size: int = MERGE_SIZE) -> None:
+        '''
+        :param capacity: Number of keys the filter is sized for, the false positive rate rising beyond it.
+        :param error_rate: False positive rate at capacity.
+        :param tmp_dir: Directory of the spilled candidates, the system temporary directory by default.
+        :param run_size: Number of (hash, row) pairs sorted in memory at once by the verification pass.
+        :param merge_size: Run items buffered in memory while merging.
+        '''
+        self.size = max(8, math.ceil(-max(1, capacity) * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / max(1, capacity) * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.tmp_dir = tmp_dir
+        self.run_size = max(1, run_size)
+        self.merge_size = merge_size
+        # 64-bit hashes of the keys the filter may have seen before, spilled to disk by blocks
+        self.buffer: List[int] = []
+        self.spill_dir: Optional[str] = None
+        self.candidates: Optional[RunFiles] = None
+
+    def add(self, key: str) -> bool:
+        h1, h2 = key_digest(key)
+        positions = [(h1 + i * (h2 | 1)) % self.size for i in range(self.hash_count)]
+        if all(self.bits[p >> 3] & (1 << (p & 7)) for p in positions):
+            self.buffer.append(h1)
+            if len(self.buffer) >= BLOCK_SIZE:
+                self.spill()
+        else:
+            for p in positions:
+                self.bits[p >> 3] |= 1 << (p & 7)
+        return True
+
+    def spill(self) -> None:
+        '''
+        Write the buffered candidate hashes to a sorted run.
+        '''
+        if self.candidates is None:
+            self.spill_dir = tempfile.mkdtemp(dir=self.tmp_dir)
+            self.candidates = RunFiles(self.spill_dir, 'candidates', self.merge_size)
+        self.candidates.save(np.unique(np.array(self.buffer, dtype=np.uint64)))
+        self.buffer = []
+
+    def duplicates(self, keys: Iterable[str]) -> Iterator[int]:
+        # Keys never reported by the filter occur once, the rows of the candidates are checked exactly
+        if self.buffer:
+            self.spill()
+        if self.candidates is None:
+            return
+        try:
+            candidates = self.merge_candidates()
+            yield from sorted_duplicates(self.candidate_blocks(keys, candidates), self.spill_dir,
+                                         self.run_size, self.merge_size)
+        finally:
+            shutil.rmtree(self.spill_dir)
+            self.spill_dir, self.candidates = None, None
+
+    def merge_candidates(self) -> np.ndarray:
+        '''
+        Merge the candidate runs into one memory-mapped array of unique sorted hashes.
+        '''
+        file = os.path.join(self.spill_dir, 'merged_candidates.npy')
+        merged = np.lib.format.open_memmap(file, mode='w+', dtype=np.uint64, shape=(self.candidates.size,))
+        n, previous = 0, None
+        hashes = self.candidates.merge()
+        while True:
+            block = np.fromiter(islice(hashes, BLOCK_SIZE), dtype=np.uint64)
+            if not len(block):
+                break
+            # Runs are unique, a hash found in several of them comes out several times in a row
+            keep = np.empty(len(block), dtype=bool)
+            keep[0] = previous is None or block[0] != previous
+            keep[1:] = block[1:] != block[:-1]
+            block = block[keep]
+            merged[n:n + len(block)] = block
+            n += len(block)
+            previous = block[-1] if len(block) else previous
+        merged.flush()
+        return merged[:n]
+
+    @staticmethod
+    def candidate_blocks(keys: Iterable[str], candidates: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        '''
+        The (hashes, row numbers) blocks of the keys, restricted to the candidate hashes.
+        '''
+        for hashes, rows in hash_blocks(keys):
+            i = np.minimum(np.searchsorted(candidates, hashes), len(candidates) - 1)
+            found = candidates[i] == hashes
+            yield hashes[found], rows[found]
+
+
+def key_set(backend: str, tmp_dir: Optional[str] = None, capacity: Optional[int] = None) -> Optional[KeySet]:
+    '''
+    Key set of a dedup backend.
+
+    :param backend: One of DEDUP_BACKENDS.
+    :param tmp_dir: Directory for the temporary files of the external and bloom backends.
+    :param capacity: Expected number of keys, to size the Bloom filter and hash table, BLOOM_CAPACITY and
+        HASH_CAPACITY by default.
+    :return: KeySet, None for 'interned', which GraphRegistry implements itself.
+    '''
+    if backend not in DEDUP_BACKENDS:
+        raise ValueError('Unknown dedup backend {}, expected one of {}'.format(backend, DEDUP_BACKENDS))
+    if backend == 'hash':
+        return HashSet(capacity or HASH_CAPACITY)
+    if backend == 'external':
+        return ExternalSortSet(tmp_dir)
+    if backend == 'bloom':
+        return BloomSet(capacity or BLOOM_CAPACITY, tmp_dir=tmp_dir)
+    return None
+
+
+def count_rows(files: Iterable[str]) -> int:
+    '''
+    Number of rows of TSV files after their header, to size the Bloom filters.
+    '''
+    rows = 0
+    for file in files:
+        with open(file, 'rb') as f:
+            rows += max(0, sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b'')) - 1)
+    return rows
+
+
+def open_text(file: str, mode: str, compress: Optional[bool] = None) -> IO:
+    '''
+    Open a node or edge file as text, gzip-compressed if it ends in .gz unless compress says otherwise.
+    '''
+    if compress is None:
+        compress = file.endswith('.gz')
+    return gzip.open(file, mode + 't') if compress else open(file, mode)
+
+
+def file_keys(file: str, key: Callable[[str], str]) -> Iterator[str]:
+    '''
+    Key of each row of a node or edge file, after its header.
+
+    :param file: Node or edge file.
+    :param key: Key of a line.
+    :return: Iterator over the keys.
+    '''
+    with open_text(file, 'r') as f:
+        f.readline()
+        for line in f:
+            yield key(line)
+
+
+def drop_rows(file: str, rows: Iterator[int]) -> Iterator[int]:
+    '''
+    Rewrite a node or edge file without some of its rows, atomically.
+
+    :param file: Node or edge file.
+    :param rows: Row numbers to drop (0 being the row after the header), ascending.
+    :return: Iterator over the dropped row numbers, the file is replaced once it is exhausted.
+    '''
+    drop = next(rows, None)
+    if drop is None:
+        return
+    with open_text(file, 'r') as f, open_text(file + '.tmp', 'w', file.endswith('.gz')) as out:
+        out.write(f.readline())
+        for row, line in enumerate(f):
+            if row == drop:
+                yield row
+                drop = next(rows, None)
+            else:
+                out.write(line)
+    os.replace(file + '.tmp', file)
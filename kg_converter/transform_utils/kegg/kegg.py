@@ -1,13 +1,26 @@
 #import csvimport 
+import copy
+import csv
+import logging
 import os
-from typing import Dict, List, Optional
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from collections import defaultdict
 
 from numpy.lib.shape_base import column_stack
 
+from kg_converter.__version__ import __version__
 from kg_converter.transform_utils.transform import Transform
-from kg_converter.utils.transform_utils import parse_header, parse_line, write_node_edge_item
-
+from kg_converter.transform_utils.kegg.dblinks import DBLinksNormalizer
+from kg_converter.transform_utils.kegg.dedup import DEDUP_BACKENDS, count_rows
+from kg_converter.transform_utils.kegg.lookup import KEGGLookup
+from kg_converter.transform_utils.kegg.registry import GraphRegistry
+from kg_converter.transform_utils.kegg import loader, manifest, parallel, store, streaming
+from kg_converter.utils import columnar_utils, profile_utils
+from kg_converter.utils.transform_utils import parse_header, parse_line, NodeEdgeWriter
+
+import numpy as np
 import pandas as pd
 
 """
@@ -21,15 +34,71 @@ Data of interest:
 
 """
 
+ENGINES = ['row', 'vectorized', 'streaming', 'sqlite']
+
+# Node categories and CURIE prefixes by KEGG database
+NODE_CATEGORIES = {
+    'cpd': 'biolink:ChemicalSubstance',
+    'rn': 'biolink:MolecularActivity',
+    'pathway': 'biolink:Pathway',
+    'ko': 'biolink:GeneFamily'
+}
+
+NODE_PREFIXES = {
+    'cpd': 'KEGG.COMPOUND:',
+    'rn': 'KEGG.REACTION:',
+    'pathway': 'KEGG.PATHWAY:',
+    'ko': 'KEGG.ORTHOLOGY:'
+}
+
+# Predicate and relation by pair of link file columns
+LINK_PREDICATES = [
+    (['cpdId', 'pathwayId'], 'biolink:has_participant', 'RO:0000057'),
+    (['cpdId', 'rnId'], 'biolink:has_participant', 'RO:0000057'),
+    (['pathwayId', 'rnId'], 'biolink:has_participant', 'RO:0000057'),
+    (['koId', 'pathwayId'], 'biolink:has_participant', 'RO:0000057'),
+    (['koId', 'rnId'], 'biolink:has_participant', 'RO:0000057')
+]
+
 class KEGGTransform(Transform):
 
-    def __init__(self, input_dir: str = None, output_dir: str = None, nlp = False) -> None:
+    def __init__(self, input_dir: str = None, output_dir: str = None, nlp = False, engine: str = 'row',
+                 workers: int = 1, chunk_size: int = streaming.DEFAULT_CHUNK_SIZE,
+                 memory_budget: Optional[int] = None, compress: bool = False,
+                 dblink_prefixes: Optional[Dict[str, str]] = None, incremental: bool = False,
+                 output_format: str = 'tsv', dedup: str = 'interned') -> None:
         source_name = 'kegg'
         super().__init__(source_name, input_dir, output_dir, nlp)  # set some variables
 
         self.node_header = ['id', 'name', 'category', 'exact_match', 'close_match', 'description' ]
         self.edge_header = ['subject', 'predicate', 'object', 'relation']
         self.nlp = nlp
+
+        # NodeEdgeWriter gzip-compresses files ending in .gz
+        if compress:
+            self.output_node_file += '.gz'
+            self.output_edge_file += '.gz'
+
+        if engine not in ENGINES:
+            raise ValueError('Unknown engine {}, expected one of {}'.format(engine, ENGINES))
+        self.engine = engine
+        self.workers = max(1, workers)
+        self.min_chunk_bytes = parallel.MIN_CHUNK_BYTES
+        # Rows per chunk and memory budget (MiB) of the streaming engine
+        self.budget = streaming.ChunkBudget(chunk_size, memory_budget)
+        # KEGG DB label -> CURIE prefix of DBLINKS xrefs
+        self.dblinks = DBLinksNormalizer(dblink_prefixes)
+        # Only recompute the link files changed since the previous run
+        self.incremental = incremental
+        # Parquet or Arrow copies of the node and edge files, besides the TSV ones KGX reads
+        if output_format not in columnar_utils.FORMATS:
+            raise ValueError('Unknown output format {}, expected one of {}'.format(output_format,
+                                                                                  columnar_utils.FORMATS))
+        self.output_format = output_format
+        # Key sets deduplicating nodes and edges across link files, see the dedup module
+        if dedup not in DEDUP_BACKENDS:
+            raise ValueError('Unknown dedup backend {}, expected one of {}'.format(dedup, DEDUP_BACKENDS))
+        self.dedup = dedup
     
     def run(self, data_file: Optional[str] = None):
         """Method is called and performs needed transformations to process the 
@@ -50,59 +119,296 @@ class KEGGTransform(Transform):
         #ko_list_df = pd.read_csv(self.ko_list, low_memory=False, sep='\t')
         #cpd_to_chebi_df = pd.read_csv(self.cpd2chebi, low_memory=False, sep='\t')
 
-        # Pandas DF of 'kegg-*.tsv' files
-        
-        path_df = self.prune_columns(pd.read_csv(self.full_path, low_memory=False, sep='\t', usecols=['ENTRY', 'NAME', 'DBLINKS']), 'path')
-        rn_df = self.prune_columns(pd.read_csv(self.full_rn, low_memory=False, sep='\t', usecols=['ENTRY', 'DEFINITION', 'EQUATION', 'DBLINKS']), 'rn')
-        ko_df = self.prune_columns(pd.read_csv(self.full_ko, low_memory=False, sep='\t', usecols=['ENTRY', 'DEFINITION', 'DBLINKS']), 'ko')
-        
-        ## **********************************************************************
-        # Establishing 1-to-1 relation between KO and XRefs (['DBLINKS'] column)
-        ##***********************************************************************
-
-        # Explode DBLINKS in ko_df to separate rows
-        ko_df['DBLINKS'] = ko_df['DBLINKS'].apply(lambda row : str(row).split('|'))
-        ko_df = ko_df.explode('DBLINKS')
-
-        #ko_df['ID'] = ko_df['ID'].apply(lambda row : 'ko:'+str(row))
-        ko_df['DBLINKS'] = ko_df['DBLINKS'].apply(lambda row : str(row).replace('RN: ', 'KEGG.REACTION:'))
-        ko_df['DBLINKS'] = ko_df['DBLINKS'].apply(lambda row : str(row).strip().replace('COG: ', 'COG:'))
-        ko_df['DBLINKS'] = ko_df['DBLINKS'].apply(lambda row : str(row).strip().replace('GO: ', 'GO:'))
-        ko_df['DBLINKS'] = ko_df['DBLINKS'].apply(lambda row : str(row).strip().replace('TC: ', 'tcdb:'))
-        ko_df['DBLINKS'] = ko_df['DBLINKS'].apply(lambda row : str(row).strip().replace('CAZy: ', 'cazy:'))
-        ko_df['DBLINKS'] = ko_df['DBLINKS'].apply(lambda row : str(row).strip().replace('UniProt: ', 'uniprot:'))
-        ko_df['DBLINKS'] = ko_df['DBLINKS'].apply(lambda row: str(row).split(' '))
-        # Add prefixes to all DBLINKS
-        ko_df['DBLINKS'] = ko_df['DBLINKS'] \
-                            .apply(lambda row: [str(row[0])]+[str(row[0])
-                                .split(':')[0] + ':'+ x \
-                                    for x in row \
-                                        if not str(x).startswith(str(row[0]).split(':')[0]+ ':')])
-
-        ko_df['DBLINKS'] = ['|'.join(map(str, l)) for l in ko_df['DBLINKS']]
-        # Roll up to consolidated rows
-        ko_df = ko_df.groupby(['ID', 'DESCRIPTION'], as_index=False).agg({'DBLINKS': lambda x: '|'.join(x)})
-        ##########################################################################
-
-        node_dict: dict = defaultdict(int)
-        edge_dict: dict = defaultdict(int)
-
-        df_dict = {
-            'pathway': path_df,
-            'rn': rn_df,
-            'ko': ko_df
-        }
+        list_dict, desc_tables, link_files = self.input_tables()
+
+        if self.incremental:
+            self.run_incremental(list_dict, desc_tables, link_files)
+            self.write_columnar()
+            return None
+
+        # Outputs rebuilt from scratch have no parts for a later incremental run
+        manifest.remove_manifest(self.output_dir)
+
+        # The sqlite engine resolves IDs in the store instead
+        lookup = self.load_lookup(list_dict, desc_tables) if self.engine != 'sqlite' else None
+
+        # Nodes and edges are emitted once across all link files
+        self.registry = self.new_registry(link_files)
+
+        if self.engine == 'sqlite':
+            with self.load_store(list_dict, desc_tables, link_files) as kegg_store, \
+                    NodeEdgeWriter(self.output_node_file, self.node_header) as node, \
+                    NodeEdgeWriter(self.output_edge_file, self.edge_header) as edge:
+                for link_file in link_files:
+                    self.post_data_sqlite(link_file, self.registry, kegg_store, node, edge)
+        elif self.engine == 'vectorized':
+            sources = [os.path.basename(link_file) for link_file in link_files]
+            if self.workers > 1:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=parallel.init_worker,
+                                         initargs=(self, lookup)) as pool:
+                    frames = list(pool.map(parallel.transform_frames, link_files))
+            else:
+                frames = [self.post_data_vectorized(link_file, lookup) for link_file in link_files]
+            with profile_utils.stage('deduplicate') as stage:
+                nodes = pd.concat([n for n, _ in frames], keys=sources)
+                edges = pd.concat([e for _, e in frames], keys=sources)
+
+                dup_nodes = nodes.duplicated(subset='id')
+                dup_edges = edges.duplicated(subset=['subject', 'object'])
+                node_counts = dup_nodes.groupby(level=0).sum()
+                edge_counts = dup_edges.groupby(level=0).sum()
+                for source in sources:
+                    self.registry.record_duplicates(source,
+                                                    nodes=int(node_counts.get(source, 0)),
+                                                    edges=int(edge_counts.get(source, 0)))
+                stage.rows_in += len(nodes) + len(edges)
+                nodes = nodes[~dup_nodes]
+                edges = edges[~dup_edges]
+                stage.rows_out += len(nodes) + len(edges)
+
+            with NodeEdgeWriter(self.output_node_file, self.node_header) as node, \
+                    NodeEdgeWriter(self.output_edge_file, self.edge_header) as edge:
+                node.write_frame(nodes)
+                edge.write_frame(edges)
+        elif self.engine == 'streaming':
+            with NodeEdgeWriter(self.output_node_file, self.node_header) as node, \
+                    NodeEdgeWriter(self.output_edge_file, self.edge_header) as edge:
+                for link_file in link_files:
+                    self.post_data_streaming(link_file, self.registry, lookup, node, edge)
+        elif self.workers > 1:
+            self.post_data_parallel(link_files, lookup)
+        else:
+            for i, link_file in enumerate(link_files):
+                self.post_data(link_file, self.registry, lookup, 'w' if i == 0 else 'a')
 
-        node_dict, edge_dict = self.post_data(self.path_cpd_link, node_dict, edge_dict, df_dict, 'w')
-        node_dict, edge_dict = self.post_data(self.rn_cpd_link, node_dict, edge_dict, df_dict, 'a')
-        node_dict, edge_dict = self.post_data(self.path_rn_link, node_dict, edge_dict, df_dict, 'a')
-        node_dict, edge_dict = self.post_data(self.path_ko_link, node_dict, edge_dict, df_dict, 'a')
-        node_dict, edge_dict = self.post_data(self.rn_ko_link, node_dict, edge_dict, df_dict, 'a')
-                    
+        self.registry.finish(self.output_node_file, self.output_edge_file)
+        self.registry.report()
+        self.write_columnar()
+
+        return None
+
+    def new_registry(self, link_files: List[str]) -> GraphRegistry:
+        '''
+        GraphRegistry of a run, with the dedup backend of the transform.
 
+        :param link_files: The link files of the run, whose rows size the Bloom filters of the 'bloom' backend.
+        :return: GraphRegistry
+        '''
+        link_rows = count_rows(link_files) if self.dedup == 'bloom' else None
+        return GraphRegistry(self.dedup, self.output_dir, link_rows)
+
+    def write_columnar(self) -> None:
+        '''
+        Write the node and edge files again in self.output_format, unless it is 'tsv' or they are up to date.
+
+        :return: None
+        '''
+        if self.output_format == 'tsv':
+            return None
+        outputs = [columnar_utils.columnar_file(f, self.output_format)
+                   for f in (self.output_node_file, self.output_edge_file)]
+        if all(os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(tsv_file)
+               for output, tsv_file in zip(outputs, (self.output_node_file, self.output_edge_file))):
+            return None
+        columnar_utils.write_columnar(self.output_node_file, self.output_edge_file, self.node_header,
+                                      self.edge_header, self.output_format)
         return None
 
-    def post_data(self, file, seen_node, seen_edge, desc_dict, mode):
+    def input_tables(self) -> Tuple[Dict[str, str], Dict[str, Tuple[str, List[str], str]], List[str]]:
+        '''
+        Input files of the transform.
+
+        :return: Path of the 'list' file for each KEGG db, (path, columns used, type for prune_columns) of the
+            'kegg-*.tsv' table for each KEGG db, and the link files.
+        '''
+        list_dict = {
+            'cpd': self.cpd_list,
+            'rn': self.rn_list,
+            'pathway': self.path_list,
+            'ko': self.ko_list
+        }
+
+        # 'kegg-*.tsv' files: path, columns used and type for prune_columns
+        desc_tables = {
+            'pathway': (self.full_path, ['ENTRY', 'NAME', 'DBLINKS'], 'path'),
+            'rn': (self.full_rn, ['ENTRY', 'DEFINITION', 'EQUATION', 'DBLINKS'], 'rn'),
+            'ko': (self.full_ko, ['ENTRY', 'DEFINITION', 'DBLINKS'], 'ko')
+        }
+
+        link_files = [self.path_cpd_link, self.rn_cpd_link, self.path_rn_link, self.path_ko_link, self.rn_ko_link]
+
+        return list_dict, desc_tables, link_files
+
+    def load_lookup(self, list_dict: Dict[str, str], desc_tables: Dict[str, Tuple[str, List[str], str]]) -> KEGGLookup:
+        '''
+        Build the KEGGLookup from the 'list' files and 'kegg-*.tsv' tables.
+
+        :param list_dict: Path of the 'list' file for each KEGG db.
+        :param desc_tables: (path, columns used, type for prune_columns) of the 'kegg-*.tsv' table for each KEGG db.
+        :return: KEGGLookup
+        '''
+        with profile_utils.stage('load tables') as stage:
+            if self.engine == 'streaming':
+                # Index names, descriptions and xrefs chunk by chunk
+                lookup = self.stream_lookup(list_dict, desc_tables)
+            else:
+                # Pandas DF of 'kegg-*.tsv' files, read with their schema by pyarrow when installed
+                df_dict = {}
+                for db, (table, usecols, type) in desc_tables.items():
+                    if loader.available():
+                        df_dict[db] = self.normalise_dblinks(loader.read_descriptions(table, type))
+                    else:
+                        df_dict[db] = self.prune_columns(pd.read_csv(table, low_memory=False, sep='\t', usecols=usecols), type)
+
+                # Index names, descriptions and xrefs once for all link files
+                lookup = KEGGLookup(list_dict, df_dict)
+            stage.rows_in += lookup.rows
+            stage.rows_out += sum(map(len, lookup.names.values())) + sum(map(len, lookup.descriptions.values()))
+        return lookup
+
+    def load_store(self, list_dict: Dict[str, str], desc_tables: Dict[str, Tuple[str, List[str], str]],
+                   link_files: List[str]) -> store.KEGGStore:
+        '''
+        Open the SQLite store of the input files, (re)building it when they changed.
+
+        :param list_dict: Path of the 'list' file for each KEGG db.
+        :param desc_tables: (path, columns used, type for prune_columns) of the 'kegg-*.tsv' table for each KEGG db.
+        :param link_files: The link files used as input.
+        :return: KEGGStore, to be closed by the caller.
+        '''
+        conv_files = [f for f in [self.cpd2chebi] if os.path.exists(f)]
+        get_files = [f for f in [self.full_cpd] if os.path.exists(f)]
+        return store.open_store(os.path.join(self.input_base_dir, store.STORE_FILE), list_dict, desc_tables,
+                                link_files, conv_files, get_files, self.prune_columns, self.budget,
+                                {'dblink_prefixes': self.dblinks.prefixes})
+
+    def run_incremental(self, list_dict: Dict[str, str], desc_tables: Dict[str, Tuple[str, List[str], str]],
+                        link_files: List[str]) -> None:
+        '''
+        Incremental counterpart of run, driven by the manifest of the previous run.
+
+        The nodes and edges of each link file are kept as a headerless part in
+        output_dir/parts. Only the parts of link files whose content changed are
+        recomputed (all of them when a 'list' or 'kegg-*.tsv' file or the
+        configuration changed), then the parts are merged in order against a
+        fresh GraphRegistry, giving the same output as a full run. Nothing is
+        done when no input changed and the outputs exist.
+
+        :param list_dict: Path of the 'list' file for each KEGG db.
+        :param desc_tables: (path, columns used, type for prune_columns) of the 'kegg-*.tsv' table for each KEGG db.
+        :param link_files: The link files used as input.
+        :return: None
+        '''
+        lookup_files = list(list_dict.values()) + [table for table, _, _ in desc_tables.values()]
+        with profile_utils.stage('hash inputs') as stage:
+            current = {
+                'config': {
+                    'version': __version__,
+                    'node_header': self.node_header,
+                    'edge_header': self.edge_header,
+                    'dblink_prefixes': self.dblinks.prefixes,
+                    'node_file': os.path.basename(self.output_node_file),
+                    'edge_file': os.path.basename(self.output_edge_file)
+                },
+                'inputs': manifest.input_hashes(lookup_files + link_files)
+            }
+            stage.rows_in += len(current['inputs'])
+        previous = manifest.read_manifest(self.output_dir)
+
+        sources = [os.path.basename(link_file) for link_file in link_files]
+        part_dir = os.path.join(self.output_dir, 'parts')
+        parts = [(source, os.path.join(part_dir, source + '.nodes.tsv'), os.path.join(part_dir, source + '.edges.tsv'))
+                 for source in sources]
+        changed = manifest.changed_files(previous, current, [os.path.basename(f) for f in lookup_files], sources)
+        # Parts lost since the previous run are recomputed as well
+        changed_parts = [(link_file, part) for link_file, part in zip(link_files, parts)
+                         if part[0] in changed or not (os.path.exists(part[1]) and os.path.exists(part[2]))]
+
+        if not changed_parts and os.path.exists(self.output_node_file) and os.path.exists(self.output_edge_file):
+            logging.info('KEGG inputs unchanged since the previous run, keeping {}'.format(self.output_dir))
+            return None
+
+        # Duplicates found within each part, for the report
+        duplicates = dict(previous.get('duplicates', {})) if previous is not None else {}
+        if changed_parts:
+            logging.info('Recomputing KEGG parts of {}'.format(', '.join(part[0] for _, part in changed_parts)))
+            lookup = self.load_lookup(list_dict, desc_tables)
+            os.makedirs(part_dir, exist_ok=True)
+            tasks = []
+            for link_file, (source, part_node_file, part_edge_file) in changed_parts:
+                for part_file in (part_node_file, part_edge_file):
+                    if os.path.exists(part_file):
+                        os.remove(part_file)
+                tasks.append((link_file, parallel.chunk_offsets(link_file, 1)[0], part_node_file, part_edge_file))
+
+            with profile_utils.stage('post_data (parts)'):
+                if self.workers > 1:
+                    with ProcessPoolExecutor(max_workers=self.workers, initializer=parallel.init_worker,
+                                             initargs=(self, lookup)) as pool:
+                        results = list(pool.map(parallel.transform_shard, *zip(*tasks)))
+                else:
+                    # transform_shard redirects the output files of the transform it is given
+                    parallel.init_worker(copy.copy(self), lookup)
+                    results = [parallel.transform_shard(*task) for task in tasks]
+            for (_, (source, _, _)), counts in zip(changed_parts, results):
+                duplicates[source] = counts.get(source, {})
+
+        self.registry = self.new_registry(link_files)
+        for source in sources:
+            counts = duplicates.get(source, {})
+            self.registry.record_duplicates(source, nodes=counts.get('nodes', 0), edges=counts.get('edges', 0))
+
+        with profile_utils.stage('merge parts'), \
+                NodeEdgeWriter(self.output_node_file, self.node_header) as node, \
+                NodeEdgeWriter(self.output_edge_file, self.edge_header) as edge:
+            parallel.merge_shards(parts, self.registry, node, edge)
+        self.registry.finish(self.output_node_file, self.output_edge_file)
+        self.registry.report()
+
+        current['duplicates'] = {source: duplicates.get(source, {}) for source in sources}
+        manifest.write_manifest(self.output_dir, current)
+
+    def post_data_parallel(self, link_files: List[str], lookup: KEGGLookup) -> None:
+        '''
+        Run post_data over the link files with a pool of self.workers processes.
+
+        Large link files are split into line-aligned chunks. Each chunk is written
+        to its own shard and the shards are merged in order against self.registry,
+        giving the same output as a serial run.
+
+        :param link_files: The link files used as input.
+        :param lookup: KEGGLookup resolving names, descriptions and xrefs of KEGG IDs.
+        :return: None
+        '''
+        shard_dir = os.path.join(self.output_dir, 'shards')
+        os.makedirs(shard_dir, exist_ok=True)
+
+        shards = []
+        with profile_utils.stage('post_data (workers)'), \
+                ProcessPoolExecutor(max_workers=self.workers, initializer=parallel.init_worker,
+                                    initargs=(self, lookup)) as pool:
+            futures = []
+            for link_file in link_files:
+                source = os.path.basename(link_file)
+                for i, offsets in enumerate(parallel.chunk_offsets(link_file, self.workers, self.min_chunk_bytes)):
+                    shard = os.path.join(shard_dir, '{}.{}'.format(source, i))
+                    shards.append((source, shard + '.nodes.tsv', shard + '.edges.tsv'))
+                    futures.append(pool.submit(parallel.transform_shard, link_file, offsets,
+                                               shards[-1][1], shards[-1][2]))
+
+            for future in futures:
+                for source, counts in future.result().items():
+                    self.registry.record_duplicates(source, nodes=counts.get('nodes', 0),
+                                                    edges=counts.get('edges', 0))
+
+        with profile_utils.stage('merge shards'), \
+                NodeEdgeWriter(self.output_node_file, self.node_header) as node, \
+                NodeEdgeWriter(self.output_edge_file, self.edge_header) as edge:
+            parallel.merge_shards(shards, self.registry, node, edge)
+
+        shutil.rmtree(shard_dir)
+
+    def post_data(self, file, registry, lookup, mode, offsets=None):
         '''
         This function transforms the following KEGG data into nodes and edges:
             -   Pathway <-> Compound
@@ -112,184 +418,251 @@ class KEGGTransform(Transform):
             -   Reaction <-> KEGG Orthology
 
         :param file: The link file used as input.
-        :param seen_node: Dictionary of all nodes recorded to avoid duplication.
-        :param seen_edge: Dictionary of all edges recorded to avoid duplication.
+        :param registry: GraphRegistry of all nodes and edges recorded to avoid duplication.
+        :param lookup: KEGGLookup resolving names, descriptions and xrefs of KEGG IDs.
         :param mode: Two options ['write' and 'append'] to avoid overwriting of nodes and edges tsv files.
-        :return: seen_node and seen_edge such that the nodes and edges are unique throughout the process.
-        '''
-
-        with open(file, 'r') as f, \
-                open(self.output_node_file, mode) as node, \
-                open(self.output_edge_file, mode) as edge:
-
-                # write headers (change default node/edge headers if necessary
-                if mode == 'w':
-                    node.write('\t'.join(self.node_header) + '\n')
-                    edge.write('\t'.join(self.edge_header) + '\n')
-                
-                seen_node: dict = defaultdict(int)
-                seen_edge: dict = defaultdict(int)
-
-                # Nodes
-                cpd_node_type = 'biolink:ChemicalSubstance'
-                path_node_type = 'biolink:Pathway'
-                rn_node_type = 'biolink:MolecularActivity'
-                ko_node_type = 'biolink:GeneFamily'
-
-                # Node Prefixes
-                cpd_pref = 'KEGG.COMPOUND:'
-                rn_pref = 'KEGG.REACTION:'
-                path_pref = 'KEGG.PATHWAY:'
-                ko_pref = 'KEGG.ORTHOLOGY:'
-
-                # Edges
-                path_to_cpd_label = 'biolink:has_participant'
-                rn_to_cpd_label = 'biolink:has_participant'
-                path_to_rn_label = 'biolink:has_participant'
-                path_to_ko_label = 'biolink:has_participant'
-                rn_to_ko_label = 'biolink:has_participant'
-                predicate = ''
-                predicate_curie = ''
-                
-
-                path_to_cpd_relation = 'RO:0000057'
-                rn_to_cpd_relation = 'RO:0000057'
-                path_to_rn_relation = 'RO:0000057'
-                path_to_ko_relation = 'RO:0000057'
-                rn_to_ko_relation = 'RO:0000057'
-
-                #cpd_to_chebi_df = pd.DataFrame()
+        :param offsets: Optional (start, end) byte range of the file to transform, the whole file by default.
+        :return: registry such that the nodes and edges are unique throughout the process.
+        '''
+
+        source = os.path.basename(file)
+
+        # headers are written by NodeEdgeWriter in 'w' mode
+        with profile_utils.stage('post_data ' + source) as stage, \
+                open(file, 'r') as f, \
+                NodeEdgeWriter(self.output_node_file, self.node_header, mode) as node, \
+                NodeEdgeWriter(self.output_edge_file, self.edge_header, mode) as edge:
+
                 node_id = ''
                 node_pref = ''
-                synonyms = ''
                 xrefs = ''
-                
 
                 header_items = parse_header(f.readline(), sep='\t')
+                predicate, predicate_curie = self.link_predicate(header_items)
+                lines = f if offsets is None else parallel.read_chunk(file, offsets)
 
-                if all(x in header_items for x in ['cpdId', 'pathwayId']):
-                    predicate = path_to_cpd_label
-                    predicate_curie = path_to_cpd_relation
-                elif all(x in header_items for x in ['cpdId', 'rnId']):
-                    predicate = rn_to_cpd_label
-                    predicate_curie = rn_to_cpd_relation
-                elif all(x in header_items for x in ['pathwayId', 'rnId']):
-                    predicate = path_to_rn_label
-                    predicate_curie = path_to_rn_relation
-                elif all(x in header_items for x in ['koId', 'pathwayId']):
-                    predicate = path_to_ko_label
-                    predicate_curie = path_to_ko_relation
-                elif all(x in header_items for x in ['koId', 'rnId']):
-                    predicate = rn_to_ko_label
-                    predicate_curie = rn_to_ko_relation
-                else:
-                    print('Unexpected column names provided.')
-                
-                for line in f:
+                for line in lines:
                     # transform line into nodes and edges
                     # node.write(this_node1)
                     # node.write(this_node2)
                     # edge.write(this_edge)
                     items_dict = parse_line(line, header_items, sep='\t')
+                    stage.rows_in += 1
                     
-                    edge_id = ''
                     subject = ''
                     object = ''
-                    
-                    
+
                     for key in items_dict.keys():
-                        list_df = pd.DataFrame()
-                        node_type = ''
-                        desc_df = pd.DataFrame()
-                        description = ''
-                        #need_chebi = False
-                        if key[:-2] == 'cpd':
-                            list_df = pd.read_csv(self.cpd_list, sep='\t', low_memory=False)
-                            node_type = cpd_node_type
-                            node_pref = cpd_pref
-                            #cpd_to_chebi_df = pd.read_csv(self.cpd2chebi, low_memory=False, sep='\t')
-                            need_chebi = True
-                        elif key[:-2] == 'rn':
-                            list_df = pd.read_csv(self.rn_list, sep='\t', low_memory=False)
-                            node_type = rn_node_type
-                            node_pref = rn_pref
-                        elif key[:-2] == 'pathway':
-                            list_df = pd.read_csv(self.path_list, sep='\t', low_memory=False)
-                            node_type = path_node_type
-                            node_pref = path_pref
-                        elif key[:-2] == 'ko':
-                            list_df = pd.read_csv(self.ko_list, sep='\t', low_memory=False)
-                            node_type = ko_node_type
-                            node_pref = ko_pref
-
-                        # Get CHEBI equivalent if possible
-                        #if need_chebi and (any(cpd_to_chebi_df[key].str.contains(items_dict[key]))):
-                            #node_id = cpd_to_chebi_df[cpd_to_chebi_df[key]==items_dict[key]]['chebiId'].values[0]
-                        #else:
+                        node_type = NODE_CATEGORIES.get(key[:-2], '')
+                        node_pref = NODE_PREFIXES.get(key[:-2], node_pref)
+
                         core_id = items_dict[key].split(':')[1] #This is the id without any prefix
-                        desc_df = desc_dict.get(key[:-2]) # get the relevant DataFrame for description
                         node_id = node_pref+core_id
+                        entry = lookup.get(key, items_dict[key])
 
-                        # Get description for the node
-                        if desc_df is not None and core_id in desc_df['ID'].values:
-                            description = desc_df.loc[desc_df['ID'] == core_id, 'DESCRIPTION'].iloc[0]
-
-
-                        if edge_id == '':
-                            edge_id = node_id
+                        if subject == '':
                             subject = node_id
                         else:
-                            edge_id += '-'+node_id
                             object = node_id
-                        
-                        
-
-                        if key =='pathwayId':
-                            if 'rn' in items_dict[key]:
-                                names = list_df[list_df[key] == items_dict[key].replace('rn', 'map')][key[:-2]].values[0]
-                            elif 'ko' in items_dict[key]:
-                                names = list_df[list_df[key] == items_dict[key].replace('ko', 'map')][key[:-2]].values[0]
-                            else:
-                                names = list_df[list_df[key] == items_dict[key]][key[:-2]].values[0]
 
-                        else:
-                            names = list_df[list_df[key] == items_dict[key]][key[:-2]].values[0]
-                        
-                        if key != 'cpdId':
-                            db_link = desc_dict[key[:-2]][desc_dict[key[:-2]]['ID'] == core_id]['DBLINKS'].values
-                            if len(db_link) > 0:
-                                xrefs = db_link[0]
-                        
-                        name = names.split(';')[0]
-                        synonyms = ' | '.join(names.split(';')[1:]).strip()
-                        
-                        
+                        xrefs = entry.xrefs if entry.xrefs is not None else ''
 
                         # Nodes
-                        if node_id not in seen_node:
-                            write_node_edge_item(fh=node,
-                                                header=self.node_header,
-                                                data=[node_id,
-                                                      name,
-                                                      node_type,
-                                                      synonyms,
-                                                      xrefs,
-                                                      description])
-                            seen_node[node_id] += 1
-                        
+                        if registry.add_node(node_id, source):
+                            stage.rows_out += 1
+                            node.write([node_id,
+                                        entry.name,
+                                        node_type,
+                                        entry.synonyms,
+                                        xrefs,
+                                        entry.description])
+
 
                     # Edges
-                    if edge_id not in seen_edge:
-                        write_node_edge_item(fh=edge,
-                                        header=self.edge_header,
-                                        data=[subject,
-                                            predicate,
-                                            object,
-                                            predicate_curie])
-                        seen_edge[edge_id] += 1
+                    if registry.add_edge(subject, object, source):
+                        stage.rows_out += 1
+                        edge.write([subject,
+                                    predicate,
+                                    object,
+                                    predicate_curie])
+
+        return registry
+
+
+    def post_data_vectorized(self, file: str, lookup: KEGGLookup) -> List[pd.DataFrame]:
+        '''
+        Vectorized counterpart of post_data: transforms a whole link file at once.
 
-        return [seen_node, seen_edge]
+        Each column of the link table is joined against the lookup indices and
+        the subject/object nodes are interleaved in line order, so dropping
+        duplicates keeps the same first occurrence as post_data. Duplicates are
+        left in and dropped across all link files by run().
 
+        :param file: The link file used as input.
+        :param lookup: KEGGLookup resolving names, descriptions and xrefs of KEGG IDs.
+        :return: Node and edge DataFrames (columns of node_header and edge_header) of this file.
+        '''
+        with profile_utils.stage('post_data ' + os.path.basename(file)) as stage:
+            links = pd.read_csv(file, sep='\t', dtype=str, quoting=csv.QUOTE_NONE)
+            nodes, edges = self.link_frames(links, lookup)
+            stage.rows_in += len(links)
+            stage.rows_out += len(nodes) + len(edges)
+        return [nodes, edges]
+
+    def post_data_streaming(self, file: str, registry: GraphRegistry, lookup: KEGGLookup, node, edge) -> None:
+        '''
+        Streaming counterpart of post_data_vectorized: transforms a link file chunk
+        by chunk, so only one chunk of the link table is held in memory.
+
+        :param file: The link file used as input.
+        :param registry: GraphRegistry of all nodes and edges recorded to avoid duplication.
+        :param lookup: KEGGLookup resolving names, descriptions and xrefs of KEGG IDs.
+        :param node: NodeEdgeWriter of the node file.
+        :param edge: NodeEdgeWriter of the edge file.
+        :return: None
+        '''
+        source = os.path.basename(file)
+        with profile_utils.stage('post_data ' + source) as stage:
+            for links in streaming.read_chunks(file, self.budget, dtype=str, quoting=csv.QUOTE_NONE):
+                nodes, edges = self.link_frames(links, lookup)
+                new_nodes = np.array([registry.add_node(node_id, source) for node_id in nodes['id']], dtype=bool)
+                new_edges = np.array([registry.add_edge(subject, object, source)
+                                      for subject, object in zip(edges['subject'], edges['object'])], dtype=bool)
+                node.write_frame(nodes.loc[new_nodes])
+                edge.write_frame(edges.loc[new_edges])
+                stage.rows_in += len(links)
+                stage.rows_out += int(new_nodes.sum()) + int(new_edges.sum())
+
+    def post_data_sqlite(self, file: str, registry: GraphRegistry, kegg_store: store.KEGGStore, node, edge) -> None:
+        '''
+        Counterpart of post_data_streaming resolving IDs with indexed joins in the SQLite store,
+        so neither the link table nor the lookup tables are held in memory.
+
+        :param file: The link file used as input.
+        :param registry: GraphRegistry of all nodes and edges recorded to avoid duplication.
+        :param kegg_store: KEGGStore holding the link file.
+        :param node: NodeEdgeWriter of the node file.
+        :param edge: NodeEdgeWriter of the edge file.
+        :return: None
+        '''
+        source = os.path.basename(file)
+        with profile_utils.stage('post_data ' + source) as stage:
+            for links in kegg_store.resolved_links(file, self.budget):
+                header_items = list(links.columns[:2])
+                predicate, predicate_curie = self.link_predicate(header_items)
+                node_frames = []
+                for key in header_items:
+                    ids = links[key]
+                    node_frames.append(self.node_frame(key[:-2], ids.str.split(':').str[1],
+                                                       store.list_ids(key, ids), links[key + '_name'],
+                                                       links[key + '_dblinks'], links[key + '_description']))
+                nodes, edges = self.graph_frames(node_frames, predicate, predicate_curie)
+                new_nodes = np.array([registry.add_node(node_id, source) for node_id in nodes['id']], dtype=bool)
+                new_edges = np.array([registry.add_edge(subject, object, source)
+                                      for subject, object in zip(edges['subject'], edges['object'])], dtype=bool)
+                node.write_frame(nodes.loc[new_nodes])
+                edge.write_frame(edges.loc[new_edges])
+                stage.rows_in += len(links)
+                stage.rows_out += int(new_nodes.sum()) + int(new_edges.sum())
+
+    def stream_lookup(self, list_dict: Dict[str, str], desc_tables: Dict[str, Tuple[str, List[str], str]]) -> KEGGLookup:
+        '''
+        Build the KEGGLookup from the 'list' files and 'kegg-*.tsv' tables read in chunks.
+
+        :param list_dict: Path of the 'list' file for each KEGG db.
+        :param desc_tables: (path, columns used, type for prune_columns) of the 'kegg-*.tsv' table for each KEGG db.
+        :return: KEGGLookup
+        '''
+        lookup = KEGGLookup({}, {})
+        for db, list_file in list_dict.items():
+            for chunk in streaming.read_chunks(list_file, self.budget):
+                lookup.add_names(db, chunk)
+
+        for db, (table, usecols, type) in desc_tables.items():
+            for chunk in streaming.read_chunks(table, self.budget, usecols=usecols, dtype=str):
+                lookup.add_descriptions(db, self.prune_columns(chunk, type))
+
+        return lookup
+
+    def link_frames(self, links: pd.DataFrame, lookup: KEGGLookup) -> List[pd.DataFrame]:
+        '''
+        Node and edge DataFrames of a link table, or of a chunk of it, duplicates included.
+
+        :param links: Link table with two ID columns (e.g. pathwayId, cpdId).
+        :param lookup: KEGGLookup resolving names, descriptions and xrefs of KEGG IDs.
+        :return: Node and edge DataFrames (columns of node_header and edge_header).
+        '''
+        links = links.replace('"', '', regex=True)
+        header_items = [x.replace('"', '') for x in links.columns]
+        links.columns = header_items
+        predicate, predicate_curie = self.link_predicate(header_items)
+
+        node_frames = []
+        for key in header_items:
+            db = key[:-2]
+            ids = links[key]
+            core_ids = ids.str.split(':').str[1]
+            list_ids = store.list_ids(key, ids)
+            node_frames.append(self.node_frame(db, core_ids, list_ids, list_ids.map(lookup.names[db]),
+                                               core_ids.map(lookup.xrefs.get(db, {})),
+                                               core_ids.map(lookup.descriptions.get(db, {}))))
+
+        return self.graph_frames(node_frames, predicate, predicate_curie)
+
+    def node_frame(self, db: str, core_ids: pd.Series, list_ids: pd.Series, names: pd.Series, xrefs: pd.Series,
+                   descriptions: pd.Series) -> pd.DataFrame:
+        '''
+        Node DataFrame of one column of a link table, from the resolved names, xrefs and descriptions.
+
+        :param db: KEGG db of the column.
+        :param core_ids: IDs without prefix.
+        :param list_ids: IDs as listed in the 'list' file, for the error on unknown IDs.
+        :param names: 'list' file names, NaN for unknown IDs.
+        :param xrefs: Normalised DBLINKS, NaN where missing.
+        :param descriptions: Descriptions, NaN where missing.
+        :return: DataFrame with the columns of node_header.
+        '''
+        if names.isna().any():
+            raise KeyError(list_ids[names.isna()].iloc[0])
+
+        return pd.DataFrame({
+            'id': NODE_PREFIXES[db] + core_ids,
+            'name': names.str.split(';').str[0],
+            'category': NODE_CATEGORIES[db],
+            'exact_match': names.str.split(';', n=1).str[1].fillna('').str.replace(';', ' | ', regex=False).str.strip(),
+            'close_match': xrefs.fillna(''),
+            'description': descriptions.fillna('')
+        }, columns=self.node_header)
+
+    def graph_frames(self, node_frames: List[pd.DataFrame], predicate: str, predicate_curie: str) -> List[pd.DataFrame]:
+        '''
+        Node and edge DataFrames of a link table from the node frames of its subject and object columns.
+        '''
+        # Interleave subject and object nodes in line order
+        nodes = pd.concat(node_frames).sort_index(kind='mergesort')
+
+        edges = pd.DataFrame({
+            'subject': node_frames[0]['id'],
+            'predicate': predicate,
+            'object': node_frames[1]['id'],
+            'relation': predicate_curie
+        }, columns=self.edge_header)
+
+        return [nodes, edges]
+
+    @staticmethod
+    def link_predicate(header_items: List[str]) -> List[str]:
+        '''
+        Predicate and relation of the edges of a link file.
+
+        :param header_items: Column names of the link file.
+        :return: [predicate, relation]; empty strings for unexpected columns.
+        '''
+        for columns, predicate, relation in LINK_PREDICATES:
+            if all(x in header_items for x in columns):
+                return [predicate, relation]
+        print('Unexpected column names provided.')
+        return ['', '']
 
     def prune_columns(self, df:pd.DataFrame, type:str)->pd.DataFrame:
         column_names = ['ID', 'DESCRIPTION', 'DBLINKS']
@@ -305,7 +678,20 @@ class KEGGTransform(Transform):
         else:
             print('Unknown type of data')
 
-        return new_df.dropna()
+        return self.normalise_dblinks(new_df.dropna())
+
+    def normalise_dblinks(self, df: pd.DataFrame) -> pd.DataFrame:
+        '''
+        DBLINKS as pipe-delimited CURIEs.
+
+        :param df: ID, DESCRIPTION and DBLINKS of a 'kegg-*.tsv' table, without missing values.
+        :return: The same with normalised DBLINKS.
+        '''
+        with profile_utils.stage('normalise DBLINKS') as stage:
+            df = df.assign(DBLINKS=self.dblinks(df['DBLINKS'].astype(str)))
+            stage.rows_in += len(df)
+            stage.rows_out += len(df)
+        return df
 
 
 
@@ -0,0 +1,225 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.compute as pc  # type: ignore
+    import pyarrow.csv as pa_csv  # type: ignore
+except ImportError:
+    pa = None
+
+"""
+Typed loader of the 'kegg-*.tsv' tables written by the 'get' download.
+
+Each table has an explicit schema: text columns are read as Arrow strings,
+low-cardinality ones (CLASS) dictionary-encoded into categoricals and numeric
+ones (EXACT_MASS, MOL_WEIGHT) as floats. Columns missing from the schema are
+read as strings. The file is parsed by pyarrow on all cores, and the columns
+derived by prune_columns of the transform are computed in Arrow while loading:
+
+    ID          ENTRY up to the first space ('K00873 KO' -> 'K00873')
+    ENTRY_TYPE  The rest of ENTRY, as a categorical ('KO')
+    DESCRIPTION path: NAME after 'DESCRIPTION', rn: DEFINITION + ' | EQUATION: '
+                + EQUATION, ko: DEFINITION
+
+Values pandas reads as missing by default ('', 'NA', 'NaN', ...) are null, so
+that read_descriptions keeps the same rows as prune_columns.
+
+read_descriptions streams the table in small blocks and keeps only ID,
+DESCRIPTION and DBLINKS of each one, so its peak memory is the columns it
+returns plus a few blocks in flight rather than the whole raw table.
+"""
+
+# Table type (as in KEGGTransform.input_tables, 'cpd' for compounds) -> column -> Arrow type name
+SCHEMAS = {
+    'cpd': {'ENTRY': 'string', 'NAME': 'string', 'FORMULA': 'string', 'EXACT_MASS': 'float64',
+            'MOL_WEIGHT': 'float64', 'DBLINKS': 'string'},
+    'path': {'ENTRY': 'string', 'NAME': 'string', 'CLASS': 'category', 'PATHWAY_MAP': 'string',
+             'DBLINKS': 'string'},
+    'rn': {'ENTRY': 'string', 'NAME': 'string', 'DEFINITION': 'string', 'EQUATION': 'string',
+           'ENZYME': 'string', 'DBLINKS': 'string'},
+    'ko': {'ENTRY': 'string', 'NAME': 'string', 'DEFINITION': 'string', 'PATHWAY': 'string',
+           'DBLINKS': 'string'}
+}
+
+# Columns needed to derive DESCRIPTION, by table type
+DESCRIPTION_COLUMNS = {
+    'path': ['NAME'],
+    'rn': ['DEFINITION', 'EQUATION'],
+    'ko': ['DEFINITION']
+}
+
+# Default na_values of pandas.read_csv
+NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>',
+             'N/A', 'NA', 'NULL', 'NaN', 'n/a', 'nan', 'null']
+
+BLOCK_SIZE = 1 << 24
+# Initial block size of the streamed reads of read_descriptions, doubled while a row doesn't fit in a block
+STREAM_BLOCK_SIZE = 1 << 17
+
+
+def available() -> bool:
+    '''
+    Whether pyarrow is installed, the transform falls back to pandas.read_csv otherwise.
+    '''
+    return pa is not None
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("The typed KEGG table loader needs pyarrow, install it with `pip install pyarrow` "
+                          "or `pip install kg-converter[columnar]`")
+
+
+def arrow_type(name: str) -> Any:
+    '''
+    Arrow type of a schema type name.
+    '''
+    if name == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.type_for_alias(name)
+
+
+def read_header(file: str) -> List[str]:
+    '''
+    Column names of a 'kegg-*.tsv' table.
+    '''
+    with open(file) as f:
+        return f.readline().rstrip('\r\n').split('\t')
+
+
+def csv_options(file: str, type: str, columns: Optional[List[str]], block_size: int) -> Dict[str, Any]:
+    '''
+    Options of the pyarrow CSV readers for a 'kegg-*.tsv' table with its schema.
+
+    :param file: Path of the table.
+    :param type: Table type, a key of SCHEMAS.
+    :param columns: Columns to read, all of them if None.
+    :param block_size: Bytes parsed at a time.
+    :return: read_options, parse_options and convert_options keyword arguments
+    '''
+    require_pyarrow()
+    if type not in SCHEMAS:
+        raise ValueError('Unknown KEGG table type {}, expected one of {}'.format(type, list(SCHEMAS)))
+    schema = SCHEMAS[type]
+    columns = columns or read_header(file)
+    return {
+        'read_options': pa_csv.ReadOptions(use_threads=True, block_size=block_size),
+        'parse_options': pa_csv.ParseOptions(delimiter='\t'),
+        'convert_options': pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={column: arrow_type(schema.get(column, 'string')) for column in columns},
+            null_values=NA_VALUES, strings_can_be_null=True, quoted_strings_can_be_null=True)
+    }
+
+
+def read_arrow(file: str, type: str, columns: Optional[List[str]] = None) -> Any:
+    '''
+    Read a 'kegg-*.tsv' table into an Arrow table with its schema.
+
+    :param file: Path of the table.
+    :param type: Table type, a key of SCHEMAS.
+    :param columns: Columns to read, all of them by default.
+    :return: pyarrow.Table
+    '''
+    return pa_csv.read_csv(file, **csv_options(file, type, columns, BLOCK_SIZE))
+
+
+def derive_columns(table: Any, type: str) -> Dict[str, Any]:
+    '''
+    ID, ENTRY_TYPE and DESCRIPTION of an Arrow table, when its columns allow.
+
+    :param table: Table read by read_arrow.
+    :param type: Table type, a key of SCHEMAS.
+    :return: Derived column name -> Arrow array
+    '''
+    derived = {}
+    names = table.column_names
+    if 'ENTRY' in names:
+        entry = table.column('ENTRY')
+        derived['ID'] = pc.replace_substring_regex(entry, ' .*', '', max_replacements=1)
+        derived['ENTRY_TYPE'] = pc.dictionary_encode(
+            pc.utf8_trim_whitespace(pc.replace_substring_regex(entry, '^[^ ]*', '', max_replacements=1)))
+    if type in DESCRIPTION_COLUMNS and all(column in names for column in DESCRIPTION_COLUMNS[type]):
+        if type == 'path':
+            # Text between the first 'DESCRIPTION' and the next one, as NAME.str.split('DESCRIPTION').str[1]
+            derived['DESCRIPTION'] = pc.struct_field(
+                pc.extract_regex(table.column('NAME'), 'DESCRIPTION(?P<d>.*?)(?:DESCRIPTION|$)'), [0])
+        elif type == 'rn':
+            derived['DESCRIPTION'] = pc.binary_join_element_wise(table.column('DEFINITION'),
+                                                                  table.column('EQUATION'), ' | EQUATION: ')
+        elif type == 'ko':
+            derived['DESCRIPTION'] = table.column('DEFINITION')
+    return derived
+
+
+def to_pandas(table: Any) -> pd.DataFrame:
+    '''
+    Convert an Arrow table, strings as string[pyarrow] and dictionaries as categoricals.
+    '''
+    string_dtype = pd.StringDtype('pyarrow')
+    return table.to_pandas(types_mapper={pa.string(): string_dtype, pa.large_string(): string_dtype}.get,
+                           split_blocks=True, self_destruct=True)
+
+
+def read_table(file: str, type: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    '''
+    Read a 'kegg-*.tsv' table with its schema and the derived columns.
+
+    :param file: Path of the table.
+    :param type: Table type, a key of SCHEMAS.
+    :param columns: Columns to read, all of them by default.
+    :return: DataFrame of the columns followed by ID, ENTRY_TYPE and DESCRIPTION.
+    '''
+    table = read_arrow(file, type, columns)
+    for name, column in derive_columns(table, type).items():
+        table = table.append_column(name, column)
+    return to_pandas(table)
+
+
+def read_descriptions(file: str, type: str) -> pd.DataFrame:
+    '''
+    The ID, DESCRIPTION and DBLINKS of a 'kegg-*.tsv' table, as prune_columns of the transform before the DBLINKS
+    are normalised: entries missing any of them are dropped.
+
+    :param file: Path of the table.
+    :param type: 'path', 'rn' or 'ko'.
+    :return: DataFrame with ID, DESCRIPTION and raw DBLINKS columns.
+    '''
+    if type not in DESCRIPTION_COLUMNS:
+        raise ValueError('No DESCRIPTION for KEGG table type {}, expected one of {}'.format(
+            type, list(DESCRIPTION_COLUMNS)))
+    block_size = STREAM_BLOCK_SIZE
+    while True:
+        try:
+            return to_pandas(stream_descriptions(file, type, block_size))
+        except pa.ArrowInvalid as e:
+            if 'straddling' not in str(e):
+                raise
+            # A row longer than the block, e.g. the long GENES or DBLINKS of some KOs: read again in larger blocks
+            block_size *= 2
+            logging.info('Reading {} again in blocks of {} bytes, a row is longer than the block'.format(
+                file, block_size))
+
+
+def stream_descriptions(file: str, type: str, block_size: int) -> Any:
+    '''
+    Arrow table of the ID, DESCRIPTION and DBLINKS of a 'kegg-*.tsv' table, read in blocks.
+
+    :param file: Path of the table.
+    :param type: 'path', 'rn' or 'ko'.
+    :param block_size: Bytes parsed at a time, pyarrow raises ArrowInvalid when a row doesn't fit in a block.
+    :return: pyarrow.Table
+    '''
+    columns = ['ENTRY'] + DESCRIPTION_COLUMNS[type] + ['DBLINKS']
+    parts = [pa.schema([(name, pa.string()) for name in ['ID', 'DESCRIPTION', 'DBLINKS']]).empty_table()]
+    # The raw columns of a block are dropped as soon as its ID and DESCRIPTION are derived
+    with pa_csv.open_csv(file, **csv_options(file, type, columns, block_size)) as reader:
+        for batch in reader:
+            block = pa.Table.from_batches([batch])
+            derived = derive_columns(block, type)
+            parts.append(pa.table({'ID': derived['ID'], 'DESCRIPTION': derived['DESCRIPTION'],
+                                   'DBLINKS': block.column('DBLINKS')}).drop_null())
+    return pa.concat_tables(parts)
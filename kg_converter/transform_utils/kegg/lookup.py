@@ -0,0 +1,118 @@
+from typing import Dict, NamedTuple, Optional
+
+import pandas as pd
+
+"""
+In-memory lookup of KEGG entries used by the KEGG transform.
+
+The 'list' files and the pruned 'kegg-*.tsv' tables are read once per run and
+indexed by KEGG ID, so every node in a link file resolves with a dict lookup.
+"""
+
+
+class KEGGEntry(NamedTuple):
+    name: str
+    synonyms: str
+    description: str
+    xrefs: Optional[str]
+
+
+class KEGGLookup:
+
+    def __init__(self, list_files: Dict[str, str], desc_dict: Dict[str, pd.DataFrame]) -> None:
+        '''
+        Build the lookup indices.
+
+        :param list_files: Path of the 'list' file for each KEGG db ('cpd', 'rn', 'pathway', 'ko').
+        :param desc_dict: Pruned description DataFrame (ID, DESCRIPTION, DBLINKS) for each KEGG db.
+        '''
+        self.names: Dict[str, Dict[str, str]] = {}
+        self.descriptions: Dict[str, Dict[str, str]] = {}
+        self.xrefs: Dict[str, Dict[str, str]] = {}
+        # Number of table rows indexed
+        self.rows = 0
+
+        for db, list_file in list_files.items():
+            self.add_names(db, pd.read_csv(list_file, sep='\t', low_memory=False))
+
+        for db, desc_df in desc_dict.items():
+            self.add_descriptions(db, desc_df)
+
+    def add_names(self, db: str, list_df: pd.DataFrame) -> None:
+        '''
+        Index the names of a 'list' file, or of a chunk of it.
+
+        :param db: KEGG db of the list ('cpd', 'rn', 'pathway', 'ko').
+        :param list_df: DataFrame with the columns '<db>Id' and '<db>'.
+        '''
+        self.update(self.names.setdefault(db, {}), self.index(list_df, db + 'Id', db))
+        self.rows += len(list_df)
+
+    def add_descriptions(self, db: str, desc_df: pd.DataFrame) -> None:
+        '''
+        Index the descriptions and xrefs of a pruned description table, or of a chunk of it.
+
+        :param db: KEGG db of the table ('rn', 'pathway', 'ko').
+        :param desc_df: DataFrame with the columns ID, DESCRIPTION and DBLINKS.
+        '''
+        self.update(self.descriptions.setdefault(db, {}), self.index(desc_df, 'ID', 'DESCRIPTION'))
+        self.update(self.xrefs.setdefault(db, {}), self.index(desc_df, 'ID', 'DBLINKS'))
+        self.rows += len(desc_df)
+
+    @staticmethod
+    def update(index: Dict[str, str], new: Dict[str, str]) -> None:
+        '''
+        Add entries to an index, keeping the first value seen for each key.
+        '''
+        if not index:
+            index.update(new)
+        else:
+            for key, value in new.items():
+                index.setdefault(key, value)
+
+    @staticmethod
+    def index(df: pd.DataFrame, key_col: str, value_col: str) -> Dict[str, str]:
+        '''
+        Map each value of key_col to value_col, keeping the first occurrence of a key.
+
+        :param df: Source DataFrame.
+        :param key_col: Column holding the keys.
+        :param value_col: Column holding the values.
+        :return: Dictionary of key -> value.
+        '''
+        df = df.drop_duplicates(subset=key_col, keep='first')
+        return dict(zip(df[key_col], df[value_col]))
+
+    @staticmethod
+    def list_id(key: str, kegg_id: str) -> str:
+        '''
+        ID under which an entry appears in its 'list' file. Organism-independent
+        pathway maps ('rn', 'ko') are listed under their 'map' counterpart.
+
+        :param key: Column name in the link file (e.g. 'pathwayId').
+        :param kegg_id: Prefixed KEGG ID (e.g. 'path:rn00010').
+        :return: Prefixed KEGG ID as listed.
+        '''
+        if key == 'pathwayId':
+            if 'rn' in kegg_id:
+                return kegg_id.replace('rn', 'map')
+            elif 'ko' in kegg_id:
+                return kegg_id.replace('ko', 'map')
+        return kegg_id
+
+    def get(self, key: str, kegg_id: str) -> KEGGEntry:
+        '''
+        Resolve a KEGG ID from a link file.
+
+        :param key: Column name in the link file (e.g. 'cpdId').
+        :param kegg_id: Prefixed KEGG ID (e.g. 'cpd:C00022').
+        :return: KEGGEntry; xrefs is None when the ID has no DBLINKS record.
+        '''
+        db = key[:-2]
+        core_id = kegg_id.split(':')[1]
+        names = self.names[db][self.list_id(key, kegg_id)]
+
+        return KEGGEntry(name=names.split(';')[0],
+                         synonyms=' | '.join(names.split(';')[1:]).strip(),
+                         description=self.descriptions.get(db, {}).get(core_id, ''),
+                         xrefs=self.xrefs.get(db, {}).get(core_id))
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+"""
+Manifest of an incremental KEGG transform.
+
+Records a content hash of every input file and the configuration the outputs
+were built with, so the next run can tell which link files changed. Each link
+file's nodes and edges are kept as a 'part' next to the outputs, and only the
+parts of changed link files are recomputed.
+"""
+
+MANIFEST_FILE = 'manifest.json'
+HASH_BLOCK_BYTES = 1 << 20
+
+
+def file_hash(file: str) -> str:
+    '''
+    SHA-256 of a file's content.
+
+    :param file: Path of the file.
+    :return: Hex digest.
+    '''
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def input_hashes(files: Iterable[str]) -> Dict[str, str]:
+    '''
+    Content hash of each input file, keyed by file name.
+    '''
+    return {os.path.basename(file): file_hash(file) for file in files}
+
+
+def read_manifest(output_dir: str) -> Optional[Dict[str, Any]]:
+    '''
+    Manifest of the previous run, None if there is none or it can't be read.
+
+    :param output_dir: Output directory of the transform.
+    '''
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(output_dir: str, manifest: Dict[str, Any]) -> None:
+    '''
+    Write the manifest of this run, atomically.
+
+    :param output_dir: Output directory of the transform.
+    :param manifest: Manifest with the 'config', 'inputs' and 'duplicates' of the run.
+    '''
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def remove_manifest(output_dir: str) -> None:
+    '''
+    Remove the manifest, e.g. when the outputs are rebuilt by a non-incremental run.
+    '''
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def changed_files(previous: Optional[Dict[str, Any]], current: Dict[str, Any], lookup_files: List[str],
+                  link_files: List[str]) -> List[str]:
+    '''
+    Link files whose part has to be recomputed.
+
+    All link files are recomputed when there is no previous manifest, when the
+    configuration changed or when a file the lookup is built from changed.
+
+    :param previous: Manifest of the previous run, or None.
+    :param current: Manifest of this run.
+    :param lookup_files: Names of the 'list' and 'kegg-*.tsv' files.
+    :param link_files: Names of the link files.
+    :return: Names of the changed link files, in the order of link_files.
+    '''
+    if previous is None or previous.get('config') != current['config']:
+        return list(link_files)
+    old, new = previous.get('inputs', {}), current['inputs']
+    if any(old.get(name) != new[name] for name in lookup_files):
+        return list(link_files)
+    return [name for name in link_files if old.get(name) != new[name]]
@@ -0,0 +1,116 @@
+import io
+import os
+from typing import Any, Dict, Iterator, List, Tuple
+
+from kg_converter.transform_utils.kegg.registry import GraphRegistry
+
+"""
+Process-pool helpers for the KEGG transform.
+
+Link files are cut into line-aligned byte ranges. Each worker transforms its
+ranges into headerless shard files, deduplicated locally, and the parent
+merges the shards in submission order against the run-wide GraphRegistry, so
+the output is identical to a serial run.
+"""
+
+MIN_CHUNK_BYTES = 1 << 20
+
+# Transform and lookup shared by all tasks of a worker process
+_worker_state: Dict[str, Any] = {}
+
+
+def chunk_offsets(file: str, n_chunks: int, min_chunk_bytes: int = MIN_CHUNK_BYTES) -> List[Tuple[int, int]]:
+    '''
+    Split the body of a link file (everything after the header) into line-aligned byte ranges.
+
+    :param file: The link file.
+    :param n_chunks: Maximum number of ranges.
+    :param min_chunk_bytes: Minimum size of a range.
+    :return: List of (start, end) byte offsets.
+    '''
+    with open(file, 'rb') as f:
+        f.readline()
+        header_end = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        n_chunks = max(1, min(n_chunks, (size - header_end) // max(1, min_chunk_bytes)))
+
+        bounds = [header_end]
+        for i in range(1, n_chunks):
+            f.seek(header_end + (size - header_end) * i // n_chunks)
+            f.readline()
+            if bounds[-1] < f.tell() < size:
+                bounds.append(f.tell())
+        bounds.append(size)
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def read_chunk(file: str, offsets: Tuple[int, int]) -> Iterator[str]:
+    '''
+    Lines of a link file within a byte range.
+
+    :param file: The link file.
+    :param offsets: (start, end) byte offsets, aligned on line starts.
+    :return: Iterator over the lines.
+    '''
+    start, end = offsets
+    with open(file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return iter(io.StringIO(data.decode()))
+
+
+def init_worker(transform: Any, lookup: Any) -> None:
+    '''
+    Pool initializer: receive the transform and lookup once per worker process.
+    '''
+    _worker_state['transform'] = transform
+    _worker_state['lookup'] = lookup
+
+
+def transform_shard(file: str, offsets: Tuple[int, int], shard_node_file: str,
+                    shard_edge_file: str) -> Dict[str, Dict[str, int]]:
+    '''
+    Transform one byte range of a link file into headerless shard files.
+
+    :param file: The link file.
+    :param offsets: (start, end) byte offsets of the range.
+    :param shard_node_file: Node shard to write.
+    :param shard_edge_file: Edge shard to write.
+    :return: Duplicate counts found within the shard, per file.
+    '''
+    transform = _worker_state['transform']
+    transform.output_node_file = shard_node_file
+    transform.output_edge_file = shard_edge_file
+
+    registry = GraphRegistry()
+    transform.post_data(file, registry, _worker_state['lookup'], 'a', offsets)
+    return {source: dict(counts) for source, counts in registry.duplicates.items()}
+
+
+def transform_frames(file: str) -> Any:
+    '''
+    Run the vectorized engine on a whole link file in a worker.
+
+    :param file: The link file.
+    :return: Node and edge DataFrames of this file.
+    '''
+    return _worker_state['transform'].post_data_vectorized(file, _worker_state['lookup'])
+
+
+def merge_shards(shards: List[Tuple[str, str, str]], registry: GraphRegistry, node: Any, edge: Any) -> None:
+    '''
+    Append shards to the node and edge files, in order, skipping nodes and edges already registered.
+
+    :param shards: List of (source, node shard, edge shard).
+    :param registry: Run-wide GraphRegistry.
+    :param node: NodeEdgeWriter of the node file.
+    :param edge: NodeEdgeWriter of the edge file.
+    '''
+    for source, shard_node_file, _ in shards:
+        with open(shard_node_file, 'r') as f:
+            node.write_lines(line for line in f if registry.add_node(line.split('\t', 1)[0], source))
+
+    for source, _, shard_edge_file in shards:
+        with open(shard_edge_file, 'r') as f:
+            edge.write_lines(line for line in f if registry.add_edge(*line.split('\t')[0:3:2], source))
@@ -0,0 +1,153 @@
+import bisect
+import logging
+import os
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from kg_converter.transform_utils.kegg import dedup
+from kg_converter.utils import profile_utils
+
+"""
+Run-wide registry of the nodes and edges emitted by the KEGG transform.
+
+Node CURIEs are interned to dense integers and edges are stored as a single
+integer packing the subject and object IDs, so deduplication across all link
+files costs one int per edge instead of a concatenated CURIE string. For
+organism-scale graphs the nodes and edges can be deduplicated by one of the
+other key sets of the dedup module instead.
+"""
+
+EDGE_KEY_BITS = 32
+
+
+class GraphRegistry:
+
+    def __init__(self, backend: str = 'interned', tmp_dir: Optional[str] = None,
+                 link_rows: Optional[int] = None) -> None:
+        '''
+        :param backend: Dedup backend, one of dedup.DEDUP_BACKENDS.
+        :param tmp_dir: Directory for the temporary files of the 'external' and 'bloom' backends.
+        :param link_rows: Number of link rows to deduplicate, sizing the Bloom filters: one edge
+            and two nodes per row at most.
+        '''
+        self.node_ids: Dict[str, int] = {}
+        self.edge_keys: Set[int] = set()
+        self.duplicates: Dict[str, Counter] = defaultdict(Counter)
+        # Key sets replacing node_ids and edge_keys, None for the 'interned' backend
+        self.key_sets = {
+            'nodes': dedup.key_set(backend, tmp_dir, 2 * link_rows if link_rows else None),
+            'edges': dedup.key_set(backend, tmp_dir, link_rows)
+        }
+        # Rows written so far, and the (first row, source) of each run of rows from the same file,
+        # to attribute the duplicates found by deferred key sets
+        self.rows: Dict[str, int] = Counter()
+        self.sources: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+
+    def intern(self, node_id: str) -> int:
+        '''
+        Integer ID of a node CURIE, assigned on first sight.
+
+        :param node_id: Node CURIE.
+        :return: Dense integer ID.
+        '''
+        return self.node_ids.setdefault(node_id, len(self.node_ids))
+
+    def add_node(self, node_id: str, source: str = '') -> bool:
+        '''
+        Register a node.
+
+        :param node_id: Node CURIE.
+        :param source: Name of the file the node comes from, for the duplicate report.
+        :return: True if the node is new and should be written out.
+        '''
+        if self.key_sets['nodes'] is not None:
+            return self.add_key('nodes', node_id, source)
+        if node_id in self.node_ids:
+            self.duplicates[source]['nodes'] += 1
+            return False
+        self.intern(node_id)
+        return True
+
+    def add_edge(self, subject: str, object: str, source: str = '') -> bool:
+        '''
+        Register an edge by its subject and object.
+
+        :param subject: Subject CURIE.
+        :param object: Object CURIE.
+        :param source: Name of the file the edge comes from, for the duplicate report.
+        :return: True if the edge is new and should be written out.
+        '''
+        if self.key_sets['edges'] is not None:
+            return self.add_key('edges', subject + '\t' + object, source)
+        key = (self.intern(subject) << EDGE_KEY_BITS) | self.intern(object)
+        if key in self.edge_keys:
+            self.duplicates[source]['edges'] += 1
+            return False
+        self.edge_keys.add(key)
+        return True
+
+    def add_key(self, kind: str, key: str, source: str) -> bool:
+        '''
+        Register a node or edge key in its key set.
+
+        :param kind: 'nodes' or 'edges'.
+        :param key: Node CURIE, or subject and object CURIEs joined by a tab.
+        :param source: Name of the file the key comes from, for the duplicate report.
+        :return: True if the row should be written out.
+        '''
+        key_set = self.key_sets[kind]
+        if not key_set.add(key):
+            self.duplicates[source][kind] += 1
+            return False
+        if key_set.deferred:
+            sources = self.sources[kind]
+            if not sources or sources[-1][1] != source:
+                sources.append((self.rows[kind], source))
+            self.rows[kind] += 1
+        return True
+
+    def finish(self, node_file: str, edge_file: str) -> None:
+        '''
+        Drop the duplicates that deferred key sets let through from the node and edge files,
+        keeping first occurrences. Nothing to do for the other backends.
+
+        :param node_file: Node file written with this registry.
+        :param edge_file: Edge file written with this registry.
+        '''
+        keys = {
+            'nodes': (node_file, lambda line: line.split('\t', 1)[0]),
+            'edges': (edge_file, lambda line: '\t'.join(line.split('\t')[0:3:2]))
+        }
+        for kind, (file, key) in keys.items():
+            key_set = self.key_sets[kind]
+            if key_set is None or not key_set.deferred or not self.rows[kind]:
+                continue
+            starts = [row for row, _ in self.sources[kind]]
+            with profile_utils.stage('deduplicate ' + os.path.basename(file)):
+                for row in dedup.drop_rows(file, key_set.duplicates(dedup.file_keys(file, key))):
+                    source = self.sources[kind][bisect.bisect_right(starts, row) - 1][1]
+                    self.duplicates[source][kind] += 1
+
+    def record_duplicates(self, source: str, nodes: int = 0, edges: int = 0) -> None:
+        '''
+        Add duplicate counts found outside of add_node/add_edge (e.g. by a vectorized engine).
+
+        :param source: Name of the file the duplicates come from.
+        :param nodes: Number of duplicate nodes.
+        :param edges: Number of duplicate edges.
+        '''
+        self.duplicates[source]['nodes'] += nodes
+        self.duplicates[source]['edges'] += edges
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        '''
+        Log and return the number of duplicate nodes and edges skipped per file.
+
+        :return: Dictionary of file name -> {'nodes': count, 'edges': count}.
+        '''
+        report = {source: {'nodes': counts['nodes'], 'edges': counts['edges']}
+                  for source, counts in self.duplicates.items()}
+        for source, counts in report.items():
+            logging.info('{}: skipped {} duplicate nodes and {} duplicate edges'
+                         .format(source, counts['nodes'], counts['edges']))
+        return report
@@ -0,0 +1,313 @@
+import csv
+import json
+import logging
+import os
+import sqlite3
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from kg_converter.__version__ import __version__
+from kg_converter.transform_utils.kegg import manifest, streaming
+from kg_converter.utils import profile_utils
+
+"""
+SQLite store of the raw KEGG tables, read by the 'sqlite' engine of the KEGG
+transform and open to ad-hoc queries.
+
+The files of the input directory are loaded chunk by chunk into one database
+(<input_dir>/kegg.sqlite), one table per file named after it ('kegg-ko.tsv'
+becomes kegg_ko):
+
+    'list' files        id, name
+    link files          line, the two ID columns, and for each of them
+                        <column>_list (ID as listed) and <column>_core (no prefix)
+    'conv' files        their columns
+    'kegg-*.tsv' files  id (first word of ENTRY), then their columns, for the
+                        ones with descriptions and kegg-compounds.tsv alike
+    desc_<db>           id, description, dblinks: the pruned 'kegg-*.tsv' table
+                        the transform resolves descriptions and xrefs from
+    meta                hashes of the input files and configuration
+
+ID columns are indexed. The store is built in a temporary file, and only
+rebuilt when an input file or the configuration changed.
+"""
+
+STORE_FILE = 'kegg.sqlite'
+META_KEY = 'manifest'
+
+
+def table_name(file: str) -> str:
+    '''
+    Name of the table of a file, e.g. kegg_ko for 'kegg-ko.tsv'.
+    '''
+    return os.path.splitext(os.path.basename(file))[0].replace('-', '_')
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def list_ids(key: str, ids: pd.Series) -> pd.Series:
+    '''
+    IDs under which the entries of a link file column appear in their 'list' file,
+    'path:map' for the organism-independent pathway maps ('path:rn', 'path:ko').
+    '''
+    if key == 'pathwayId':
+        return ids.str.replace(r'^path:(rn|ko)', 'path:map', regex=True)
+    return ids
+
+
+class KEGGStore:
+
+    def __init__(self, path: str) -> None:
+        '''
+        Open a store built by build_store, read-only.
+
+        :param path: Path of the database.
+        '''
+        self.path = path
+        self.connection = sqlite3.connect('file:{}?mode=ro'.format(path), uri=True)
+        self.tables = {row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        # 'list' file of each KEGG db
+        self.lists: Dict[str, str] = json.loads(read_meta_value(self.connection))['lists']
+
+    def __enter__(self) -> 'KEGGStore':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def query(self, sql: str, params: Tuple = ()) -> pd.DataFrame:
+        '''
+        Run an ad-hoc query.
+
+        :param sql: SQL query, e.g. "SELECT * FROM compounds WHERE id = ?".
+        :param params: Values of its placeholders.
+        :return: DataFrame of the result.
+        '''
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    def resolved_links(self, link_file: str, budget: streaming.ChunkBudget) -> Iterator[pd.DataFrame]:
+        '''
+        Rows of a link file joined with the name, description and xrefs of both IDs, in line order.
+
+        :param link_file: Link file loaded in the store.
+        :param budget: ChunkBudget giving the number of rows of the next chunk.
+        :return: Iterator over DataFrames with the ID columns, and <column>_name, <column>_description
+            and <column>_dblinks for each of them (None where missing).
+        '''
+        table = table_name(link_file)
+        keys = [row[1] for row in self.connection.execute('PRAGMA table_info({})'.format(quote(table)))
+                if row[1] != 'line' and not row[1].endswith(('_list', '_core'))]
+        select, joins = ['l.' + quote(key) for key in keys], []
+        for i, key in enumerate(keys):
+            db = key[:-2]
+            select.append('n{}.name AS {}'.format(i, quote(key + '_name')))
+            joins.append('LEFT JOIN {} n{i} ON n{i}.id = l.{}'.format(
+                quote(table_name(self.lists[db])), quote(key + '_list'), i=i))
+            if 'desc_' + db in self.tables:
+                select.append('d{}.description AS {}'.format(i, quote(key + '_description')))
+                select.append('d{}.dblinks AS {}'.format(i, quote(key + '_dblinks')))
+                joins.append('LEFT JOIN {} d{i} ON d{i}.id = l.{}'.format(
+                    quote('desc_' + db), quote(key + '_core'), i=i))
+            else:
+                select.append('NULL AS {}'.format(quote(key + '_description')))
+                select.append('NULL AS {}'.format(quote(key + '_dblinks')))
+        cursor = self.connection.execute('SELECT {} FROM {} l {} ORDER BY l.line'.format(
+            ', '.join(select), quote(table), ' '.join(joins)))
+        columns = [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(budget.chunk_size)
+            if not rows:
+                return
+            yield pd.DataFrame.from_records(rows, columns=columns)
+            budget.check()
+
+
+def read_meta_value(connection: sqlite3.Connection) -> str:
+    return connection.execute('SELECT value FROM meta WHERE key = ?', (META_KEY,)).fetchone()[0]
+
+
+def read_store_manifest(path: str) -> Optional[Dict[str, Any]]:
+    '''
+    Manifest the store was built with, None if there is no readable store.
+    '''
+    if not os.path.exists(path):
+        return None
+    try:
+        connection = sqlite3.connect('file:{}?mode=ro'.format(path), uri=True)
+        try:
+            return json.loads(read_meta_value(connection))
+        finally:
+            connection.close()
+    except (sqlite3.Error, TypeError, ValueError):
+        return None
+
+
+def load_chunks(connection: sqlite3.Connection, table: str, chunks: Iterator[pd.DataFrame],
+                primary_key: Optional[str] = None) -> int:
+    '''
+    Create a table with the columns of the first chunk and insert all chunks.
+
+    :param connection: Database being built.
+    :param table: Name of the table.
+    :param chunks: DataFrames with the same columns.
+    :param primary_key: Column whose first row per value is kept (as in KEGGLookup), none by default.
+    :return: Number of rows read.
+    '''
+    rows = 0
+    insert = None
+    for chunk in chunks:
+        if insert is None:
+            columns = ', '.join('{} {}{}'.format(quote(c),
+                                                 'INTEGER' if pd.api.types.is_integer_dtype(chunk[c]) else 'TEXT',
+                                                 ' PRIMARY KEY' if c == primary_key else '')
+                                for c in chunk.columns)
+            connection.execute('CREATE TABLE {} ({})'.format(quote(table), columns))
+            insert = 'INSERT OR IGNORE INTO {} VALUES ({})'.format(quote(table), ', '.join('?' * len(chunk.columns)))
+        # NaN as NULL
+        connection.executemany(insert, chunk.astype(object).where(chunk.notna(), None).itertuples(index=False))
+        rows += len(chunk)
+    return rows
+
+
+def build_store(path: str, list_dict: Dict[str, str], desc_tables: Dict[str, Tuple[str, List[str], str]],
+                link_files: List[str], conv_files: List[str], get_files: List[str],
+                prune: Callable[[pd.DataFrame, str], pd.DataFrame], budget: streaming.ChunkBudget,
+                current: Dict[str, Any]) -> None:
+    '''
+    Load the raw KEGG tables into a new store, replacing path once complete.
+
+    :param path: Path of the database.
+    :param list_dict: Path of the 'list' file for each KEGG db.
+    :param desc_tables: (path, columns used, type for prune) of the 'kegg-*.tsv' table for each KEGG db.
+    :param link_files: Link files.
+    :param conv_files: 'conv' files.
+    :param get_files: Other 'kegg-*.tsv' tables, without descriptions, e.g. kegg-compounds.tsv.
+    :param prune: Function pruning a chunk of a 'kegg-*.tsv' table to ID, DESCRIPTION and DBLINKS
+        (KEGGTransform.prune_columns).
+    :param budget: ChunkBudget of the chunks read.
+    :param current: Manifest recorded in the meta table, from store_manifest.
+    '''
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    connection.execute('PRAGMA journal_mode = OFF')
+    connection.execute('PRAGMA synchronous = OFF')
+    indexes = []
+    try:
+        with profile_utils.stage('build store') as stage:
+            for db, list_file in list_dict.items():
+                chunks = (chunk.set_axis(['id', 'name'], axis=1)
+                          for chunk in streaming.read_chunks(list_file, budget, dtype=str, usecols=[0, 1]))
+                stage.rows_in += load_chunks(connection, table_name(list_file), chunks, primary_key='id')
+
+            for link_file in link_files:
+                stage.rows_in += load_chunks(connection, table_name(link_file), link_chunks(link_file, budget),
+                                             primary_key='line')
+                keys = [row[1] for row in connection.execute('PRAGMA table_info({})'.format(
+                    quote(table_name(link_file))))][1:3]
+                indexes += [(table_name(link_file), key) for key in keys]
+
+            for conv_file in conv_files:
+                chunks = streaming.read_chunks(conv_file, budget, dtype=str)
+                stage.rows_in += load_chunks(connection, table_name(conv_file), chunks)
+                columns = [row[1] for row in connection.execute('PRAGMA table_info({})'.format(
+                    quote(table_name(conv_file))))]
+                indexes += [(table_name(conv_file), column) for column in columns]
+
+            for table in [table for table, _, _ in desc_tables.values()] + get_files:
+                stage.rows_in += load_chunks(connection, table_name(table), entry_chunks(table, budget))
+                indexes.append((table_name(table), 'id'))
+
+            for db, (table, usecols, type) in desc_tables.items():
+                chunks = (prune(chunk, type).set_axis(['id', 'description', 'dblinks'], axis=1)
+                          for chunk in streaming.read_chunks(table, budget, usecols=usecols, dtype=str))
+                stage.rows_out += load_chunks(connection, 'desc_' + db, chunks, primary_key='id')
+
+            for table, column in indexes:
+                connection.execute('CREATE INDEX {} ON {} ({})'.format(
+                    quote('{}_{}'.format(table, column)), quote(table), quote(column)))
+            connection.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+            connection.execute('INSERT INTO meta VALUES (?, ?)', (META_KEY, json.dumps(current)))
+            connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, path)
+
+
+def entry_chunks(table: str, budget: streaming.ChunkBudget) -> Iterator[pd.DataFrame]:
+    '''
+    Chunks of a 'kegg-*.tsv' table, preceded by the id column (first word of ENTRY).
+    '''
+    for chunk in streaming.read_chunks(table, budget, dtype=str):
+        yield chunk.assign(id=chunk['ENTRY'].str.split(' ').str[0])[['id'] + list(chunk.columns)]
+
+
+def link_chunks(link_file: str, budget: streaming.ChunkBudget) -> Iterator[pd.DataFrame]:
+    '''
+    Chunks of a link file with line numbers, quotes removed as in KEGGTransform.link_frames,
+    and the listed and core IDs of both columns.
+    '''
+    line = 0
+    for links in streaming.read_chunks(link_file, budget, dtype=str, quoting=csv.QUOTE_NONE):
+        links = links.replace('"', '', regex=True)
+        links.columns = [x.replace('"', '') for x in links.columns]
+        chunk = pd.DataFrame({'line': range(line, line + len(links))}, index=links.index)
+        for key in links.columns:
+            chunk[key] = links[key]
+        for key in links.columns:
+            chunk[key + '_list'] = list_ids(key, links[key])
+            chunk[key + '_core'] = links[key].str.split(':').str[1]
+        line += len(links)
+        yield chunk
+
+
+def store_manifest(list_dict: Dict[str, str], desc_tables: Dict[str, Tuple[str, List[str], str]],
+                   link_files: List[str], conv_files: List[str], get_files: List[str],
+                   config: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Manifest of a store built from the given files and configuration.
+    '''
+    files = list(list_dict.values()) + [table for table, _, _ in desc_tables.values()] + link_files + conv_files \
+        + get_files
+    return {
+        'version': __version__,
+        'config': config,
+        'lists': {db: os.path.basename(list_file) for db, list_file in list_dict.items()},
+        'inputs': manifest.input_hashes(files)
+    }
+
+
+def open_store(path: str, list_dict: Dict[str, str], desc_tables: Dict[str, Tuple[str, List[str], str]],
+               link_files: List[str], conv_files: List[str], get_files: List[str],
+               prune: Callable[[pd.DataFrame, str], pd.DataFrame], budget: streaming.ChunkBudget,
+               config: Dict[str, Any]) -> KEGGStore:
+    '''
+    Open the store of the input files, (re)building it first if any of them or the configuration changed.
+
+    :param path: Path of the database.
+    :param list_dict: Path of the 'list' file for each KEGG db.
+    :param desc_tables: (path, columns used, type for prune) of the 'kegg-*.tsv' table for each KEGG db.
+    :param link_files: Link files.
+    :param conv_files: 'conv' files.
+    :param get_files: Other 'kegg-*.tsv' tables, without descriptions, e.g. kegg-compounds.tsv.
+    :param prune: Function pruning a chunk of a 'kegg-*.tsv' table (KEGGTransform.prune_columns).
+    :param budget: ChunkBudget of the chunks read.
+    :param config: Configuration the pruned tables depend on, e.g. the DBLINKS prefixes.
+    :return: KEGGStore
+    '''
+    with profile_utils.stage('hash inputs') as stage:
+        current = store_manifest(list_dict, desc_tables, link_files, conv_files, get_files, config)
+        stage.rows_in += len(current['inputs'])
+    if read_store_manifest(path) != current:
+        logging.info('Building KEGG store {}'.format(path))
+        build_store(path, list_dict, desc_tables, link_files, conv_files, get_files, prune, budget, current)
+    else:
+        logging.info('KEGG inputs unchanged, using store {}'.format(path))
+    return KEGGStore(path)
@@ -0,0 +1,66 @@
+import logging
+from typing import Iterator, Optional
+
+import pandas as pd
+
+from kg_converter.utils.memory_utils import current_rss
+
+"""
+Chunked readers for the streaming mode of the KEGG transform.
+
+Tables are read through generators of fixed-size DataFrame chunks. After each
+chunk the resident memory is compared with the configured budget, and the
+chunk size is halved while the process stays above it.
+"""
+
+DEFAULT_CHUNK_SIZE = 50000
+MIN_CHUNK_SIZE = 1000
+
+
+class ChunkBudget:
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, memory_budget: Optional[int] = None) -> None:
+        '''
+        :param chunk_size: Initial number of rows per chunk.
+        :param memory_budget: Target peak RSS in MiB, None for no limit.
+        '''
+        self.chunk_size = max(1, chunk_size)
+        self.memory_budget = memory_budget
+        self.over_budget = False
+
+    def check(self) -> None:
+        '''
+        Halve the chunk size when the process is above the memory budget.
+        '''
+        if self.memory_budget is None:
+            return
+        rss = current_rss()
+        if rss <= self.memory_budget * 2 ** 20:
+            return
+        if self.chunk_size > MIN_CHUNK_SIZE:
+            self.chunk_size = max(MIN_CHUNK_SIZE, self.chunk_size // 2)
+            logging.info('RSS {:.0f} MiB above budget of {} MiB, reading {} rows per chunk'
+                         .format(rss / 2 ** 20, self.memory_budget, self.chunk_size))
+        elif not self.over_budget:
+            logging.warning('RSS {:.0f} MiB above budget of {} MiB at the minimum chunk size'
+                            .format(rss / 2 ** 20, self.memory_budget))
+        self.over_budget = True
+
+
+def read_chunks(file: str, budget: ChunkBudget, **kwargs) -> Iterator[pd.DataFrame]:
+    '''
+    Read a TSV file as a generator of DataFrame chunks sized by the budget.
+
+    :param file: TSV file with a header line.
+    :param budget: ChunkBudget giving the number of rows of the next chunk.
+    :param kwargs: Extra arguments to pd.read_csv.
+    :return: Iterator over the chunks.
+    '''
+    with pd.read_csv(file, sep='\t', iterator=True, **kwargs) as reader:
+        while True:
+            try:
+                chunk = reader.get_chunk(budget.chunk_size)
+            except StopIteration:
+                return
+            yield chunk
+            budget.check()
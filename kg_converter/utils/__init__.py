@@ -1,7 +1,8 @@
 from .download_utils import download_from_yaml
-from .transform_utils import multi_page_table_to_list, write_node_edge_item
+from .transform_utils import multi_page_table_to_list, write_node_edge_item, NodeEdgeWriter
 
 
 __all__ = [
-    "download_from_yaml", "multi_page_table_to_list", "write_node_edge_item"
+    "download_from_yaml", "multi_page_table_to_list", "write_node_edge_item",
+    "NodeEdgeWriter"
 ]
\ No newline at end of file
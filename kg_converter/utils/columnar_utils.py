@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import gzip
+import os
+from typing import Any, List, Optional, Tuple
+
+from kg_converter.utils import profile_utils
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.compute as pc  # type: ignore
+    import pyarrow.csv as pa_csv  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except ImportError:
+    pa = None
+
+"""
+Columnar (Parquet or Arrow IPC) copies of KGX node and edge TSV files, for
+consumers that would otherwise parse the text again.
+
+Low-cardinality columns (category, predicate, relation) are dictionary-encoded,
+and pipe-delimited ones (exact_match, close_match) become lists of strings.
+Arrow IPC files are written uncompressed so that read_graph_table can map them
+into memory without copying.
+"""
+
+FORMATS = ['tsv', 'parquet', 'arrow']
+SUFFIXES = {'parquet': '.parquet', 'arrow': '.arrow'}
+DICTIONARY_COLUMNS = ['category', 'predicate', 'relation']
+LIST_COLUMNS = ['exact_match', 'close_match']
+# Separator of the values of LIST_COLUMNS, with the whitespace around it
+LIST_SEPARATOR = r'\s*\|\s*'
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("Parquet and Arrow output need pyarrow, install it with `pip install pyarrow` "
+                          "or `pip install kg-converter[columnar]`")
+
+
+def columnar_file(tsv_file: str, output_format: str) -> str:
+    """Path of the columnar copy of a TSV file, e.g. nodes.tsv.gz -> nodes.parquet"""
+    for extension in ('.gz', '.tsv'):
+        if tsv_file.endswith(extension):
+            tsv_file = tsv_file[:-len(extension)]
+    return tsv_file + SUFFIXES[output_format]
+
+
+def read_header(tsv_file: str) -> List[str]:
+    """Columns of a node or edge TSV file (possibly gzip-compressed), from its first line"""
+    with (gzip.open(tsv_file, 'rt') if tsv_file.endswith('.gz') else open(tsv_file)) as f:
+        return f.readline().rstrip('\r\n').split('\t')
+
+
+def read_tsv_table(tsv_file: str, header: List[str]) -> Any:
+    """Read a node or edge TSV file (possibly gzip-compressed) into an Arrow table, on all cores.
+
+    Args:
+        tsv_file: File written by NodeEdgeWriter.
+        header: Its columns, all read as strings.
+
+    Returns:
+        pyarrow.Table with empty values as empty strings.
+
+    """
+    require_pyarrow()
+    return pa_csv.read_csv(
+        tsv_file,
+        read_options=pa_csv.ReadOptions(block_size=1 << 24),
+        # Values are not quoted, NodeEdgeWriter escapes tabs and newlines instead
+        parse_options=pa_csv.ParseOptions(delimiter='\t', quote_char=False, escape_char=False),
+        convert_options=pa_csv.ConvertOptions(column_types={column: pa.string() for column in header},
+                                              strings_can_be_null=False, quoted_strings_can_be_null=False))
+
+
+def columnar_table(table: Any) -> Any:
+    """Dictionary-encode DICTIONARY_COLUMNS and split LIST_COLUMNS of a node or edge table"""
+    require_pyarrow()
+    empty = pa.scalar([], pa.list_(pa.string()))
+    for i, name in enumerate(table.column_names):
+        column = table.column(i)
+        if name in DICTIONARY_COLUMNS:
+            table = table.set_column(i, name, pc.dictionary_encode(column))
+        elif name in LIST_COLUMNS:
+            split = pc.split_pattern_regex(pc.utf8_trim_whitespace(column), LIST_SEPARATOR)
+            table = table.set_column(i, name, pc.if_else(pc.equal(column, ''), empty, split))
+    return table
+
+
+def write_graph_table(table: Any, output_file: str, output_format: str) -> None:
+    """Write a table as Parquet or Arrow IPC, atomically"""
+    require_pyarrow()
+    with profile_utils.stage('write ' + os.path.basename(output_file)) as stage:
+        if output_format == 'parquet':
+            pq.write_table(table, output_file + '.tmp', compression='zstd')
+        elif output_format == 'arrow':
+            with pa.OSFile(output_file + '.tmp', 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            raise ValueError('Unknown columnar format {}, expected one of {}'.format(output_format,
+                                                                                     list(SUFFIXES)))
+        os.replace(output_file + '.tmp', output_file)
+        stage.rows_out += table.num_rows
+
+
+def read_graph_table(file: str) -> Any:
+    """Read a table written by write_graph_table, memory-mapped.
+
+    Args:
+        file: .parquet or .arrow file.
+
+    Returns:
+        pyarrow.Table, convert with to_pandas() if need be.
+
+    """
+    require_pyarrow()
+    if file.endswith(SUFFIXES['arrow']):
+        with pa.memory_map(file) as source:
+            return pa.ipc.open_file(source).read_all()
+    return pq.read_table(file, memory_map=True)
+
+
+def write_columnar(node_file: str, edge_file: str, node_header: Optional[List[str]],
+                   edge_header: Optional[List[str]], output_format: str) -> Tuple[str, str]:
+    """Write columnar copies of a node and an edge TSV file next to them.
+
+    Args:
+        node_file: Node TSV file.
+        edge_file: Edge TSV file.
+        node_header: Columns of the node file, read from its first line if None.
+        edge_header: Columns of the edge file, read from its first line if None.
+        output_format: 'parquet' or 'arrow'.
+
+    Returns:
+        Paths of the node and edge copies.
+
+    """
+    outputs = []
+    for tsv_file, header in ((node_file, node_header), (edge_file, edge_header)):
+        output_file = columnar_file(tsv_file, output_format)
+        with profile_utils.stage('read ' + os.path.basename(tsv_file)) as stage:
+            table = columnar_table(read_tsv_table(tsv_file, header or read_header(tsv_file)))
+            stage.rows_out += table.num_rows
+        write_graph_table(table, output_file, output_format)
+        outputs.append(output_file)
+    return outputs[0], outputs[1]
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import csv
+import json
+import logging
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from kg_converter.utils import columnar_utils, profile_utils
+
+"""
+Export of a KGX graph as integer node IDs and CSR (compressed sparse row)
+adjacency, in .npy files that can be loaded with np.load(file, mmap_mode='r')
+without copying:
+
+    node_ids.npy        CURIE of each node ID, UTF-8 bytes ('S' dtype)
+    indptr.npy          int64, node_count + 1: out-edges of node i are at
+                        positions indptr[i] to indptr[i + 1] of the arrays below
+    indices.npy         int32 (int64 for huge graphs): object node ID of each edge
+    edge_predicates.npy int16 (int32 beyond): predicate code of each edge
+    edge_rows.npy       int64: row of each edge in the edge file
+    predicates.npy      predicate of each code, UTF-8 bytes ('S' dtype)
+    csr.json            counts and dtypes
+
+Node IDs follow the order of the node file. Subjects and objects missing from
+it get the next IDs, in order of appearance. Edges of a node follow the order of
+the edge file, duplicates included.
+"""
+
+CSR_FILES = ['node_ids', 'indptr', 'indices', 'edge_predicates', 'edge_rows', 'predicates']
+SUMMARY_FILE = 'csr.json'
+
+
+def read_graph_columns(file: str, columns: List[str]) -> pd.DataFrame:
+    """Read some columns of a node or edge file as strings.
+
+    Args:
+        file: KGX TSV file (possibly gzip-compressed), or its Parquet or Arrow copy (see columnar_utils).
+        columns: Columns to read.
+
+    Returns:
+        DataFrame of the columns.
+
+    """
+    if file.endswith(tuple(columnar_utils.SUFFIXES.values())):
+        return columnar_utils.read_graph_table(file).select(columns).to_pandas().astype(str)
+    return pd.read_csv(file, sep='\t', usecols=columns, dtype=str, keep_default_na=False,
+                       quoting=csv.QUOTE_NONE)
+
+
+def intern_ids(node_ids: pd.Series, subjects: pd.Series,
+               objects: pd.Series) -> Tuple[pd.Index, np.ndarray, np.ndarray]:
+    """Give each node CURIE a dense integer ID.
+
+    Args:
+        node_ids: CURIEs of the node file, in order.
+        subjects: Subject of each edge.
+        objects: Object of each edge.
+
+    Returns:
+        Index of the CURIEs by ID, and the IDs of the subjects and objects.
+
+    """
+    index = pd.Index(node_ids.drop_duplicates())
+    sources, targets = index.get_indexer(subjects), index.get_indexer(objects)
+    missing = np.concatenate([subjects.values[sources < 0], objects.values[targets < 0]])
+    if len(missing):
+        logging.warning('{} nodes of the edges are missing from the node file'.format(len(pd.unique(missing))))
+        index = index.append(pd.Index(pd.unique(missing)))
+        sources, targets = index.get_indexer(subjects), index.get_indexer(objects)
+    return index, sources, targets
+
+
+def build_csr(sources: np.ndarray, targets: np.ndarray,
+              node_count: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sort edges by subject into CSR arrays.
+
+    Args:
+        sources: Subject ID of each edge.
+        targets: Object ID of each edge.
+        node_count: Number of node IDs.
+
+    Returns:
+        indptr, indices and the edge row of each position of indices.
+
+    """
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=node_count), out=indptr[1:])
+    index_dtype = np.int32 if node_count <= np.iinfo(np.int32).max else np.int64
+    return indptr, targets[order].astype(index_dtype), order.astype(np.int64)
+
+
+def save_array(file: str, array: np.ndarray) -> None:
+    """np.save, atomically"""
+    with open(file + '.tmp', 'wb') as f:
+        np.save(f, array)
+    os.replace(file + '.tmp', file)
+
+
+def strings_array(values: Any) -> np.ndarray:
+    """Fixed-width UTF-8 byte strings, which unlike object arrays can be memory-mapped"""
+    return np.array([str(value).encode() for value in values], dtype=np.bytes_)
+
+
+def export_csr(node_file: str, edge_file: str, output_dir: str) -> Dict[str, Any]:
+    """Export a graph as integer node IDs and CSR adjacency arrays.
+
+    Args:
+        node_file: KGX node file, TSV or columnar.
+        edge_file: KGX edge file, TSV or columnar.
+        output_dir: Directory to write the .npy files to.
+
+    Returns:
+        Summary of the export, also written to output_dir/csr.json.
+
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with profile_utils.stage('read graph') as stage:
+        nodes = read_graph_columns(node_file, ['id'])
+        edges = read_graph_columns(edge_file, ['subject', 'predicate', 'object'])
+        stage.rows_in += len(nodes) + len(edges)
+
+    with profile_utils.stage('intern ids') as stage:
+        index, sources, targets = intern_ids(nodes['id'], edges['subject'], edges['object'])
+        predicate_codes, predicates = pd.factorize(edges['predicate'], sort=True)
+        predicate_dtype = np.int16 if len(predicates) <= np.iinfo(np.int16).max else np.int32
+        stage.rows_out += len(index)
+
+    with profile_utils.stage('build csr') as stage:
+        indptr, indices, rows = build_csr(sources, targets, len(index))
+        arrays = {
+            'node_ids': strings_array(index),
+            'indptr': indptr,
+            'indices': indices,
+            'edge_predicates': predicate_codes[rows].astype(predicate_dtype),
+            'edge_rows': rows,
+            'predicates': strings_array(predicates)
+        }
+        stage.rows_out += len(indices)
+
+    with profile_utils.stage('write csr'):
+        for name in CSR_FILES:
+            save_array(os.path.join(output_dir, name + '.npy'), arrays[name])
+        summary = {
+            'node_count': len(index),
+            'node_file_count': int(nodes['id'].nunique()),
+            'edge_count': len(indices),
+            'predicate_count': len(predicates),
+            'dtypes': {name: str(arrays[name].dtype) for name in CSR_FILES}
+        }
+        with open(os.path.join(output_dir, SUMMARY_FILE), 'w') as f:
+            json.dump(summary, f, indent=2)
+    logging.info('Exported {} nodes and {} edges to {}'.format(summary['node_count'], summary['edge_count'],
+                                                             output_dir))
+    return summary
+
+
+def load_csr(output_dir: str) -> Dict[str, np.ndarray]:
+    """Memory-map the arrays written by export_csr, by name (e.g. 'indptr')"""
+    return {name: np.load(os.path.join(output_dir, name + '.npy'), mmap_mode='r') for name in CSR_FILES}
@@ -2,9 +2,11 @@
 # -*- coding: utf-8 -*-
 
 
+import csv
 import logging
 import os
-from urllib.request import Request, urlopen
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Tuple
 
 import yaml
 from os import path
@@ -12,14 +14,23 @@ from tqdm.auto import tqdm  # type: ignore
 import pandas as pd
 import urllib3
 import io
-import time
 
-def parse_response(url: str)-> pd.DataFrame:
+from kg_converter.utils import fetch_utils, flatfile_utils, journal_utils, profile_utils, sync_utils, transfer_utils
+
+# Maximum number of entries per KEGG 'GET' request
+GET_BATCH_SIZE = 10
+# Number of download.yaml files downloaded at once
+DEFAULT_JOBS = 4
+# Operations of the KEGG REST API handled by download_from_yaml, other URLs are downloaded as they are
+KEGG_OPERATIONS = ['list', 'link', 'conv', 'get']
+
+
+def response_columns(url: str) -> List[str]:
     '''
-    Implement the KEGG API to get 'LIST', 'LINK' and 'CONV' of relevant information and returns a pandas dataframe.
+    Column names of a 'LIST', 'LINK' or 'CONV' response, derived from its URL.
 
     :param url: URL of the REST API
-    :return: Pandas DataFrame.
+    :return: List of the two column names.
     '''
     col_1 = ''
     col_2 = ''
@@ -34,107 +45,387 @@ def parse_response(url: str)-> pd.DataFrame:
         col_1 = url.split('/')[5]+'Id'
         col_2 = url.split('/')[4]+'Id'
     
-    cols = [col_1, col_2]
-    df = pd.DataFrame(columns=cols)
-    http = urllib3.PoolManager()
-    pathway_response = http.request('GET', url, preload_content=False)
-    pathway_response.auto_close=False
+    return [col_1, col_2]
 
-    for line in io.TextIOWrapper(pathway_response):
-        df = df.append(pd.Series(line.strip('\n').split('\t'),index = df.columns), ignore_index=True)
-    return df
 
+def response_rows(response: Any, columns: List[str]) -> Iterator[List[str]]:
+    '''
+    Read the tab separated lines of a 'LIST', 'LINK' or 'CONV' response one at a time.
 
-def has_digit(string: str) -> bool:
+    :param response: Streamed urllib3 response.
+    :param columns: Column names, every line must have one value per column.
+    :return: Iterator of rows.
     '''
-    Simple function to check if a string is alphanumeric or not.
+    response.auto_close = False
+    for line in io.TextIOWrapper(response, encoding='utf-8'):
+        row = line.strip('\n').split('\t')
+        if len(row) != len(columns):
+            raise ValueError('Expected {} columns, got {}: {}'.format(len(columns), len(row), line))
+        yield row
 
-    :param string: String
-    :return: bool (True/False)
-    
+
+def stream_response(url: str, output_file: str, session: Optional[fetch_utils.Session] = None,
+                    limiter: Optional[fetch_utils.TokenBucket] = None) -> int:
+    '''
+    Implement the KEGG API to get 'LIST', 'LINK' and 'CONV' of relevant information and
+    stream it to a TSV file, one line at a time, without building a DataFrame.
+
+    The file is written as DataFrame.to_csv(sep='\t', index=False) would, under a
+    temporary name renamed when complete, so an interrupted download isn't taken
+    for a cached file. A response cut short is downloaded again.
+
+    :param url: URL of the REST API
+    :param output_file: TSV file to write.
+    :param session: HTTP session of the download, a new one by default.
+    :param limiter: Rate limit shared with other requests, none by default.
+    :return: Number of rows written.
+    '''
+    columns = response_columns(url)
+    session = session or fetch_utils.Session()
+    tmp_file = output_file + '.tmp'
+    try:
+        # Failed requests and broken bodies take from the same retries, one request per attempt
+        for attempt in range(session.retries + 1):
+            response, error, retry_after = session.send(url, attempt, limiter)
+            if error is None:
+                if response is None:
+                    raise fetch_utils.FetchError('GET {} failed with status 404'.format(url))
+                rows = 0
+                try:
+                    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+                        writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+                        writer.writerow(columns)
+                        for row in response_rows(response, columns):
+                            writer.writerow(row)
+                            rows += 1
+                except urllib3.exceptions.HTTPError as e:
+                    # Body cut short or read timeout
+                    session.stats.record_broken_body()
+                    error = str(e)
+                else:
+                    os.replace(tmp_file, output_file)
+                    return rows
+                finally:
+                    session.release(response)
+            session.back_off(url, error, attempt, retry_after, limiter)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    raise fetch_utils.FetchError('GET {} failed'.format(url))
+
+
+def parse_response(url: str, session: Optional[fetch_utils.Session] = None)-> pd.DataFrame:
+    '''
+    Implement the KEGG API to get 'LIST', 'LINK' and 'CONV' of relevant information and returns a pandas dataframe.
+
+    Downloads use stream_response, which doesn't hold the response in memory.
+
+    :param url: URL of the REST API
+    :param session: HTTP session of the download, a new one by default.
+    :return: Pandas DataFrame.
+    '''
+    columns = response_columns(url)
+    session = session or fetch_utils.Session()
+    with session.stream(url) as response:
+        return pd.DataFrame(list(response_rows(response, columns)), columns=columns)
+
+
+def parse_get_entry(text: str) -> dict:
+    '''
+    Parse one KEGG flat file entry, as returned by the 'GET' operation, into a row of a 'kegg-*.tsv' table.
+
+    Fields are read by column position, see flatfile_utils, which also parses
+    flat files into structured records.
+
+    :param text: Flat file text of the entry.
+    :return: Dictionary of field -> value.
+    '''
+    return flatfile_utils.flatten(next(flatfile_utils.iter_fields(io.StringIO(text)), []))
+
+
+def split_get_entries(text: str) -> Dict[str, str]:
+    '''
+    Split a multi-entry 'GET' response into its flat file records.
+
+    :param text: Concatenated flat file records, each terminated by a '///' line.
+    :return: Dictionary of entry ID (from the ENTRY line, e.g. 'K00873') -> record text.
+    '''
+    entries = {}
+    record: List[str] = []
+    for line in io.StringIO(text):
+        record.append(line)
+        if line.rstrip() == '///':
+            if record[0].startswith('ENTRY') and len(record[0].split()) > 1:
+                entries[record[0].split()[1]] = ''.join(record)
+            record = []
+    return entries
+
+
+def read_get_ids(output_dir: str, fn: str) -> List[str]:
     '''
-    for s in string:
-        if s.isdigit():
-            return True
-    return False
+    IDs to 'GET', from the first column of a 'LIST' file.
+
+    :param output_dir: The target location for the data file
+    :param fn: Filename of the 'LIST' file, without its .tsv extension.
+    :return: List of IDs.
+    '''
+    df = pd.read_csv(os.path.join(output_dir, fn+'.tsv'), sep='\t')
+    return list(df[df.columns[0]])
+
 
-def parse_response_get(url: str, output_dir: str, fn: str)-> pd.DataFrame:
+def download_get_entries(url: str, ids: List[str], journal_file: Optional[str] = None,
+                         concurrency: int = fetch_utils.DEFAULT_CONCURRENCY, rate: float = fetch_utils.KEGG_RATE,
+                         batch_size: int = GET_BATCH_SIZE,
+                         session: Optional[fetch_utils.Session] = None,
+                         limiter: Optional[fetch_utils.TokenBucket] = None) -> Dict[str, str]:
+    '''
+    Implement the KEGG API to 'GET' the flat file records of entries.
+
+    IDs are requested batch_size at a time ('get/<id>+<id>+...'), and each record
+    of the response is mapped back to its ID. Entries missing from a response are
+    requested again one by one. Requests are sent concurrently under a global
+    rate limit.
+
+    Records are appended to the journal file as their batch completes. Entries
+    already in the journal are not requested again, so a download that died
+    halfway resumes where it stopped.
+
+    :param url: URL of the REST API
+    :param ids: IDs of the entries.
+    :param journal_file: Checkpoint journal of the records, None to keep them in memory only.
+    :param concurrency: Number of requests in flight.
+    :param rate: Maximum number of requests per second.
+    :param batch_size: Number of entries per request, at most 10 for KEGG.
+    :param session: HTTP session of the download, a new one sized for the concurrency by default.
+    :param limiter: Rate limit shared with other downloads, replacing rate, none by default.
+    :return: Dictionary of ID -> record, empty for entries that don't exist.
+    '''
+    session = session or fetch_utils.Session(maxsize=concurrency)
+    limiter = limiter or fetch_utils.TokenBucket(rate)
+    retried = []
+
+    def get_batch(batch: List[str]) -> List[Tuple[str, str]]:
+        entries = split_get_entries(session.get(url+'+'.join(batch), limiter).decode())
+        # IDs of the list files carry a database prefix ('ko:K00873'), ENTRY lines don't
+        for id in batch:
+            if id.split(':')[-1] not in entries:
+                retried.append(id)
+                entries[id.split(':')[-1]] = session.get(url+id, limiter).decode()
+        return [(id, entries[id.split(':')[-1]]) for id in batch]
+
+    with journal_utils.Journal(journal_file) as journal:
+        todo = [id for id in dict.fromkeys(ids) if id not in journal.entries]
+        if journal.entries:
+            logging.info('Resuming from {}: {} entries left to download'.format(journal_file, len(todo)))
+        batch_size = max(1, batch_size)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = [pool.submit(get_batch, todo[i:i + batch_size]) for i in range(0, len(todo), batch_size)]
+            try:
+                for future in futures:
+                    for id, record in future.result():
+                        journal.add(id, record)
+                    journal.flush()
+            except BaseException:
+                # Don't download the rest of the batches just to lose them
+                for future in futures:
+                    future.cancel()
+                raise
+        if retried:
+            logging.info('Requested {} entries missing from batched responses one by one'.format(len(retried)))
+        return journal.entries
+
+
+def assemble_get_table(ids: List[str], entries: Dict[str, str]) -> pd.DataFrame:
+    '''
+    Parse downloaded flat file records into a table, one row per ID. This step is offline.
+
+    :param ids: IDs, in the order of the rows.
+    :param entries: Dictionary of ID -> record, see download_get_entries and journal_utils.read_journal.
+    :return: Pandas DataFrame
+    '''
+    return pd.DataFrame([parse_get_entry(entries[id]) for id in ids])
+
+
+def parse_response_get(url: str, output_dir: str, fn: str, concurrency: int = fetch_utils.DEFAULT_CONCURRENCY,
+                       rate: float = fetch_utils.KEGG_RATE, batch_size: int = GET_BATCH_SIZE,
+                       session: Optional[fetch_utils.Session] = None,
+                       journal_file: Optional[str] = None)-> pd.DataFrame:
     '''
     Implement the KEGG API to 'GET' relevant information and returns a pandas dataframe.
 
+    The entries of a 'LIST' file are downloaded by download_get_entries and parsed
+    back in the order of the IDs, so the output does not depend on the concurrency
+    or the batch size.
+
     :param url: URL of the REST API
     :param output_dir: The target location for the data file
     :param fn: Filename of the target.
+    :param concurrency: Number of requests in flight.
+    :param rate: Maximum number of requests per second.
+    :param batch_size: Number of entries per request, at most 10 for KEGG.
+    :param session: HTTP session of the download, a new one sized for the concurrency by default.
+    :param journal_file: Checkpoint journal to resume from and append to, none by default.
 
     :return: Pandas DataFrame
 
     '''
-    list_of_dict = []
-    non_column_chars = ['-', ' ', ';']
-    file_path = os.path.join(output_dir, fn+'.tsv')
-    df = pd.read_csv(file_path, sep='\t')
-    df_id_col = df[df.columns[0]]
+    ids = read_get_ids(output_dir, fn)
+    entries = download_get_entries(url, ids, journal_file, concurrency, rate, batch_size, session)
+    return assemble_get_table(ids, entries)
 
-    
-    for id in df_id_col.iteritems():
-        dictionary = {}
-        last_key = ''
-        new_url = url+id[1]
-        http = urllib3.PoolManager()
-        pathway_response = http.request('GET', new_url, preload_content=False)
-        pathway_response.auto_close=False
-        
-        for line in io.TextIOWrapper(pathway_response):
-            line_elements = line.split('  ')
-            list_of_elements = [x.strip() for x in line_elements if x]
-
-
-            if list_of_elements[0].isupper() \
-                and not has_digit(list_of_elements[0]) \
-                and not any(map(list_of_elements[0].__contains__, non_column_chars)) \
-                and len(list_of_elements) > 1 \
-                and len(list_of_elements[0]) > 3:
-
-                last_key = list_of_elements[0]
-                        
-                if last_key == 'ENZYME':
-                    dictionary[last_key] = ' | '.join(list_of_elements[1:])
-                elif last_key in dictionary.keys():
-                    dictionary[last_key] += (' | '+'-'.join(list_of_elements[1:]))
-                else:
-                    dictionary[last_key] = ' '.join(list_of_elements[1:])
 
-            else:
-                if last_key == 'COMMENT':
-                        dictionary[last_key] += (' '+' '.join(list_of_elements))
-                else:
-                    dictionary[last_key] += (' | '+'-'.join(list_of_elements))
 
-            dictionary[last_key] = dictionary[last_key].replace(' | ///', '')
+class DownloadTask(NamedTuple):
+    """A file to download, with the files it needs to be downloaded first."""
+    name: str
+    run: Callable[[], None]
+    depends: FrozenSet[str] = frozenset()
 
-        list_of_dict.append(dictionary)
 
-    return pd.DataFrame(list_of_dict)
+def run_tasks(tasks: List[DownloadTask], jobs: int = DEFAULT_JOBS) -> None:
+    '''
+    Run download tasks concurrently, each once the tasks producing the files it depends on are done.
 
+    Files no task produces are taken to be there already. When a task fails,
+    the tasks not started yet are dropped and the error is raised once the
+    running ones finished.
+
+    :param tasks: Tasks, named after the file they produce.
+    :param jobs: Number of tasks running at once.
+    :return: None.
+    '''
+    pending = list(tasks)
+    running: Dict[Future, DownloadTask] = {}
+    error: Optional[BaseException] = None
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool, \
+            tqdm(total=len(tasks), desc="Downloading files") as progress:
+        while pending or running:
+            unfinished = {task.name for task in pending} | {task.name for task in running.values()}
+            for task in [task for task in pending if not task.depends & unfinished]:
+                pending.remove(task)
+                running[pool.submit(task.run)] = task
+            if not running:
+                raise ValueError('Circular dependencies between downloads: {}'.format(
+                    ', '.join(task.name for task in pending)))
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                progress.update()
+                if future.exception() is not None and error is None:
+                    logging.error('Download of {} failed: {}'.format(task.name, future.exception()))
+                    error = future.exception()
+                    pending = []
+    if error is not None:
+        raise error
 
 
 def download_from_yaml(yaml_file: str, output_dir: str,
-                       ignore_cache: bool = False) -> None:
+                       ignore_cache: bool = False, concurrency: int = fetch_utils.DEFAULT_CONCURRENCY,
+                       rate: float = fetch_utils.KEGG_RATE, jobs: int = DEFAULT_JOBS, sync: bool = False) -> None:
     """Given an download info from an download.yaml file, download all files
 
+    Independent items are downloaded concurrently (jobs at a time), all KEGG
+    requests sharing one rate limit. The 'get' step of each database waits for
+    its 'list' file.
+
+    With sync, cached KEGG files are brought up to date with the current KEGG
+    release instead of being used as they are, see sync_utils: 'list', 'link'
+    and 'conv' files of databases with a new release are downloaded again, and
+    only the new or changed entries of the 'get' tables are.
+
+    Other URLs are streamed to disk, resuming interrupted downloads and checked
+    against the item's 'checksum' if any, see transfer_utils. With sync, cached
+    ones are only downloaded again if they changed; ignore_cache downloads them
+    again regardless.
+
     :param yaml_file: A string pointing to the download.yaml file, to be parsed for things to download.
     :param output_dir: A string pointing to where to write out downloaded files.
     :param ignore_cache: Ignore cache and download files even if they exist [false]
+    :param concurrency: Number of KEGG 'GET' requests in flight [3]
+    :param rate: Maximum number of KEGG requests per second, across all downloads [3]
+    :param jobs: Number of files downloaded at once [4]
+    :param sync: Update cached files (KEGG ones to the current KEGG release) [false]
 
     :return: None.
     """
 
     os.makedirs(output_dir, exist_ok=True)
-    filename_list = []
-    nap_time = 10
+    # One pool of keep-alive connections and one rate budget for every download of the run
+    session = fetch_utils.Session(maxsize=max(concurrency, jobs))
+    limiter = fetch_utils.TokenBucket(rate)
+    tasks = []
+    previous_releases = sync_utils.read_releases(output_dir) if sync else {}
+    releases: Dict[str, Optional[str]] = {}
+    previous_files = []
+
+    def new_release(base_url: str, dbs: List[str]) -> bool:
+        # Whether any of the databases has a release other than the one the files were downloaded from
+        for db in dbs:
+            if db not in releases:
+                releases[db] = sync_utils.kegg_release(session, base_url, db, limiter)
+        return any(releases[db] is None or releases[db] != previous_releases.get(db) for db in dbs)
+
+    def write_table(df: pd.DataFrame, fn: str) -> None:
+        df.to_csv(os.path.join(output_dir, fn+'.tmp'), sep='\t', index=False)
+        os.replace(os.path.join(output_dir, fn+'.tmp'), os.path.join(output_dir, fn))
+
+    def list_task(url: str, fn: str) -> DownloadTask:
+        def run() -> None:
+            with profile_utils.stage('download ' + fn) as stage:
+                stage.rows_out += stream_response(url, os.path.join(output_dir, fn), session, limiter)
+        return DownloadTask(fn, run)
+
+    def get_task(url: str, element: str, fn: str) -> DownloadTask:
+        def run() -> None:
+            ids = read_get_ids(output_dir, element)
+            # Records are journaled as they arrive, a rerun picks up where this one stopped
+            journal_file = os.path.join(output_dir, fn+'.journal.jsonl')
+            with profile_utils.stage('download ' + fn) as stage:
+                entries = download_get_entries(url, ids, journal_file, concurrency, rate, session=session,
+                                               limiter=limiter)
+                stage.rows_out += len(entries)
+            with profile_utils.stage('assemble ' + fn) as stage:
+                df = assemble_get_table(ids, entries)
+                write_table(df, fn)
+                stage.rows_out += len(df)
+            journal_utils.Journal(journal_file).remove()
+        return DownloadTask(fn, run, frozenset([element + '.tsv']))
+
+    def sync_task(url: str, element: str, fn: str) -> DownloadTask:
+        def run() -> None:
+            ids = read_get_ids(output_dir, element)
+            list_file = os.path.join(output_dir, element + '.tsv')
+            table = sync_utils.read_table(os.path.join(output_dir, fn))
+            listed = {id.split(':')[-1] for id in ids}
+            in_table = set(sync_utils.table_ids(table))
+            changed = sync_utils.changed_ids(list_file + sync_utils.PREVIOUS_SUFFIX, list_file)
+            todo = [id for id in ids if id in changed or id.split(':')[-1] not in in_table]
+            dropped = in_table - listed
+            if todo or dropped:
+                journal_file = os.path.join(output_dir, fn+'.journal.jsonl')
+                with profile_utils.stage('sync ' + fn) as stage:
+                    entries = download_get_entries(url, todo, journal_file, concurrency, rate, session=session,
+                                                   limiter=limiter)
+                    df = sync_utils.patch_table(table, ids, assemble_get_table(todo, entries))
+                    write_table(df, fn)
+                    stage.rows_in += len(todo)
+                    stage.rows_out += len(df)
+                journal_utils.Journal(journal_file).remove()
+            logging.info('Synced {}: {} entries downloaded, {} dropped'.format(fn, len(todo), len(dropped)))
+            if os.path.exists(list_file + sync_utils.PREVIOUS_SUFFIX):
+                os.remove(list_file + sync_utils.PREVIOUS_SUFFIX)
+        return DownloadTask(fn, run, frozenset([element + '.tsv']))
+
+    def url_task(url: str, outfile: str, checksum: Optional[str] = None, revalidate: bool = False) -> DownloadTask:
+        def run() -> None:
+            with profile_utils.stage('download ' + os.path.basename(outfile)):
+                transfer_utils.download_file(url, outfile, session, checksum, revalidate)
+        return DownloadTask(os.path.basename(outfile), run)
+
     with open(yaml_file) as f:
         data = yaml.load(f, Loader=yaml.FullLoader)
-        for item in tqdm(data, desc="Downloading files"):
+        for item in data:
             if 'url' not in item:
                 logging.warning("Couldn't find url for source in {}".format(item))
                 continue
@@ -146,17 +437,32 @@ def download_from_yaml(yaml_file: str, output_dir: str,
             )
             logging.info("Retrieving %s from %s" % (outfile, item['url']))
 
+            url_breakdown = item['url'].split('/')
+            base_url = '/'.join(url_breakdown[:3]) + '/'
+            # Releases are recorded for new downloads too, for the next sync
+            stale = sync and url_breakdown[3] in ['list', 'link'] and new_release(base_url, url_breakdown[4:6])
+
             if path.exists(outfile):
-                if ignore_cache:
+                if url_breakdown[3] not in KEGG_OPERATIONS and sync and not ignore_cache:
+                    # Downloaded again only if it changed on the server
+                    logging.info("Checking cached version of {}".format(outfile))
+                    tasks.append(url_task(item['url'], outfile, item.get('checksum'), revalidate=True))
+                    continue
+                elif ignore_cache:
                     logging.info("Deleting cached version of {}".format(outfile))
                     os.remove(outfile)
+                elif stale:
+                    logging.info("New KEGG release, downloading {} again".format(outfile))
+                    # The previous 'list' file is kept to tell the changed entries, unless an
+                    # interrupted sync already kept an older one
+                    if url_breakdown[3] == 'list':
+                        if not path.exists(outfile + sync_utils.PREVIOUS_SUFFIX):
+                            os.replace(outfile, outfile + sync_utils.PREVIOUS_SUFFIX)
+                        previous_files.append(outfile + sync_utils.PREVIOUS_SUFFIX)
                 else:
                     logging.info("Using cached version of {}".format(outfile))
                     continue
             
-            url_breakdown = item['url'].split('/')
-            data_name = '_'.join(url_breakdown[-2:])
-            
             if url_breakdown[3] in ['list', 'link', 'conv']:
                 # CONV
                 if url_breakdown[3] == 'conv':
@@ -167,14 +473,11 @@ def download_from_yaml(yaml_file: str, output_dir: str,
                     for c in conv_list:
                         new_url = item['url']+'/'.join(c)
                         fn = item['local_name'].replace('placeholder',('2').join(c))
-                        if not path.exists(os.path.join(output_dir, fn)):
-                            parse_response(new_url).to_csv(os.path.join(output_dir, fn), sep='\t', index=False)
-                            # Uncomment below if len(conv_list) > 1
-                            # print('Waiting a bit before next API call...')
-                            # time.sleep(nap_time)
+                        if not path.exists(os.path.join(output_dir, fn)) or (sync and new_release(base_url, c[:1])):
+                            tasks.append(list_task(new_url, fn))
                 # LIST or LINK
                 else:
-                    parse_response(item["url"]).to_csv(os.path.join(output_dir, item['local_name']), sep='\t', index=False)
+                    tasks.append(list_task(item["url"], item['local_name']))
                 
 
             # GET        
@@ -186,21 +489,21 @@ def download_from_yaml(yaml_file: str, output_dir: str,
                     print('Looking for '+fn+' ...')
                     if not path.exists(os.path.join(output_dir,fn)):
                         print('Not found. Getting: '+fn)
-                        parse_response_get(item['url'], output_dir, element).to_csv(os.path.join(output_dir, fn), sep='\t', index=False)
-                        print('Waiting a bit before next API call...')
-                        time.sleep(nap_time)
+                        tasks.append(get_task(item['url'], element, fn))
+                    elif sync:
+                        print('Found '+fn+', syncing')
+                        tasks.append(sync_task(item['url'], element, fn))
                     else:
                         print('Found '+fn+'!')
             else:
                 print('Non-KEGG URL')
-                # OR regular wget download here.
-                
-                req = Request(item['url'], headers={'User-Agent': 'Mozilla/5.0'})
-                with urlopen(req) as response, open(outfile, 'wb') as out_file:  # type: ignore
-                        data = response.read()  # a `bytes` object
-                        out_file.write(data)
-                
-
+                tasks.append(url_task(item['url'], outfile, item.get('checksum')))
+
+    run_tasks(tasks, jobs)
+    if sync:
+        for previous_file in previous_files:
+            if path.exists(previous_file):
+                os.remove(previous_file)
+        sync_utils.write_releases(output_dir, dict(previous_releases, **releases))
+    session.report()
     return None
-
-
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import urllib3
+
+# KEGG asks REST API users to stay at or below 3 requests per second
+KEGG_RATE = 3.0
+DEFAULT_CONCURRENCY = 3
+# Statuses retried with exponential backoff, 403 being what KEGG answers to clients going too fast
+RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 2.0
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 60.0
+# Some non-KEGG hosts refuse urllib's default user agent
+USER_AGENT = 'Mozilla/5.0'
+
+
+class FetchError(Exception):
+    """Raised when a URL can't be fetched after all retries"""
+    pass
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the rate of requests across all threads."""
+
+    def __init__(self, rate: float = KEGG_RATE, burst: int = 1) -> None:
+        """
+        :param rate: tokens (requests) per second, float('inf') for no limit
+        :param burst: maximum number of tokens saved up while idle
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take a token, sleeping until one is available"""
+        with self.lock:
+            now = time.monotonic()
+            wait = self.resume_at - now
+            if not math.isinf(self.rate):
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                # Tokens go negative to reserve a slot for each waiting thread
+                self.tokens -= 1
+                wait = max(wait, -self.tokens / self.rate)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every thread for the given time, e.g. after the server asked to slow down"""
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+
+class SessionStats:
+    """Thread-safe counters of the requests sent through a Session."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latencies: List[float] = []
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, retry: bool = False, error: bool = False) -> None:
+        """Count a request, timed until its response headers arrived"""
+        with self.lock:
+            self.requests += 1
+            self.retries += retry
+            self.errors += error
+            self.latencies.append(latency)
+
+    def record_broken_body(self) -> None:
+        """Count a response whose body was cut short, its retry is counted as the next request"""
+        with self.lock:
+            self.errors += 1
+
+    def add_bytes(self, size: int) -> None:
+        with self.lock:
+            self.bytes += size
+
+    def summary(self) -> Dict[str, Any]:
+        """Counters, with the 50th, 90th and 99th percentile of the latencies in milliseconds"""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            summary: Dict[str, Any] = {'requests': self.requests, 'retries': self.retries,
+                                       'errors': self.errors, 'bytes': self.bytes}
+        for percentile in (50, 90, 99):
+            index = min(len(latencies) - 1, int(len(latencies) * percentile / 100))
+            summary['latency_p{}_ms'.format(percentile)] = \
+                round(latencies[index] * 1000, 1) if latencies else None
+        return summary
+
+
+class Session:
+    """Pooled keep-alive HTTP connections shared by all downloads of a run, with timeouts,
+    retries with jittered exponential backoff and request counters."""
+
+    def __init__(self, maxsize: int = DEFAULT_CONCURRENCY, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, retries: int = MAX_RETRIES,
+                 backoff: float = BACKOFF_SECONDS, http: Optional[Any] = None) -> None:
+        """
+        :param maxsize: maximum number of connections per host, further requests wait for a free one
+        :param connect_timeout: seconds to wait for a connection
+        :param read_timeout: seconds to wait for data from the server
+        :param retries: number of retries after a 403, 429 or 5xx response or a connection error
+        :param backoff: delay before the first retry in seconds, doubled for each further retry
+        :param http: urllib3.PoolManager (or compatible) to send the requests with, a new one by default
+        """
+        if http is None:
+            http = urllib3.PoolManager(maxsize=max(1, maxsize), block=True, headers={'User-Agent': USER_AGENT},
+                                       timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout))
+        self.http = http
+        # Headers given to a request replace the pool's, so extra ones are added to these
+        self.headers = dict(getattr(http, 'headers', None) or {})
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = SessionStats()
+
+    def open(self, url: str, limiter: Optional[TokenBucket] = None,
+             headers: Optional[Dict[str, str]] = None) -> Any:
+        """GET a URL without reading its body, backing off on rate limiting and server errors.
+
+        The caller reads the response and releases its connection, see stream.
+
+        Args:
+            url: URL to fetch.
+            limiter: TokenBucket shared by the requests to rate limit, none by default.
+            headers: Extra request headers, e.g. 'Range' or 'If-None-Match'.
+
+        Returns:
+            The urllib3 response (also 206 and 304 ones, and 416 ones to a Range request), None when the entry
+            doesn't exist (404).
+
+        """
+        for attempt in range(self.retries + 1):
+            response, error, retry_after = self.send(url, attempt, limiter, headers)
+            if error is None:
+                return response
+            self.back_off(url, error, attempt, retry_after, limiter)
+
+        raise FetchError('GET {} failed'.format(url))
+
+    def send(self, url: str, attempt: int, limiter: Optional[TokenBucket] = None,
+             headers: Optional[Dict[str, str]] = None) -> Tuple[Any, Optional[str], float]:
+        """Send a single GET attempt without reading its body.
+
+        Args:
+            url: URL to fetch.
+            attempt: Number of the attempt, from 0, counted as a retry after the first.
+            limiter: TokenBucket shared by the requests to rate limit, none by default.
+            headers: Extra request headers.
+
+        Returns:
+            The response (None on a 404) when done, or None, what went wrong and the delay asked by the server
+            when the request should be retried.
+
+        Raises:
+            FetchError: on a client error other than 403, 404, 429 and 416 to a Range request.
+
+        """
+        if limiter is not None:
+            limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = self.http.request('GET', url, headers=dict(self.headers, **(headers or {})),
+                                         retries=False, preload_content=False)
+        except urllib3.exceptions.HTTPError as e:
+            self.stats.record(time.monotonic() - start, retry=attempt > 0, error=True)
+            return None, str(e), 0.0
+        self.stats.record(time.monotonic() - start, retry=attempt > 0, error=response.status >= 400)
+        if response.status < 400 or (response.status == 416 and 'Range' in (headers or {})):
+            # A range that can't be satisfied is left to the caller, that knows what it resumes
+            return response, None, 0.0
+        self.release(response)
+        if response.status == 404:
+            return None, None, 0.0
+        if response.status not in RETRY_STATUSES:
+            raise FetchError('GET {} failed with status {}'.format(url, response.status))
+        try:
+            retry_after = float(response.headers.get('Retry-After', 0))
+        except (TypeError, ValueError):
+            retry_after = 0.0
+        return None, 'status {}'.format(response.status), retry_after
+
+    def back_off(self, url: str, error: str, attempt: int, retry_after: float = 0.0,
+                 limiter: Optional[TokenBucket] = None) -> None:
+        """Wait before retrying a failed request.
+
+        Args:
+            url: URL of the request.
+            error: What went wrong, for the log.
+            attempt: Number of the failed attempt, from 0.
+            retry_after: Minimum delay in seconds, as asked by the server.
+            limiter: TokenBucket to pause, so every thread slows down, none to sleep in this thread only.
+
+        Raises:
+            FetchError: when the last attempt failed.
+
+        """
+        if attempt >= self.retries:
+            raise FetchError('GET {} failed after {} retries: {}'.format(url, self.retries, error))
+        # Jitter keeps the threads that failed together from retrying together
+        delay = max(self.backoff * 2 ** attempt * random.uniform(0.5, 1.0), retry_after)
+        logging.warning('GET {} failed ({}), retrying in {:.1f} s'.format(url, error, delay))
+        if limiter is not None:
+            limiter.pause(delay)
+        else:
+            time.sleep(delay)
+
+    def release(self, response: Any) -> None:
+        """Count the bytes read from a response and return its connection to the pool"""
+        self.stats.add_bytes(response.tell())
+        response.drain_conn()
+        response.release_conn()
+
+    @contextmanager
+    def stream(self, url: str, limiter: Optional[TokenBucket] = None,
+               headers: Optional[Dict[str, str]] = None) -> Iterator[Any]:
+        """Context manager yielding the response of open, released on exit.
+
+        Raises:
+            FetchError: also when the URL doesn't exist (404).
+
+        """
+        response = self.open(url, limiter, headers)
+        if response is None:
+            raise FetchError('GET {} failed with status 404'.format(url))
+        try:
+            yield response
+        finally:
+            self.release(response)
+
+    def get(self, url: str, limiter: Optional[TokenBucket] = None) -> bytes:
+        """GET a URL and read its body.
+
+        Args:
+            url: URL to fetch.
+            limiter: TokenBucket shared by the requests to rate limit, none by default.
+
+        Returns:
+            The response body, empty when the entry doesn't exist (404).
+
+        """
+        # A broken body is retried like a failed request, from the same budget of attempts
+        for attempt in range(self.retries + 1):
+            response, error, retry_after = self.send(url, attempt, limiter)
+            if error is None:
+                if response is None:
+                    return b''
+                try:
+                    return response.data
+                except urllib3.exceptions.HTTPError as e:
+                    # Body cut short or read timeout
+                    self.stats.record_broken_body()
+                    error = str(e)
+                finally:
+                    self.release(response)
+            self.back_off(url, error, attempt, retry_after, limiter)
+
+        raise FetchError('GET {} failed'.format(url))
+
+    def report(self) -> Dict[str, Any]:
+        """Log the counters of the session and return them"""
+        summary = self.stats.summary()
+        logging.info('HTTP session: ' + ', '.join('{} {}'.format(k, v) for k, v in summary.items()))
+        return summary
+
+
+def fetch(http: Any, url: str, limiter: TokenBucket, retries: int = MAX_RETRIES,
+          backoff: float = BACKOFF_SECONDS) -> bytes:
+    """GET a URL, backing off on rate limiting and server errors.
+
+    Args:
+        http: urllib3.PoolManager (or compatible) to send the request with.
+        url: URL to fetch.
+        limiter: TokenBucket shared by all requests.
+        retries: Number of retries after a 403, 429 or 5xx response or a connection error.
+        backoff: Delay before the first retry in seconds, doubled for each further retry.
+
+    Returns:
+        The response body, empty when the entry doesn't exist (404).
+
+    """
+    return Session(retries=retries, backoff=backoff, http=http).get(url, limiter)
+
+
+def fetch_all(urls: List[str], concurrency: int = DEFAULT_CONCURRENCY, rate: float = KEGG_RATE,
+              http: Optional[Any] = None, session: Optional[Session] = None) -> List[bytes]:
+    """GET many URLs concurrently under a global rate limit.
+
+    Args:
+        urls: URLs to fetch.
+        concurrency: Number of requests in flight.
+        rate: Maximum number of requests per second, across all threads.
+        http: urllib3.PoolManager to use, when no session is given.
+        session: Session to send the requests through, a new one sized for the concurrency by default.
+
+    Returns:
+        Response bodies, in the order of urls.
+
+    """
+    concurrency = max(1, concurrency)
+    limiter = TokenBucket(rate)
+    if session is None:
+        session = Session(maxsize=concurrency, http=http)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda url: session.get(url, limiter), urls))
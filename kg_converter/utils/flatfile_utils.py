@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import os
+import re
+from typing import Any, Dict, IO, Iterable, Iterator, List, Tuple, Union
+
+"""
+Parser of KEGG flat files, as returned by the 'GET' operation.
+
+Field names sit in the first 12 columns of a line, values start at column 12,
+and lines with nothing in the first 12 columns continue the previous field.
+Within a value, columns (e.g. an ID and its name) are separated by runs of two
+or more spaces. Records end with a '///' line.
+"""
+
+KEY_WIDTH = 12
+TERMINATOR = '///'
+COLUMN_SEPARATOR = re.compile(r' {2,}')
+
+Source = Union[str, 'os.PathLike[str]', bytes, bytearray, IO[str], IO[bytes], Iterable[str]]
+Fields = List[Tuple[str, List[str]]]
+
+
+def iter_lines(source: Source) -> Iterator[str]:
+    '''
+    Lines of a flat file.
+
+    :param source: Path of a file, bytes buffer, or text or binary stream (e.g. io.StringIO of a record).
+    :return: Iterator of lines.
+    '''
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, encoding='utf-8') as f:
+            yield from f
+        return
+    if isinstance(source, (bytes, bytearray)):
+        source = io.StringIO(bytes(source).decode('utf-8'))
+    for line in source:
+        yield line.decode('utf-8') if isinstance(line, bytes) else line
+
+
+def iter_fields(source: Source) -> Iterator[Fields]:
+    '''
+    Fields of each record of a flat file, in file order.
+
+    A record cut short (without its '///' line) at the end of the source is
+    returned too.
+
+    :param source: See iter_lines.
+    :return: Iterator of records, each a list of (field, value lines). Fields
+        occurring more than once (REFERENCE) are listed once per occurrence.
+    '''
+    fields: Fields = []
+    for line in iter_lines(source):
+        if line.startswith(TERMINATOR):
+            if fields:
+                yield fields
+            fields = []
+        elif line[:KEY_WIDTH].strip():
+            # Sub-fields (AUTHORS under REFERENCE) are indented within the key columns
+            key, _, value = line.strip().partition(' ')
+            fields.append((key, [value.strip()]))
+        elif fields and line.strip():
+            fields[-1][1].append(line.strip())
+    if fields:
+        yield fields
+
+
+def structure(fields: Fields) -> Dict[str, Any]:
+    '''
+    Structured record: a string for single line fields, a list of lines for
+    fields spanning several lines or occurring more than once, and a dictionary
+    of database -> list of IDs for DBLINKS.
+
+    :param fields: Fields of a record, from iter_fields.
+    :return: Dictionary of field -> value.
+    '''
+    record: Dict[str, Any] = {}
+    for key, lines in fields:
+        if key == 'DBLINKS':
+            dblinks = record.setdefault(key, {})
+            for line in lines:
+                db, _, ids = line.partition(':')
+                dblinks.setdefault(db.strip(), []).extend(ids.split())
+        elif key in record:
+            if not isinstance(record[key], list):
+                record[key] = [record[key]]
+            record[key].extend(lines)
+        else:
+            record[key] = lines[0] if len(lines) == 1 else list(lines)
+    return record
+
+
+def parse_records(source: Source) -> Iterator[Dict[str, Any]]:
+    '''
+    Structured records of a flat file, see structure.
+
+    :param source: See iter_lines.
+    :return: Iterator of records.
+    '''
+    for fields in iter_fields(source):
+        yield structure(fields)
+
+
+def flatten(fields: Fields) -> Dict[str, str]:
+    '''
+    Row of a 'kegg-*.tsv' table for a record.
+
+    The columns of the first line of a field are joined by a space (by ' | ' for
+    ENZYME), and every further line, or further occurrence of the field, is
+    appended after ' | ' with its columns joined by '-'. COMMENT lines are
+    joined by a space. Field names filling the key columns (DESCRIPTION,
+    PATHWAY_MAP) have always been appended to the previous field as
+    '| <field> <value>', which prune_columns relies on for pathway descriptions.
+
+    :param fields: Fields of a record, from iter_fields.
+    :return: Dictionary of field -> value.
+    '''
+    row: Dict[str, str] = {}
+    last_key = ''
+    for key, lines in fields:
+        columns = [COLUMN_SEPARATOR.split(line) for line in lines]
+        if len(key) < KEY_WIDTH - 1 or not last_key:
+            last_key = key
+            head = columns.pop(0)
+            if key == 'ENZYME':
+                row[key] = ' | '.join(head)
+            elif key in row:
+                row[key] += ' | ' + '-'.join(head)
+            else:
+                row[key] = ' '.join(head)
+        else:
+            columns[0][0] = (key + ' ' + columns[0][0]).strip()
+        for line_columns in columns:
+            if last_key == 'COMMENT':
+                row[last_key] += ' ' + ' '.join(line_columns)
+            else:
+                row[last_key] += ' | ' + '-'.join(line_columns)
+    return row
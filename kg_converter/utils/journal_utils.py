@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+
+def read_journal(journal_file: str) -> Tuple[Dict[str, str], int]:
+    """Read the records of a checkpoint journal.
+
+    A line cut short by an interrupted run, and anything after it, is ignored.
+
+    Args:
+        journal_file: Append-only JSONL file, one {"id": ..., "record": ...} object per line.
+
+    Returns:
+        Dictionary of ID -> record, and the size in bytes of the complete lines.
+
+    """
+    entries: Dict[str, str] = {}
+    size = 0
+    if not os.path.exists(journal_file):
+        return entries, size
+    with open(journal_file, 'rb') as f:
+        for line in f:
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError('incomplete line')
+                entry = json.loads(line)
+                entries[entry['id']] = entry['record']
+            except (ValueError, KeyError, TypeError):
+                logging.warning('Ignoring the end of {} from byte {} on'.format(journal_file, size))
+                break
+            size += len(line)
+    return entries, size
+
+
+class Journal:
+    """Append-only checkpoint journal of downloaded records, so an interrupted download resumes
+    where it stopped. Without a file, records are only kept in memory."""
+
+    def __init__(self, journal_file: Optional[str] = None) -> None:
+        """
+        :param journal_file: JSONL file to append the records to, None to keep them in memory only
+        """
+        self.journal_file = journal_file
+        self.entries: Dict[str, str] = {}
+        self.file = None
+
+    def __enter__(self) -> 'Journal':
+        if self.journal_file is not None:
+            self.entries, size = read_journal(self.journal_file)
+            self.file = open(self.journal_file, 'ab')
+            # Drop a line cut short by an interrupted run before appending
+            self.file.truncate(size)
+        return self
+
+    def add(self, id: str, record: str) -> None:
+        """Record an entry, written to the journal file at the next flush"""
+        self.entries[id] = record
+        if self.file is not None:
+            self.file.write(json.dumps({'id': id, 'record': record}).encode() + b'\n')
+
+    def flush(self) -> None:
+        if self.file is not None:
+            self.file.flush()
+
+    def remove(self) -> None:
+        """Delete the journal file, once its records made it to their final file"""
+        self.close()
+        if self.journal_file is not None and os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __exit__(self, *exc) -> None:
+        self.close()
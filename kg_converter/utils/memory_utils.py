@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import resource
+import sys
+
+
+def peak_rss() -> int:
+    """Peak resident set size of the current process.
+
+    Returns:
+        Peak RSS in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def current_rss() -> int:
+    """Current resident set size of the current process, read from /proc where available.
+
+    Returns:
+        RSS in bytes, or the peak RSS when the current value is not available.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import collections
+import io
+import logging
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Optional
+
+from urllib3.response import HTTPResponse
+
+from kg_converter.utils.synthetic_utils import (CPD2CHEBI_FILE, DB_SIZES, LINK_FILES, LIST_FILES, core_ids,
+                                                entry_record, flat_entry)
+
+"""
+Local stand-ins for the KEGG REST API, serving a synthetic (see synthetic_utils)
+or captured corpus, so downloads can be tested and benchmarked offline.
+
+LocalKEGG answers 'info', 'list', 'link', 'conv' and 'get' requests, standing
+in for urllib3.PoolManager within the process. MockKEGGServer is a real HTTP
+server serving the same, which can add latency, answer 403 past a request rate
+and cut response bodies short.
+"""
+
+KEGG_REST_URL = 'http://rest.kegg.jp/'
+SYNTHETIC_RELEASE = 'Release 1.0+/01-01, Jan 00'
+
+
+class LocalKEGG:
+    """Stand-in for urllib3.PoolManager answering KEGG REST URLs from the synthetic data, so the download
+    parsers are timed without network latency.
+    """
+
+    def __init__(self, raw_dir: str, scale: float, seed: int, records: Optional[Dict[str, str]] = None) -> None:
+        """
+        :param raw_dir: directory of the 'list', 'link' and 'conv' files, e.g. from write_synthetic_kegg
+        :param scale: scale of the synthetic data
+        :param seed: random seed of the synthetic data
+        :param records: captured flat file records by ID (e.g. 'ko:K00001'), e.g. from a GET journal,
+            served instead of synthetic ones
+        """
+        self.raw_dir = raw_dir
+        self.seed = seed
+        self.records = records or {}
+        self.ids = {db: core_ids(db, scale) for db in DB_SIZES}
+        self.known = {db: set(ids) for db, ids in self.ids.items()}
+        self.db_of = {prefix.split(':')[1]: db for db, (_, prefix) in LIST_FILES.items()}
+        # Files answering the 'list', 'link' and 'conv' operations
+        self.files = {'list/' + db: fn for db, (fn, _) in LIST_FILES.items()}
+        self.files.update({'link/{}/{}'.format(target, source): fn for (source, target), fn in LINK_FILES.items()})
+        self.files['conv/cpd/chebi'] = CPD2CHEBI_FILE
+        # Release of each database given by the 'info' operation, SYNTHETIC_RELEASE by default
+        self.releases: Dict[str, str] = {}
+
+    def entry(self, kegg_id: str) -> str:
+        """Flat file record of an entry, empty when it doesn't exist"""
+        if kegg_id in self.records:
+            return self.records[kegg_id]
+        core_id = kegg_id.split(':')[-1]
+        db = self.db_of.get(core_id.rstrip('0123456789'))
+        if db is None or core_id not in self.known[db]:
+            return ''
+        return flat_entry(entry_record(db, core_id, self.ids, self.seed))
+
+    def body(self, path: str) -> Optional[str]:
+        """Response body of a REST path (e.g. 'get/ko:K00001+ko:K00002'), None when there is nothing to serve"""
+        operation, _, argument = path.partition('/')
+        if operation == 'info':
+            return '{:<17}KEGG {} database\n{:<17}{}\n'.format(argument, argument, argument[:4],
+                                                               self.releases.get(argument, SYNTHETIC_RELEASE))
+        if operation == 'get':
+            # Multi-entry requests get the records of the entries that exist, concatenated
+            body = ''.join(self.entry(kegg_id) for kegg_id in argument.split('+'))
+            return body or None
+        fn = self.files.get(operation + '/' + argument)
+        if fn is None:
+            return None
+        # Serve the files without their header line, as the REST API does
+        with open(os.path.join(self.raw_dir, fn)) as f:
+            return ''.join(f.readlines()[1:])
+
+    def request(self, method: str, url: str, preload_content: bool = True, **kwargs) -> HTTPResponse:
+        body = self.body(url[len(KEGG_REST_URL):])
+        return HTTPResponse(body=io.BytesIO((body or '').encode()), status=200 if body is not None else 404,
+                            preload_content=preload_content)
+
+
+class KEGGRequestHandler(BaseHTTPRequestHandler):
+    """Answers GET requests of a MockKEGGServer, over keep-alive connections"""
+    protocol_version = 'HTTP/1.1'
+    server: 'MockKEGGServer'
+
+    def do_GET(self) -> None:
+        self.server.respond(self)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug('Mock KEGG: ' + format % args)
+
+
+class MockKEGGServer(ThreadingHTTPServer):
+    """Local HTTP server answering KEGG REST requests from a LocalKEGG corpus, with injected faults."""
+    daemon_threads = True
+
+    def __init__(self, corpus: LocalKEGG, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 rate_limit: float = math.inf, truncate: float = 0.0, seed: int = 0) -> None:
+        """
+        :param corpus: LocalKEGG serving the responses
+        :param host: address to listen on
+        :param port: port to listen on, a free one by default
+        :param latency: seconds to wait before answering each request
+        :param rate_limit: requests per second over which requests are answered 403, as KEGG does
+        :param truncate: fraction of the responses cut in half, the connection being closed
+        :param seed: random seed of the truncated responses
+        """
+        super().__init__((host, port), KEGGRequestHandler)
+        self.corpus = corpus
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.truncate = truncate
+        self.random = random.Random(seed)
+        self.recent: Deque[float] = collections.deque()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.stats = {'requests': 0, 'forbidden': 0, 'not_found': 0, 'truncated': 0, 'bytes': 0}
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server, standing in for http://rest.kegg.jp/"""
+        host, port = self.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    def admit(self) -> bool:
+        """Whether a request is within the rate limit, over a sliding window of one second"""
+        now = time.monotonic()
+        with self.lock:
+            self.stats['requests'] += 1
+            while self.recent and self.recent[0] <= now - 1:
+                self.recent.popleft()
+            if len(self.recent) >= self.rate_limit:
+                self.stats['forbidden'] += 1
+                return False
+            self.recent.append(now)
+            return True
+
+    def respond(self, handler: KEGGRequestHandler) -> None:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if not self.admit():
+            return self.send(handler, 403, b'')
+        body = self.corpus.body(handler.path.lstrip('/'))
+        if body is None:
+            with self.lock:
+                self.stats['not_found'] += 1
+            return self.send(handler, 404, b'')
+        data = body.encode()
+        with self.lock:
+            truncated = self.random.random() < self.truncate
+            self.stats['truncated'] += truncated
+        self.send(handler, 200, data, cut=len(data) // 2 if truncated else None)
+
+    def send(self, handler: KEGGRequestHandler, status: int, data: bytes, cut: Optional[int] = None) -> None:
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'text/plain')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data[:cut])
+        if cut is not None:
+            # The client sees fewer bytes than announced
+            handler.close_connection = True
+        with self.lock:
+            self.stats['bytes'] += len(data[:cut])
+
+    def start(self) -> 'MockKEGGServer':
+        """Serve in a background thread"""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> 'MockKEGGServer':
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
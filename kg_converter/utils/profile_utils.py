@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import cProfile
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from kg_converter.utils.memory_utils import peak_rss
+
+"""
+Per-stage profiling of the download, transform and merge commands.
+
+Code marks its main stages with profile_utils.stage(name), which is a no-op
+unless a profiling() block is active (run.py --profile). Stages with the same
+name accumulate across calls (e.g. one 'write nodes.tsv' per flushed block),
+and a stage includes the time of the stages nested in it. Stages may run in
+several threads at once (parallel downloads), their times then add up.
+"""
+
+
+class Stage:
+    """Accumulated wall time and row counts of a named stage."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.peak_rss = 0
+        self.profile: Optional[cProfile.Profile] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        rows = self.rows_in or self.rows_out
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'seconds': self.seconds,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'rows_per_second': rows / self.seconds if self.seconds > 0 else None,
+            'peak_rss_mib': self.peak_rss / 2 ** 20
+        }
+
+
+class StageProfiler:
+
+    def __init__(self, cprofile: bool = False) -> None:
+        """
+        :param cprofile: Run the outermost stages under cProfile, to dump the statistics of the slowest one
+        """
+        self.cprofile = cprofile
+        self.stages: Dict[str, Stage] = {}
+        # Nesting depth of each thread
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Stage]:
+        """Time a stage; the yielded Stage takes the row counts (rows_in, rows_out)
+        :param name: name of the stage
+        """
+        with self.lock:
+            stage = self.stages.setdefault(name, Stage(name))
+        depth = getattr(self.local, 'depth', 0)
+        profile = None
+        if self.cprofile and depth == 0 and threading.current_thread() is threading.main_thread():
+            # Only one profiler can be active, nested stages are covered by the outer one
+            profile = stage.profile = stage.profile or cProfile.Profile()
+            profile.enable()
+        self.local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            with self.lock:
+                stage.seconds += time.perf_counter() - start
+                stage.calls += 1
+            self.local.depth = depth
+            if profile is not None:
+                profile.disable()
+            # High-water mark of the process at the end of the stage
+            stage.peak_rss = peak_rss()
+
+    def hot_stage(self) -> Optional[Stage]:
+        """Slowest outermost stage"""
+        profiled = [s for s in self.stages.values() if s.profile is not None] or list(self.stages.values())
+        return max(profiled, key=lambda s: s.seconds, default=None)
+
+    def report(self, command: str = '') -> Dict[str, Any]:
+        """Report of all stages, in the order they were first entered"""
+        stages: List[Dict[str, Any]] = [s.to_dict() for s in self.stages.values()]
+        hot = self.hot_stage()
+        return {
+            'command': command,
+            'seconds': time.perf_counter() - self.start,
+            'peak_rss_mib': peak_rss() / 2 ** 20,
+            'hot_stage': hot.name if hot is not None else None,
+            'stages': stages
+        }
+
+
+_active: Optional[StageProfiler] = None
+
+
+@contextmanager
+def stage(name: str) -> Iterator[Stage]:
+    """Time a stage with the active profiler, if any.
+
+    Args:
+        name: Name of the stage.
+
+    Returns:
+        Context manager yielding the Stage, whose rows_in and rows_out can be incremented.
+
+    """
+    if _active is None:
+        yield Stage(name)
+    else:
+        with _active.stage(name) as s:
+            yield s
+
+
+@contextmanager
+def profiling(report_file: Optional[str], pstats_file: Optional[str] = None,
+              command: str = '') -> Iterator[Optional[StageProfiler]]:
+    """Activate stage profiling for the enclosed block, and write the report on exit.
+
+    Args:
+        report_file: JSON file to write the report to, None for no report.
+        pstats_file: File to dump the cProfile statistics of the slowest stage to, None for no cProfile.
+            Profiling is disabled when both are None.
+        command: Name of the profiled command, recorded in the report.
+
+    Returns:
+        Context manager yielding the StageProfiler, or None when profiling is disabled.
+
+    """
+    global _active
+    if report_file is None and pstats_file is None:
+        yield None
+        return
+
+    profiler = _active = StageProfiler(cprofile=pstats_file is not None)
+    try:
+        yield profiler
+    finally:
+        _active = None
+        report = profiler.report(command)
+        hot = profiler.hot_stage()
+        if pstats_file is not None and hot is not None and hot.profile is not None:
+            hot.profile.dump_stats(pstats_file)
+            report['pstats'] = pstats_file
+        if report_file is not None:
+            with open(report_file, 'w') as f:
+                json.dump(report, f, indent=2)
+            logging.info('Wrote profile of {} stages to {}'.format(len(report['stages']), report_file))
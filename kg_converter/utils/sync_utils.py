@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import csv
+import json
+import os
+import re
+from typing import Dict, List, Optional, Set
+
+import pandas as pd
+
+from kg_converter.utils import fetch_utils
+
+"""
+Incremental sync of KEGG downloads with a new KEGG release.
+
+The release of each database (from the 'info' operation) is recorded next to
+the downloads. A sync downloads the 'list', 'link' and 'conv' files of the
+databases whose release changed again, keeping the previous 'list' file as
+<file>.prev. The 'GET' tables are then patched: entries whose 'list' line is
+new or changed, or missing from the table, are downloaded; entries no longer
+listed are dropped.
+"""
+
+RELEASE_FILE = 'kegg_release.json'
+PREVIOUS_SUFFIX = '.prev'
+
+
+def kegg_release(session: fetch_utils.Session, base_url: str, db: str,
+                 limiter: Optional[fetch_utils.TokenBucket] = None) -> Optional[str]:
+    '''
+    Release of a KEGG database, e.g. 'Release 108.0+/10-18, Oct 23'.
+
+    :param session: HTTP session of the download.
+    :param base_url: URL of the REST API, e.g. 'http://rest.kegg.jp/'.
+    :param db: KEGG database, as in 'list' URLs.
+    :param limiter: Rate limit shared with other requests.
+    :return: Release, None when the 'info' operation doesn't give one.
+    '''
+    match = re.search(r'Release .*', session.get(base_url + 'info/' + db, limiter).decode())
+    return match.group(0).strip() if match else None
+
+
+def read_releases(output_dir: str) -> Dict[str, Optional[str]]:
+    '''
+    Releases the downloads were made from, empty if unknown.
+    '''
+    try:
+        with open(os.path.join(output_dir, RELEASE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_releases(output_dir: str, releases: Dict[str, Optional[str]]) -> None:
+    '''
+    Record the releases the downloads were made from, atomically.
+    '''
+    path = os.path.join(output_dir, RELEASE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(releases, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def read_list(list_file: str) -> Dict[str, str]:
+    '''
+    Lines of a 'list' file by ID.
+    '''
+    with open(list_file, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter='\t')
+        next(reader, None)
+        return {row[0]: '\t'.join(row[1:]) for row in reader if row}
+
+
+def changed_ids(previous_list_file: Optional[str], list_file: str) -> Set[str]:
+    '''
+    IDs of a 'list' file that are new, or whose line changed, since the previous one.
+
+    :param previous_list_file: The previous 'list' file, None if it didn't change.
+    :param list_file: The current 'list' file.
+    :return: Set of IDs.
+    '''
+    if previous_list_file is None or not os.path.exists(previous_list_file):
+        return set()
+    previous = read_list(previous_list_file)
+    return {id for id, line in read_list(list_file).items() if previous.get(id) != line}
+
+
+def read_table(table_file: str) -> pd.DataFrame:
+    '''
+    A 'kegg-*.tsv' table, values as text so rows written back are unchanged.
+    '''
+    return pd.read_csv(table_file, sep='\t', dtype=str, keep_default_na=False, na_filter=False)
+
+
+def table_ids(table: pd.DataFrame) -> pd.Series:
+    '''
+    ID of each row of a 'kegg-*.tsv' table, without database prefix ('K00001').
+    '''
+    return table['ENTRY'].str.split(' ').str[0]
+
+
+def patch_table(table: pd.DataFrame, ids: List[str], fresh: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Replace rows of a 'kegg-*.tsv' table by freshly downloaded ones, drop the rows no longer listed,
+    and order the rows as the 'list' file.
+
+    :param table: Table, from read_table.
+    :param ids: IDs of the 'list' file, with database prefix ('ko:K00001').
+    :param fresh: Rows of the downloaded entries, from assemble_get_table.
+    :return: Patched table.
+    '''
+    order = {id.split(':')[-1]: i for i, id in enumerate(ids)}
+    fresh = fresh[fresh['ENTRY'].notna()] if 'ENTRY' in fresh else fresh.iloc[0:0]
+    replaced = set(table_ids(fresh))
+    kept = table[table_ids(table).map(lambda id: id in order and id not in replaced)]
+    patched = pd.concat([kept, fresh], ignore_index=True)
+    position = table_ids(patched).map(order)
+    return patched.iloc[position.argsort(kind='stable')].reset_index(drop=True)
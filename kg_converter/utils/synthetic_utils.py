@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import csv
+import os
+import random
+from typing import Dict, Iterator, List, Tuple
+
+"""
+Synthetic KEGG raw data at a chosen scale.
+
+Writes the 'list', 'link' and 'conv' files and the 'kegg-*.tsv' GET tables with
+the names and column layout produced by download_utils, so the transform can be
+exercised and benchmarked on realistic volumes without the KEGG REST API.
+
+Entries are generated from (seed, KEGG ID) alone, so any entry can also be
+rendered on its own as the KEGG flat file the GET operation returns.
+"""
+
+# Number of entries per KEGG db, and of rows per link file, at scale 1.0 (roughly a full KEGG release)
+DB_SIZES = {
+    'pathway': 550,
+    'rn': 11800,
+    'cpd': 18900,
+    'ko': 25000
+}
+
+LINK_SIZES = {
+    ('pathway', 'rn'): 14000,
+    ('rn', 'cpd'): 45000,
+    ('pathway', 'cpd'): 32000,
+    ('pathway', 'ko'): 40000,
+    ('rn', 'ko'): 13000
+}
+
+# Name of the 'list' file, prefix of the 'list' IDs and name of the GET table per KEGG db
+LIST_FILES = {
+    'pathway': ('pathways.tsv', 'path:map'),
+    'rn': ('reactions.tsv', 'rn:R'),
+    'cpd': ('compounds.tsv', 'cpd:C'),
+    'ko': ('ko.tsv', 'ko:K')
+}
+
+LINK_FILES = {
+    ('pathway', 'rn'): 'pathwayReactionLink.tsv',
+    ('rn', 'cpd'): 'reactionCompoundLink.tsv',
+    ('pathway', 'cpd'): 'pathwayCompoundLink.tsv',
+    ('pathway', 'ko'): 'pathwayKoLink.tsv',
+    ('rn', 'ko'): 'reactionKoLink.tsv'
+}
+
+GET_TABLES = {
+    'pathway': ('kegg-pathways.tsv', ['ENTRY', 'NAME', 'CLASS', 'DBLINKS']),
+    'rn': ('kegg-reactions.tsv', ['ENTRY', 'NAME', 'DEFINITION', 'EQUATION', 'ENZYME', 'DBLINKS']),
+    'cpd': ('kegg-compounds.tsv', ['ENTRY', 'NAME', 'FORMULA', 'EXACT_MASS', 'DBLINKS']),
+    'ko': ('kegg-ko.tsv', ['ENTRY', 'NAME', 'DEFINITION', 'PATHWAY', 'DBLINKS'])
+}
+
+CPD2CHEBI_FILE = 'cpd2chebi.tsv'
+
+SYLLABLES = ['pyru', 'vate', 'gluc', 'ose', 'citr', 'ate', 'ribo', 'lact', 'acet', 'phos',
+             'pho', 'kin', 'ase', 'meth', 'yl', 'amin', 'oxo', 'hydr', 'oxy', 'gly', 'cer']
+
+
+def core_ids(db: str, scale: float) -> List[str]:
+    '''
+    KEGG IDs (without database prefix) of a db at the given scale.
+
+    :param db: KEGG db ('pathway', 'rn', 'cpd', 'ko').
+    :param scale: Scale factor, 1.0 being roughly a full KEGG release.
+    :return: List of IDs, e.g. ['C00001', 'C00002', ...].
+    '''
+    n = max(1, int(DB_SIZES[db] * scale))
+    prefix = LIST_FILES[db][1].split(':')[1]
+    return [prefix + str(i + 1).zfill(5) for i in range(n)]
+
+
+def word(rng: random.Random, n_syllables: int = 3) -> str:
+    '''
+    Made-up chemical-sounding word.
+    '''
+    return ''.join(rng.choice(SYLLABLES) for _ in range(n_syllables))
+
+
+def entry_record(db: str, core_id: str, ids: Dict[str, List[str]], seed: int = 0) -> List[Tuple[str, List[List[str]]]]:
+    '''
+    Fields of one entry as KEGG GET returns them.
+
+    :param db: KEGG db of the entry.
+    :param core_id: KEGG ID without database prefix.
+    :param ids: IDs of every db, from core_ids, used for cross references.
+    :param seed: Random seed of the dataset.
+    :return: List of (field, lines), each line a list of columns.
+    '''
+    rng = random.Random('{}:{}'.format(seed, core_id))
+    names = [word(rng).capitalize() for _ in range(rng.randint(1, 3))]
+    name_lines = [[x + ';'] for x in names[:-1]] + [[names[-1]]]
+
+    if db == 'pathway':
+        title = ' '.join(word(rng, 2) for _ in range(3)).capitalize()
+        return [
+            ('ENTRY', [[core_id, 'Pathway']]),
+            ('NAME', [[title]]),
+            ('DESCRIPTION', [[' '.join(word(rng, 2) for _ in range(20)).capitalize() + '.']]),
+            ('CLASS', [['Metabolism; ' + word(rng).capitalize() + ' metabolism']]),
+            ('PATHWAY_MAP', [[core_id, title]]),
+            ('DBLINKS', [['GO: ' + ' '.join(str(rng.randint(1, 2099999)).zfill(7) for _ in range(rng.randint(1, 3)))]])
+        ]
+    if db == 'rn':
+        left, right = rng.sample(ids['cpd'], 2), rng.sample(ids['cpd'], 2)
+        return [
+            ('ENTRY', [[core_id, 'Reaction']]),
+            ('NAME', name_lines),
+            ('DEFINITION', [[' + '.join(left) + ' <=> ' + ' + '.join(right)]]),
+            ('EQUATION', [[' + '.join(left) + ' <=> ' + ' + '.join(right)]]),
+            ('ENZYME', [['{}.{}.{}.{}'.format(*(rng.randint(1, 99) for _ in range(4))) for _ in range(rng.randint(1, 3))]]),
+            ('DBLINKS', [['RHEA: ' + str(rng.randint(10000, 99999))]])
+        ]
+    if db == 'cpd':
+        return [
+            ('ENTRY', [[core_id, 'Compound']]),
+            ('NAME', name_lines),
+            ('FORMULA', [['C{}H{}O{}'.format(*(rng.randint(1, 40) for _ in range(3)))]]),
+            ('EXACT_MASS', [['{:.4f}'.format(rng.uniform(10, 2000))]]),
+            ('DBLINKS', [['CAS: {}-{}-{}'.format(rng.randint(50, 99999), rng.randint(10, 99), rng.randint(0, 9))],
+                         ['PubChem: ' + str(rng.randint(3000, 999999))],
+                         ['ChEBI: ' + str(rng.randint(10000, 99999))]])
+        ]
+    if db == 'ko':
+        pathways = rng.sample(ids['pathway'], min(2, len(ids['pathway'])))
+        return [
+            ('ENTRY', [[core_id, 'KO']]),
+            ('NAME', [[', '.join(word(rng, 1) for _ in range(2))]]),
+            ('DEFINITION', [[' '.join(word(rng) for _ in range(2)) + ' [EC:{}.{}.{}.{}]'
+                            .format(*(rng.randint(1, 99) for _ in range(4)))]]),
+            ('PATHWAY', [[x, word(rng).capitalize()] for x in pathways]),
+            ('DBLINKS', [['RN: ' + ' '.join(rng.sample(ids['rn'], min(2, len(ids['rn']))))],
+                         ['COG: COG' + str(rng.randint(1, 5000)).zfill(4)],
+                         ['GO: ' + str(rng.randint(1, 2099999)).zfill(7)]])
+        ]
+    raise ValueError('Unknown KEGG db {}'.format(db))
+
+
+def flat_entry(record: List[Tuple[str, List[List[str]]]]) -> str:
+    '''
+    Render an entry as a KEGG flat file: field names padded to 12 columns,
+    continuation lines indented, columns separated by runs of spaces.
+
+    :param record: Entry fields, from entry_record.
+    :return: Flat file text, terminated by '///'.
+    '''
+    lines = []
+    for field, values in record:
+        for i, columns in enumerate(values):
+            lines.append((field if i == 0 else '').ljust(12) + '    '.join(columns))
+    return '\n'.join(lines) + '\n///\n'
+
+
+def table_row(record: List[Tuple[str, List[List[str]]]]) -> Dict[str, str]:
+    '''
+    Row of a 'kegg-*.tsv' table for an entry, as parse_response_get flattens its flat file.
+
+    :param record: Entry fields, from entry_record.
+    :return: Dictionary of field -> value.
+    '''
+    row: Dict[str, str] = {}
+    last_field = ''
+    for field, values in record:
+        if len(field) >= 11:
+            # Field names filling the 12 columns (DESCRIPTION, PATHWAY_MAP) are
+            # read as a continuation line of the previous field
+            row[last_field] += ' | ' + field + ' ' + '-'.join(values[0])
+            continue
+        last_field = field
+        row[field] = (' | ' if field == 'ENZYME' else ' ').join(values[0])
+        for columns in values[1:]:
+            row[field] += ' | ' + '-'.join(columns)
+    return row
+
+
+def list_name(record: List[Tuple[str, List[List[str]]]]) -> str:
+    '''
+    Value of an entry in its 'list' file.
+    '''
+    fields = dict(record)
+    if fields['ENTRY'][0][1] == 'KO':
+        return fields['NAME'][0][0] + '; ' + fields['DEFINITION'][0][0]
+    return ' '.join(x for columns in fields['NAME'] for x in columns)
+
+
+def link_rows(source_db: str, target_db: str, ids: Dict[str, List[str]], n_rows: int,
+              rng: random.Random) -> Iterator[Tuple[str, str]]:
+    '''
+    Rows (source ID, target ID) of a link file, with the prefixes of the KEGG link operation.
+    Pathways linked to reactions and KOs also appear under their 'rn' and 'ko' map IDs.
+    '''
+    source_prefix = LIST_FILES[source_db][1].split(':')[0] + ':'
+    target_prefix = LIST_FILES[target_db][1].split(':')[0] + ':'
+    for _ in range(n_rows):
+        source = rng.choice(ids[source_db])
+        if source_db == 'pathway' and target_db in ('rn', 'ko') and rng.random() < 0.5:
+            source = source.replace('map', target_db)
+        yield source_prefix + source, target_prefix + rng.choice(ids[target_db])
+
+
+def write_synthetic_kegg(output_dir: str, scale: float = 0.01, seed: int = 0) -> Dict[str, int]:
+    '''
+    Write a synthetic KEGG raw data directory.
+
+    :param output_dir: Directory to write to (e.g. data/raw).
+    :param scale: Scale factor, 1.0 being roughly a full KEGG release.
+    :param seed: Random seed; the same seed and scale give the same files.
+    :return: Number of rows written per file.
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    ids = {db: core_ids(db, scale) for db in DB_SIZES}
+    counts = {}
+
+    for db, (list_file, prefix) in LIST_FILES.items():
+        table_file, columns = GET_TABLES[db]
+        with open(os.path.join(output_dir, list_file), 'w') as list_f, \
+                open(os.path.join(output_dir, table_file), 'w') as table_f:
+            list_writer = csv.writer(list_f, delimiter='\t', lineterminator='\n')
+            table_writer = csv.DictWriter(table_f, columns, delimiter='\t', lineterminator='\n')
+            list_writer.writerow([db + 'Id', db])
+            table_writer.writeheader()
+            for core_id in ids[db]:
+                record = entry_record(db, core_id, ids, seed)
+                list_writer.writerow([prefix.split(':')[0] + ':' + core_id, list_name(record)])
+                table_writer.writerow(table_row(record))
+        counts[list_file] = counts[table_file] = len(ids[db])
+
+    rng = random.Random(seed)
+    for (source_db, target_db), link_file in LINK_FILES.items():
+        n_rows = max(1, int(LINK_SIZES[(source_db, target_db)] * scale))
+        with open(os.path.join(output_dir, link_file), 'w') as f:
+            writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+            writer.writerow([source_db + 'Id', target_db + 'Id'])
+            writer.writerows(link_rows(source_db, target_db, ids, n_rows, rng))
+        counts[link_file] = n_rows
+
+    with open(os.path.join(output_dir, CPD2CHEBI_FILE), 'w') as f:
+        writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+        writer.writerow(['chebiId', 'cpdId'])
+        cpds = ids['cpd'][::3]
+        writer.writerows(('chebi:' + str(10000 + i), 'cpd:' + x) for i, x in enumerate(cpds))
+    counts[CPD2CHEBI_FILE] = len(cpds)
+
+    return counts
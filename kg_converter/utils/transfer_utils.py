@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, Optional, Tuple
+
+import urllib3
+
+from kg_converter.utils.fetch_utils import FetchError, Session, TokenBucket
+
+"""
+Streaming downloads of single files, e.g. the non-KEGG items of download.yaml,
+which can be far too big to hold in memory.
+
+The body is written to <file>.part in chunks, and renamed to <file> once
+complete and verified. The validators of the response (ETag, Last-Modified)
+are kept in <file>.meta.json, so that:
+- an interrupted download resumes from the end of <file>.part with a Range
+  request, unless the file changed on the server meanwhile (If-Range);
+- a downloaded file is revalidated with a conditional request, and only
+  downloaded again if it changed (If-None-Match, If-Modified-Since).
+"""
+
+CHUNK_SIZE = 1 << 20
+PARTIAL_SUFFIX = '.part'
+META_SUFFIX = '.meta.json'
+
+
+def parse_checksum(checksum: str) -> Tuple[str, str]:
+    """Split a checksum as given in download.yaml, e.g. 'sha256:9f86d081...'.
+
+    Args:
+        checksum: Name of a hashlib algorithm and hex digest, separated by a colon.
+
+    Returns:
+        The algorithm and the lower case digest.
+
+    Raises:
+        ValueError: when the algorithm is unknown or the digest missing.
+
+    """
+    algorithm, _, digest = checksum.partition(':')
+    algorithm, digest = algorithm.strip().lower(), digest.strip().lower()
+    if not digest or algorithm not in hashlib.algorithms_available:
+        raise ValueError("Invalid checksum '{}', expected '<algorithm>:<hex digest>', "
+                         "e.g. 'sha256:9f86d081...'".format(checksum))
+    return algorithm, digest
+
+
+def file_digest(file: str, algorithm: str) -> str:
+    """Hex digest of a file, read in chunks"""
+    digest = hashlib.new(algorithm)
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_meta(file: str) -> Dict[str, Any]:
+    """Validators recorded for a downloaded file, empty if unknown"""
+    try:
+        with open(file + META_SUFFIX) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_meta(file: str, meta: Dict[str, Any]) -> None:
+    """Record the validators of a downloaded file, atomically"""
+    with open(file + META_SUFFIX + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+    os.replace(file + META_SUFFIX + '.tmp', file + META_SUFFIX)
+
+
+def response_validators(response: Any) -> Dict[str, Any]:
+    """ETag, Last-Modified and full size of the file a 200 or 206 response is part of, when given"""
+    validators: Dict[str, Any] = {}
+    for key, header in (('etag', 'ETag'), ('last_modified', 'Last-Modified')):
+        if response.headers.get(header):
+            validators[key] = response.headers[header]
+    # 'bytes 100-199/1000' for a range, the full size otherwise
+    match = re.search(r'/(\d+)$', response.headers.get('Content-Range', ''))
+    size = match.group(1) if match else response.headers.get('Content-Length')
+    if size is not None and response.status in (200, 206):
+        validators['size'] = int(size)
+    return validators
+
+
+def request_headers(output_file: str, meta: Dict[str, Any], offset: int, revalidate: bool) -> Dict[str, str]:
+    """Range headers resuming the partial file, else conditional headers revalidating the downloaded one"""
+    partial = meta.get('partial', {})
+    # A weak ETag can't be used in If-Range
+    if_range = partial.get('etag') if not partial.get('etag', 'W/').startswith('W/') else partial.get('last_modified')
+    if offset > 0 and if_range:
+        return {'Range': 'bytes={}-'.format(offset), 'If-Range': if_range}
+    headers = {}
+    if revalidate and os.path.exists(output_file):
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    return headers
+
+
+def download_file(url: str, output_file: str, session: Optional[Session] = None, checksum: Optional[str] = None,
+                  revalidate: bool = False, limiter: Optional[TokenBucket] = None) -> bool:
+    """Download a URL to a file in chunks, resuming interrupted downloads.
+
+    Args:
+        url: URL to download.
+        output_file: Path to write to, through output_file + '.part'.
+        session: Session to send the requests through, a new one by default.
+        checksum: Expected checksum of the file, e.g. 'sha256:9f86d081...', not checked by default.
+        revalidate: Whether to ask the server whether an existing output_file changed, instead of downloading
+            it again unconditionally.
+        limiter: TokenBucket shared by the requests to rate limit, none by default.
+
+    Returns:
+        True when the file was downloaded, False when it didn't change.
+
+    Raises:
+        FetchError: when the URL can't be fetched, or the download doesn't match the checksum.
+
+    """
+    if session is None:
+        session = Session()
+    expected = parse_checksum(checksum) if checksum else None
+    partial_file = output_file + PARTIAL_SUFFIX
+    meta = read_meta(output_file)
+    if meta.get('url') != url:
+        # Whatever was downloaded before came from somewhere else
+        meta = {'url': url}
+        if os.path.exists(partial_file):
+            os.remove(partial_file)
+
+    # Failed requests and broken bodies take from the same retries, one request per attempt
+    for attempt in range(session.retries + 1):
+        offset = os.path.getsize(partial_file) if os.path.exists(partial_file) else 0
+        if offset > 0 and offset == meta.get('partial', {}).get('size'):
+            # Interrupted between the last chunk and the rename
+            break
+        response, error, retry_after = session.send(url, attempt, limiter,
+                                                    request_headers(output_file, meta, offset, revalidate))
+        if error is None and response is None:
+            raise FetchError('GET {} failed with status 404'.format(url))
+        if error is None and response.status == 416:
+            # Nothing to resume from the offset, e.g. the partial file of a response without Content-Length that
+            # stalled at its very end: the next attempt starts over
+            session.release(response)
+            os.remove(partial_file)
+            meta.pop('partial', None)
+            write_meta(output_file, meta)
+            error = 'status 416 to a request from byte {}'.format(offset)
+        elif error is None:
+            try:
+                if response.status == 304:
+                    logging.info('{} is up to date'.format(output_file))
+                    return False
+                resumed = response.status == 206
+                if resumed and not response.headers.get('Content-Range', '').startswith('bytes {}-'.format(offset)):
+                    os.remove(partial_file)
+                    raise FetchError('GET {} answered {} to a request from byte {}'.format(
+                        url, response.headers.get('Content-Range'), offset))
+                if resumed:
+                    logging.info('Resuming {} from byte {}'.format(output_file, offset))
+                meta['partial'] = response_validators(response)
+                write_meta(output_file, meta)
+                with open(partial_file, 'ab' if resumed else 'wb') as f:
+                    for chunk in response.stream(CHUNK_SIZE):
+                        f.write(chunk)
+            except urllib3.exceptions.HTTPError as e:
+                # Body cut short or read timeout, the next attempt resumes from the end of what was written
+                session.stats.record_broken_body()
+                error = str(e)
+            else:
+                break
+            finally:
+                session.release(response)
+        session.back_off(url, error, attempt, retry_after, limiter)
+
+    if expected is not None:
+        algorithm, digest = expected
+        actual = file_digest(partial_file, algorithm)
+        if actual != digest:
+            os.remove(partial_file)
+            raise FetchError('{} checksum of {} is {}, expected {}'.format(algorithm, url, actual, digest))
+    os.replace(partial_file, output_file)
+    validators = meta.pop('partial', {})
+    write_meta(output_file, {'url': url, **validators})
+    return True
@@ -3,13 +3,18 @@
 import gzip
 import logging
 import os
+import queue
 import re
 import shutil
 import tempfile
+import threading
 import zipfile
+from itertools import islice
 from typing import Any, Dict, List, Union
 from tqdm import tqdm  # type: ignore
 
+from kg_converter.utils import profile_utils
+
 
 class TransformError(Exception):
     """Base class for other exceptions"""
@@ -82,6 +87,149 @@ def write_node_edge_item(fh: Any, header: List, data: List, sep: str = '\t'):
         logging.warning("Can't write data for {}".format(data))
 
 
+# Rows held by NodeEdgeWriter before a write, and characters escaped in values
+DEFAULT_BUFFER_ROWS = 10000
+ESCAPES = str.maketrans({'\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+class NodeEdgeWriter:
+    """Buffered writer of a node or edge *.tsv file.
+
+    Rows are accumulated and written out in blocks of buffer_size rows, with one
+    column count check per block. Tabs and newlines inside values are escaped.
+    Files ending in .gz are gzip-compressed on a background thread.
+    """
+
+    def __init__(self, filename: str, header: List, mode: str = 'w',
+                 buffer_size: int = DEFAULT_BUFFER_ROWS, sep: str = '\t'):
+        """
+        :param filename: node or edge file to write
+        :param header: list of header items, written out when mode is 'w'
+        :param mode: 'w' to create the file, 'a' to append to it
+        :param buffer_size: number of rows per write [10000]
+        :param sep: separator [\t]
+        """
+        self.filename = filename
+        self.header = header
+        self.buffer_size = max(1, buffer_size)
+        self.sep = sep
+        self.rows: List[List] = []
+        self.compress = filename.endswith('.gz')
+        self.error: Union[BaseException, None] = None
+        self.stage_name = 'write ' + os.path.basename(filename)
+
+        if self.compress:
+            self.fh = gzip.open(filename, mode + 'b')
+            self.queue: queue.Queue = queue.Queue(maxsize=4)
+            self.thread = threading.Thread(target=self._compress, daemon=True)
+            self.thread.start()
+        else:
+            self.fh = open(filename, mode, buffering=1 << 20)
+
+        if mode == 'w':
+            self._write(sep.join(header) + "\n")
+
+    def __enter__(self) -> 'NodeEdgeWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, data: List) -> None:
+        """Add a single node or edge row
+        :param data: data for line to write out
+        """
+        self.rows.append(data)
+        if len(self.rows) >= self.buffer_size:
+            self.flush()
+
+    def write_frame(self, df: Any) -> None:
+        """Write out all rows of a pandas DataFrame with one column per header item
+        :param df: DataFrame of nodes or edges
+        """
+        if len(self.header) != len(df.columns):
+            raise Exception('Header and data are not the same length.')
+        if len(df) == 0:
+            return
+        self.flush()
+        with profile_utils.stage(self.stage_name) as stage:
+            columns = [df[c].astype(str).str.translate(ESCAPES) for c in df.columns]
+            self._write("\n".join(columns[0].str.cat(columns[1:], sep=self.sep)) + "\n")
+            stage.rows_out += len(df)
+
+    def write_lines(self, lines: Any) -> None:
+        """Write out lines already formatted for this file (e.g. read from another node or edge file)
+        :param lines: iterable of lines, each ending in a newline
+        """
+        self.flush()
+        lines = iter(lines)
+        while True:
+            block = ''.join(islice(lines, self.buffer_size))
+            if not block:
+                return
+            with profile_utils.stage(self.stage_name) as stage:
+                self._write(block)
+                stage.rows_out += block.count("\n")
+
+    def flush(self) -> None:
+        """Write out the buffered rows"""
+        if not self.rows:
+            return
+        rows, self.rows = self.rows, []
+        if any(len(row) != len(self.header) for row in rows):
+            raise Exception('Header and data are not the same length.')
+
+        with profile_utils.stage(self.stage_name) as stage:
+            block = "\n".join(map(self.sep.join, rows))
+            # Separators or line breaks beyond the expected ones come from values
+            if block.count(self.sep) != len(rows) * (len(self.header) - 1) \
+                    or block.count("\n") != len(rows) - 1 or "\r" in block:
+                block = "\n".join(self.sep.join(str(x).translate(ESCAPES) for x in row) for row in rows)
+            self._write(block + "\n")
+            stage.rows_out += len(rows)
+
+    def close(self) -> None:
+        """Flush the buffered rows and close the file, raising the error of the compression thread if any"""
+        try:
+            self.flush()
+        finally:
+            if self.compress and self.thread.is_alive():
+                self.queue.put(None)
+                self.thread.join()
+            try:
+                self.fh.close()
+            except Exception:
+                if self.error is None:
+                    raise
+        if self.error is not None:
+            raise self.error
+
+    def _write(self, text: str) -> None:
+        if self.compress:
+            # The compression thread drains the queue even after an error, so this never blocks for good
+            if self.error is not None:
+                raise self.error
+            self.queue.put(text.encode())
+            return
+        try:
+            self.fh.write(text)
+        except IOError:
+            logging.warning("Can't write data for {}".format(self.filename))
+
+    def _compress(self) -> None:
+        while True:
+            data = self.queue.get()
+            if data is None:
+                return
+            if self.error is not None:
+                continue
+            try:
+                self.fh.write(data)
+            except BaseException as e:
+                logging.warning("Can't write data for {}: {}".format(self.filename, e))
+                self.error = e
+
+
 def get_item_by_priority(items_dict: dict, keys_by_priority: list) -> str:
     """Retrieve item from a dict using a list of keys, in descending order of priority
 
@@ -1,14 +1,26 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import os
+from typing import Optional
 
 import click
 from kg_converter import download as kg_download
 from kg_converter import transform as kg_transform
+from kg_converter.benchmark import benchmark as kg_benchmark
+from kg_converter.benchmark import benchmark_download as kg_benchmark_download
 #from kg_converter.make_holdouts import make_holdouts
 from kg_converter.merge_utils.merge_kg import load_and_merge
 #from kg_converter.query import run_query, parse_query_yaml, result_dict_to_tsv
 from kg_converter.transform import DATA_SOURCES
+from kg_converter.transform_utils.kegg import DEDUP_BACKENDS, ENGINES, KEGGTransform
+from kg_converter.utils.columnar_utils import FORMATS as OUTPUT_FORMATS
+from kg_converter.utils.columnar_utils import SUFFIXES as COLUMNAR_FORMATS
+from kg_converter.utils.columnar_utils import write_columnar
+from kg_converter.utils.csr_utils import export_csr
+from kg_converter.utils.journal_utils import read_journal
+from kg_converter.utils.mock_kegg_utils import LocalKEGG, MockKEGGServer
+from kg_converter.utils.profile_utils import profiling
+from kg_converter.utils.synthetic_utils import write_synthetic_kegg
 
 
 @click.group()
@@ -16,25 +28,49 @@ def cli():
     pass
 
 
+def profile_options(command):
+    """Add the --profile and --pstats options to a command"""
+    command = click.option("pstats", "--pstats", default=None, type=click.Path(),
+                           help='dump cProfile statistics of the slowest stage to this file [none]')(command)
+    return click.option("profile", "--profile", default=None, type=click.Path(),
+                        help='write wall time, rows and peak RSS per stage to this JSON file [none]')(command)
+
+
 @cli.command()
 @click.option("yaml_file", "-y", required=True, default="download.yaml",
               type=click.Path(exists=True))
 @click.option("output_dir", "-o", required=True, default="data/raw")
 @click.option("ignore_cache", "-i", is_flag=True, default=False,
               help='ignore cache and download files even if they exist [false]')
-def download(*args, **kwargs) -> None:
+@click.option("concurrency", "-c", "--concurrency", default=3, type=int,
+              help='number of KEGG GET requests in flight [3]')
+@click.option("rate", "-r", "--rate", default=3.0, type=float,
+              help='maximum number of KEGG requests per second, across all downloads [3]')
+@click.option("jobs", "-j", "--jobs", default=4, type=int,
+              help='number of files downloaded at once [4]')
+@click.option("sync", "-s", "--sync", is_flag=True, default=False,
+              help='update cached files (KEGG ones to the current KEGG release), downloading only what changed [false]')
+@profile_options
+def download(*args, profile: Optional[str] = None, pstats: Optional[str] = None, **kwargs) -> None:
     """Downloads data files from list of URLs (default: download.yaml) into data
     directory (default: data/raw).
 
     :param yaml_file: Specify the YAML file containing a list of datasets to download.
     :param output_dir: A string pointing to the directory to download data to.
     :param ignore_cache: If specified, will ignore existing files and download again.
+    :param concurrency: Number of KEGG GET requests in flight.
+    :param rate: Maximum number of KEGG requests per second, across all downloads.
+    :param jobs: Number of files downloaded at once.
+    :param sync: Update cached files, KEGG ones to the current KEGG release.
+    :param profile: JSON file to write the per-stage profile to.
+    :param pstats: File to dump the cProfile statistics of the slowest stage to.
 
     :return: None.
 
     """
 
-    kg_download(*args, **kwargs)
+    with profiling(profile, pstats, 'download'):
+        kg_download(*args, **kwargs)
 
     return None
 
@@ -44,40 +80,220 @@ def download(*args, **kwargs) -> None:
 @click.option("output_dir", "-o", default="data/transformed")
 @click.option("sources", "-s", default=None, multiple=True,
               type=click.Choice(DATA_SOURCES.keys()))
-def transform(*args, **kwargs) -> None:
+@click.option("engine", "-e", default="row", type=click.Choice(ENGINES),
+              help='row: line by line, vectorized: whole link tables at once, '
+                   'streaming: tables in bounded chunks, sqlite: indexed joins in data/raw/kegg.sqlite [row]')
+@click.option("workers", "-w", "--workers", default=1, type=int,
+              help='number of processes transforming link files (or chunks of them) [1]')
+@click.option("chunk_size", "--chunk-size", default=50000, type=int,
+              help='rows per chunk read by the streaming engine [50000]')
+@click.option("memory_budget", "-m", "--memory-budget", default=None, type=int,
+              help='peak RSS in MiB the streaming engine shrinks its chunks to stay under [none]')
+@click.option("compress", "-z", "--gzip", is_flag=True, default=False,
+              help='write gzip-compressed nodes.tsv.gz and edges.tsv.gz [false]')
+@click.option("incremental", "-c", "--incremental", is_flag=True, default=False,
+              help='skip unchanged inputs, recomputing only the link files changed since the last '
+                   'incremental run [false]')
+@click.option("output_format", "-f", "--format", default="tsv", type=click.Choice(OUTPUT_FORMATS),
+              help='also write nodes and edges as Parquet or Arrow IPC tables [tsv]')
+@click.option("dedup", "-d", "--dedup", default="interned", type=click.Choice(DEDUP_BACKENDS),
+              help='how nodes and edges are deduplicated across link files, except by the vectorized engine: '
+                   'interned: CURIEs interned in memory, hash: 64-bit hashes in memory, external: external '
+                   'sort on disk, bloom: Bloom filter then a verification pass [interned]')
+@profile_options
+def transform(*args, profile: Optional[str] = None, pstats: Optional[str] = None, **kwargs) -> None:
     """Calls scripts in kg_converter/transform/[source name]/ to transform each source
     into nodes and edges.
 
     :param input_dir: A string pointing to the directory to import data from.
     :param output_dir: A string pointing to the directory to output data to.
     :param sources: A list of sources to transform.
+    :param engine: Transform engine, 'row', 'vectorized', 'streaming' or 'sqlite'.
+    :param workers: Number of worker processes.
+    :param chunk_size: Rows per chunk of the streaming engine.
+    :param memory_budget: Peak RSS (MiB) targeted by the streaming engine.
+    :param compress: If specified, gzip-compress the node and edge files.
+    :param incremental: If specified, only recompute the link files changed since the previous run.
+    :param output_format: 'parquet' or 'arrow' to also write columnar node and edge tables.
+    :param dedup: Dedup backend, 'interned', 'hash', 'external' or 'bloom'.
+    :param profile: JSON file to write the per-stage profile to.
+    :param pstats: File to dump the cProfile statistics of the slowest stage to.
 
     :Returns:None.
 
     """
 
     # call transform script for each source
-    kg_transform(*args, **kwargs)
+    with profiling(profile, pstats, 'transform'):
+        kg_transform(*args, **kwargs)
 
     return None
 
 
+@cli.command(name='kegg-store')
+@click.option("input_dir", "-i", default="data/raw", type=click.Path(exists=True))
+@click.option("sql", "-q", "--query", default=None,
+              help='SQL query to run on the store, its result is printed as TSV [none]')
+def kegg_store(input_dir: str, sql: Optional[str]) -> None:
+    """Load the raw KEGG files into an indexed SQLite store (input_dir/kegg.sqlite),
+    rebuilt only when they changed, and optionally query it.
+
+    :param input_dir: A string pointing to the directory of the downloaded KEGG files.
+    :param sql: SQL query, e.g. "SELECT * FROM compounds LIMIT 10".
+
+    :return: None.
+
+    """
+    t = KEGGTransform(input_dir=input_dir)
+    with t.load_store(*t.input_tables()) as store:
+        if sql:
+            click.echo(store.query(sql).to_csv(sep='\t', index=False), nl=False)
+
+
 @cli.command()
 @click.option('yaml', '-y', default="merge.yaml", type=click.Path(exists=True))
 @click.option('processes', '-p', default=1, type=int)
-def merge(yaml: str, processes: int) -> None:
+@profile_options
+def merge(yaml: str, processes: int, profile: Optional[str] = None, pstats: Optional[str] = None) -> None:
     """Use KGX to load subgraphs to create a merged graph.
 
     Args:
         yaml: A string pointing to a KGX compatible config YAML.
         processes: Number of processes to use.
+        profile: JSON file to write the per-stage profile to.
+        pstats: File to dump the cProfile statistics of the slowest stage to.
 
     Returns:
         None.
 
     """
 
-    load_and_merge(yaml, processes)
+    with profiling(profile, pstats, 'merge'):
+        load_and_merge(yaml, processes)
+
+
+@cli.command()
+@click.option("output", "-o", default="benchmark.json", type=click.Path(),
+              help='JSON file to write the results to [benchmark.json]')
+@click.option("scale", "-s", "--scale", default=0.01, type=float,
+              help='scale of the synthetic KEGG data, 1.0 being roughly a full release [0.01]')
+@click.option("seed", "--seed", default=0, type=int, help='random seed of the synthetic data [0]')
+@click.option("repeat", "-r", "--repeat", default=3, type=int, help='timed runs per benchmark [3]')
+@click.option("data_dir", "-d", "--data-dir", default=None, type=click.Path(),
+              help='keep the synthetic data and transform output in this directory [temporary]')
+def benchmark(*args, **kwargs) -> None:
+    """Time the KEGG download parsers and transform on synthetic KEGG data,
+    and write timings and peak memory as JSON.
+
+    :param output: JSON file to write the results to.
+    :param scale: Scale of the synthetic KEGG data.
+    :param seed: Random seed of the synthetic data.
+    :param repeat: Number of timed runs per benchmark.
+    :param data_dir: Directory to keep the synthetic data in.
+
+    :return: None.
+
+    """
+
+    kg_benchmark(*args, **kwargs)
+
+    return None
+
+
+@cli.command()
+@click.option("output", "-o", default="benchmark_download.json", type=click.Path(),
+              help='JSON file to write the results to [benchmark_download.json]')
+@click.option("scale", "-s", "--scale", default=0.01, type=float,
+              help='scale of the synthetic KEGG data, 1.0 being roughly a full release [0.01]')
+@click.option("seed", "--seed", default=0, type=int, help='random seed of the synthetic data [0]')
+@click.option("repeat", "-r", "--repeat", default=3, type=int, help='timed downloads [3]')
+@click.option("yaml_file", "-y", default="download.yaml", type=click.Path(exists=True),
+              help='download.yaml to take the KEGG items from [download.yaml]')
+@click.option("jobs", "-j", "--jobs", default=4, type=int, help='number of files downloaded at once [4]')
+@click.option("concurrency", "-c", "--concurrency", default=3, type=int,
+              help='number of KEGG GET requests in flight [3]')
+@click.option("rate", "--rate", default=float('inf'), type=float,
+              help='maximum number of requests per second of the client [no limit]')
+@click.option("latency", "--latency", default=0.0, type=float,
+              help='seconds the server waits before answering each request [0]')
+@click.option("rate_limit", "--rate-limit", default=float('inf'), type=float,
+              help='requests per second over which the server answers 403 [no limit]')
+@click.option("truncate", "--truncate", default=0.0, type=float,
+              help='fraction of the responses the server cuts short [0]')
+def benchmark_download(*args, **kwargs) -> None:
+    """Time end-to-end downloads of download.yaml against a local mock KEGG server
+    serving synthetic data, and write the throughput as JSON.
+
+    :param output: JSON file to write the results to.
+    :param scale: Scale of the synthetic KEGG data.
+    :param seed: Random seed of the synthetic data.
+    :param repeat: Number of timed downloads.
+    :param yaml_file: download.yaml to take the KEGG items from.
+    :param jobs: Number of files downloaded at once.
+    :param concurrency: Number of KEGG GET requests in flight.
+    :param rate: Maximum number of requests per second of the client.
+    :param latency: Seconds the server waits before answering each request.
+    :param rate_limit: Requests per second over which the server answers 403.
+    :param truncate: Fraction of the responses the server cuts short.
+
+    :return: None.
+
+    """
+
+    kg_benchmark_download(*args, **kwargs)
+
+    return None
+
+
+@cli.command()
+@click.option("data_dir", "-d", "--data-dir", default="data/mock_kegg", type=click.Path(),
+              help='list, link and conv files to serve, written from synthetic data if missing [data/mock_kegg]')
+@click.option("scale", "-s", "--scale", default=0.01, type=float,
+              help='scale of the synthetic KEGG data, 1.0 being roughly a full release [0.01]')
+@click.option("seed", "--seed", default=0, type=int, help='random seed of the synthetic data [0]')
+@click.option("journals", "-g", "--get-journal", multiple=True, type=click.Path(exists=True),
+              help='GET journal (*.journal.jsonl) of captured records to serve, repeatable [none]')
+@click.option("port", "-p", "--port", default=8000, type=int, help='port to listen on [8000]')
+@click.option("latency", "--latency", default=0.0, type=float,
+              help='seconds to wait before answering each request [0]')
+@click.option("rate_limit", "--rate-limit", default=float('inf'), type=float,
+              help='requests per second over which requests are answered 403 [no limit]')
+@click.option("truncate", "--truncate", default=0.0, type=float,
+              help='fraction of the responses cut short [0]')
+def mock_kegg(data_dir: str, scale: float, seed: int, journals: tuple, port: int, latency: float,
+              rate_limit: float, truncate: float) -> None:
+    """Serve the KEGG REST API locally, from synthetic or captured data, until interrupted.
+    Point a download.yaml at http://127.0.0.1:<port>/ instead of http://rest.kegg.jp/ to use it.
+
+    :param data_dir: Directory of the list, link and conv files to serve.
+    :param scale: Scale of the synthetic KEGG data.
+    :param seed: Random seed of the synthetic data.
+    :param journals: GET journals of captured records to serve.
+    :param port: Port to listen on.
+    :param latency: Seconds to wait before answering each request.
+    :param rate_limit: Requests per second over which requests are answered 403.
+    :param truncate: Fraction of the responses cut short.
+
+    :return: None.
+
+    """
+
+    if not os.path.isdir(data_dir):
+        write_synthetic_kegg(data_dir, scale=scale, seed=seed)
+    records = {}
+    for journal in journals:
+        records.update(read_journal(journal)[0])
+    server = MockKEGGServer(LocalKEGG(data_dir, scale, seed, records), port=port, latency=latency,
+                            rate_limit=rate_limit, truncate=truncate, seed=seed)
+    print('Serving KEGG REST API at ' + server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return None
 
 
 @cli.command()
@@ -107,6 +323,60 @@ def query(yaml: str, output_dir: str,
     result_dict_to_tsv(result_dict, outfile)
 
 
+@cli.command()
+@click.option("nodes", "-n", help="nodes KGX TSV file", default="data/merged/nodes.tsv",
+              type=click.Path(exists=True))
+@click.option("edges", "-e", help="edges KGX TSV file", default="data/merged/edges.tsv",
+              type=click.Path(exists=True))
+@click.option("output_format", "-f", "--format", default="parquet", type=click.Choice(list(COLUMNAR_FORMATS)),
+              help='columnar format to write [parquet]')
+@profile_options
+def columnar(nodes: str, edges: str, output_format: str, profile: Optional[str] = None,
+             pstats: Optional[str] = None) -> None:
+    """Write Parquet or Arrow IPC copies of a node and an edge TSV file next to them,
+    e.g. of the merged graph once extracted from data/merged/merged-kg.tar.gz
+
+    The transform writes them itself with its -f/--format option.
+    \f
+    Args:
+        :param nodes:         nodes of the graph [data/merged/nodes.tsv]
+        :param edges:         edges of the graph [data/merged/edges.tsv]
+        :param output_format: 'parquet' or 'arrow' [parquet]
+        :param profile:       JSON file to write the per-stage profile to.
+        :param pstats:        File to dump the cProfile statistics of the slowest stage to.
+
+    """
+    with profiling(profile, pstats, 'columnar'):
+        write_columnar(nodes, edges, None, None, output_format)
+
+
+@cli.command(name='export-csr')
+@click.option("nodes", "-n", help="nodes KGX TSV (or Parquet/Arrow) file", default="data/merged/nodes.tsv",
+              type=click.Path(exists=True))
+@click.option("edges", "-e", help="edges KGX TSV (or Parquet/Arrow) file", default="data/merged/edges.tsv",
+              type=click.Path(exists=True))
+@click.option("output_dir", "-o", help="output directory", default="data/csr/", type=click.Path())
+@profile_options
+def export(nodes: str, edges: str, output_dir: str, profile: Optional[str] = None,
+           pstats: Optional[str] = None) -> None:
+    """Export a graph as integer node IDs and CSR adjacency, for ML consumers
+
+    Writes node_ids.npy, indptr.npy, indices.npy, edge_predicates.npy,
+    edge_rows.npy and predicates.npy in [output_dir], to be loaded with
+    np.load(file, mmap_mode='r'), see kg_converter.utils.csr_utils.
+    \f
+    Args:
+        :param nodes:      nodes of the graph [data/merged/nodes.tsv]
+        :param edges:      edges of the graph [data/merged/edges.tsv]
+        :param output_dir: directory to write the arrays to [data/csr/]
+        :param profile:    JSON file to write the per-stage profile to.
+        :param pstats:     File to dump the cProfile statistics of the slowest stage to.
+
+    """
+    with profiling(profile, pstats, 'export-csr'):
+        export_csr(nodes, edges, output_dir)
+
+
 @cli.command()
 @click.option("nodes", "-n", help="nodes KGX TSV file", default="data/merged/nodes.tsv",
               type=click.Path(exists=True))
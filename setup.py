@@ -36,11 +36,15 @@ test_deps = [
     'sphinx',
     'sphinx_rtd_theme',
     'recommonmark',
-    'parameterized'
+    'parameterized',
+    # Parquet/Arrow output and the typed KEGG table loader are tested too
+    'pyarrow'
 ]
 
 extras = {
     'test': test_deps,
+    # Parquet and Arrow output of the transform
+    'columnar': ['pyarrow'],
 }
 
 setup(
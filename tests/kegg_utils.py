@@ -0,0 +1,26 @@
+import os
+import tempfile
+import unittest
+from typing import Optional
+
+from kg_converter.transform_utils.kegg import KEGGTransform
+from kg_converter.transform_utils.kegg.dedup import open_text
+
+
+class KEGGTransformTestCase(unittest.TestCase):
+    """TestCase running the KEGG transform and comparing the graphs of two runs
+    """
+
+    input_dir = 'tests/resources/kegg/raw/'
+
+    def run_transform(self, input_dir: Optional[str] = None, **kwargs) -> KEGGTransform:
+        t = KEGGTransform(input_dir=input_dir or self.input_dir, output_dir=tempfile.mkdtemp(), **kwargs)
+        t.run()
+        return t
+
+    def assert_same_output(self, a: KEGGTransform, b: KEGGTransform) -> None:
+        # Same nodes and edges, gzipped or not, and the same duplicates reported
+        for fn in [a.output_node_file, a.output_edge_file]:
+            with open_text(fn, 'r') as f, open_text(os.path.join(b.output_dir, os.path.basename(fn)), 'r') as g:
+                self.assertEqual(f.read(), g.read())
+        self.assertEqual(a.registry.report(), b.registry.report())
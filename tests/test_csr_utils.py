@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from kg_converter.transform_utils.kegg import KEGGTransform
+from kg_converter.utils import columnar_utils
+from kg_converter.utils.csr_utils import export_csr, load_csr, read_graph_columns
+
+NODES = '''id\tname\tcategory
+A:1\ta\tbiolink:Pathway
+A:2\tb\tbiolink:Pathway
+A:3\tc\tbiolink:Pathway
+'''
+
+EDGES = '''subject\tpredicate\tobject\trelation
+A:2\tbiolink:part_of\tA:1\tRO:1
+A:1\tbiolink:has_participant\tA:3\tRO:2
+A:2\tbiolink:has_participant\tA:9\tRO:2
+A:1\tbiolink:has_participant\tA:2\tRO:2
+'''
+
+
+class TestCSRUtils(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.tmp_dir, 'csr')
+
+    def write(self, fn: str, text: str) -> str:
+        path = os.path.join(self.tmp_dir, fn)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_export_csr(self):
+        summary = export_csr(self.write('nodes.tsv', NODES), self.write('edges.tsv', EDGES), self.output_dir)
+        self.assertEqual({'node_count': 4, 'node_file_count': 3, 'edge_count': 4, 'predicate_count': 2},
+                         {k: v for k, v in summary.items() if k != 'dtypes'})
+        csr = load_csr(self.output_dir)
+        self.assertTrue(all(isinstance(array, np.memmap) for array in csr.values()))
+        # Node file order, then the missing object
+        self.assertEqual([b'A:1', b'A:2', b'A:3', b'A:9'], csr['node_ids'].tolist())
+        self.assertEqual([0, 2, 4, 4, 4], csr['indptr'].tolist())
+        self.assertEqual([2, 1, 0, 3], csr['indices'].tolist())
+        self.assertEqual(np.int32, csr['indices'].dtype)
+        self.assertEqual([b'biolink:has_participant', b'biolink:part_of'], csr['predicates'].tolist())
+        self.assertEqual([0, 0, 1, 0], csr['edge_predicates'].tolist())
+        self.assertEqual([1, 3, 0, 2], csr['edge_rows'].tolist())
+
+    @unittest.skipUnless(columnar_utils.pa is not None, 'needs pyarrow')
+    def test_columnar_input_matches_tsv(self):
+        t = KEGGTransform(input_dir='tests/resources/kegg/raw/', output_dir=self.tmp_dir, engine='vectorized',
+                          output_format='parquet')
+        t.run()
+        export_csr(t.output_node_file, t.output_edge_file, self.output_dir)
+        from_tsv = {name: np.array(array) for name, array in load_csr(self.output_dir).items()}
+        export_csr(t.output_node_file.replace('.tsv', '.parquet'), t.output_edge_file.replace('.tsv', '.parquet'),
+                   self.output_dir)
+        for name, array in load_csr(self.output_dir).items():
+            np.testing.assert_array_equal(from_tsv[name], array)
+        # Each edge of the edge file is found from its subject
+        edges = read_graph_columns(t.output_edge_file, ['subject', 'object'])
+        ids = from_tsv['node_ids'].astype(str).tolist()
+        first = edges.iloc[0]
+        node = ids.index(first['subject'])
+        neighbours = from_tsv['indices'][from_tsv['indptr'][node]:from_tsv['indptr'][node + 1]]
+        self.assertIn(ids.index(first['object']), neighbours.tolist())
@@ -1,7 +1,13 @@
 import os
 import tempfile
+import time
 from unittest import TestCase, mock
-from kg_converter.utils import download_from_yaml
+
+from parameterized import parameterized
+
+from kg_converter.benchmark import LocalKEGG
+from kg_converter.utils import download_from_yaml, download_utils
+from kg_converter.utils.synthetic_utils import write_synthetic_kegg
 
 
 class TestDownloadFromYaml(TestCase):
@@ -49,3 +55,41 @@ class TestDownloadFromYaml(TestCase):
     #                        output_dir=self.tempdir,
     #                        ignore_cache=False)
     #     self.assertTrue(not self.mock_get.called)
+
+
+class TestDownloadFromYamlKEGG(TestCase):
+    """Tests download_from_yaml() of the project's download.yaml against a LocalKEGG
+    """
+
+    def setUp(self) -> None:
+        self.scale = 0.005
+        self.raw_dir = tempfile.mkdtemp()
+        self.rows = write_synthetic_kegg(self.raw_dir, scale=self.scale, seed=1)
+
+    @parameterized.expand([(1,), (4,)])
+    def test_download_from_yaml(self, jobs):
+        output_dir = tempfile.mkdtemp()
+        with mock.patch.object(download_utils.urllib3, 'PoolManager',
+                               return_value=LocalKEGG(self.raw_dir, self.scale, seed=1)):
+            download_from_yaml('download.yaml', output_dir, rate=float('inf'), jobs=jobs)
+        self.assertEqual(sorted(self.rows), sorted(os.listdir(output_dir)))
+        for fn in self.rows:
+            with open(os.path.join(self.raw_dir, fn)) as a, open(os.path.join(output_dir, fn)) as b:
+                self.assertEqual(a.read(), b.read(), fn)
+
+    def test_run_tasks_order(self):
+        finished = []
+        tasks = [download_utils.DownloadTask('kegg-ko.tsv', lambda: finished.append('kegg-ko.tsv'),
+                                             frozenset(['ko.tsv'])),
+                 download_utils.DownloadTask('ko.tsv', lambda: (time.sleep(0.05), finished.append('ko.tsv'))),
+                 download_utils.DownloadTask('rn.tsv', lambda: finished.append('rn.tsv'))]
+        download_utils.run_tasks(tasks, jobs=3)
+        self.assertEqual(['rn.tsv', 'ko.tsv', 'kegg-ko.tsv'], finished)
+
+        def fail():
+            raise ValueError('no')
+        with self.assertRaises(ValueError):
+            download_utils.run_tasks([download_utils.DownloadTask('a', fail),
+                                      download_utils.DownloadTask('b', lambda: finished.append('b'),
+                                                                  frozenset(['a']))])
+        self.assertNotIn('b', finished)
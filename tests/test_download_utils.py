@@ -0,0 +1,101 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+from parameterized import parameterized
+from urllib3.response import HTTPResponse
+
+from kg_converter.benchmark import KEGG_REST_URL, LocalKEGG
+from kg_converter.utils import download_utils
+from kg_converter.utils.fetch_utils import FetchError
+from kg_converter.utils.journal_utils import read_journal
+from kg_converter.utils.synthetic_utils import GET_TABLES, LIST_FILES, write_synthetic_kegg
+
+
+class PartialKEGG(LocalKEGG):
+    """LocalKEGG counting the requests and leaving out the last entry of every multi-entry response"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.urls = []
+
+    def request(self, method: str, url: str, **kwargs):
+        self.urls.append(url)
+        if '+' in url:
+            url = url.rsplit('+', 1)[0]
+        return super().request(method, url, **kwargs)
+
+
+class FailingKEGG(PartialKEGG):
+    """LocalKEGG answering every request after the first ones with a client error"""
+
+    def __init__(self, *args, fail_after: int = 0, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.fail_after = fail_after
+
+    def request(self, method: str, url: str, **kwargs):
+        if len(self.urls) >= self.fail_after:
+            self.urls.append(url)
+            return HTTPResponse(body=io.BytesIO(b''), status=400, preload_content=kwargs.get('preload_content', True))
+        return super().request(method, url, **kwargs)
+
+
+class TestDownloadUtils(unittest.TestCase):
+    """Tests the KEGG REST downloads against a LocalKEGG serving synthetic tables
+    """
+
+    def setUp(self) -> None:
+        self.scale = 0.005
+        self.raw_dir = tempfile.mkdtemp()
+        self.rows = write_synthetic_kegg(self.raw_dir, scale=self.scale, seed=1)
+
+    @parameterized.expand([(1,), (3,), (10,)])
+    def test_batched_get_retries_missing_entries(self, batch_size):
+        partial_kegg = PartialKEGG(self.raw_dir, self.scale, seed=1)
+        with mock.patch.object(download_utils.urllib3, 'PoolManager', return_value=partial_kegg):
+            parsed = download_utils.parse_response_get(KEGG_REST_URL + 'get/', self.raw_dir, 'ko', concurrency=4,
+                                                       rate=float('inf'), batch_size=batch_size)
+        written = pd.read_csv(os.path.join(self.raw_dir, GET_TABLES['ko'][0]), sep='\t', dtype=str)
+        pd.testing.assert_frame_equal(written, parsed.astype(str))
+        # One request per batch, plus one for the entry left out of each multi-entry batch
+        batch_sizes = [min(batch_size, len(written) - i) for i in range(0, len(written), batch_size)]
+        retries = sum(1 for size in batch_sizes if size > 1)
+        self.assertEqual(len(batch_sizes) + retries, len(partial_kegg.urls))
+
+    @parameterized.expand([('pathway',), ('rn',), ('cpd',), ('ko',)])
+    def test_stream_response_matches_list_file(self, db):
+        output_file = os.path.join(tempfile.mkdtemp(), 'list.tsv')
+        with mock.patch.object(download_utils.urllib3, 'PoolManager',
+                               return_value=LocalKEGG(self.raw_dir, self.scale, seed=1)):
+            rows = download_utils.stream_response(KEGG_REST_URL + 'list/' + db, output_file)
+            parsed = download_utils.parse_response(KEGG_REST_URL + 'list/' + db)
+        with open(os.path.join(self.raw_dir, LIST_FILES[db][0])) as a, open(output_file) as b:
+            self.assertEqual(a.read(), b.read())
+        self.assertEqual(len(parsed), rows)
+        self.assertEqual(['{}Id'.format(db), db], list(parsed.columns))
+
+    def test_get_resumes_from_journal(self):
+        journal_file = os.path.join(tempfile.mkdtemp(), 'kegg-ko.tsv.journal.jsonl')
+        failing_kegg = FailingKEGG(self.raw_dir, self.scale, seed=1, fail_after=4)
+        with mock.patch.object(download_utils.urllib3, 'PoolManager', return_value=failing_kegg):
+            with self.assertRaises(FetchError):
+                download_utils.parse_response_get(KEGG_REST_URL + 'get/', self.raw_dir, 'ko', concurrency=1,
+                                                  rate=float('inf'), journal_file=journal_file)
+        # Two complete batches, each needing a retry for its left out entry, and a line cut short
+        entries, _ = read_journal(journal_file)
+        self.assertEqual(20, len(entries))
+        with open(journal_file, 'a') as f:
+            f.write('{"id": "ko:K')
+
+        partial_kegg = PartialKEGG(self.raw_dir, self.scale, seed=1)
+        with mock.patch.object(download_utils.urllib3, 'PoolManager', return_value=partial_kegg):
+            parsed = download_utils.parse_response_get(KEGG_REST_URL + 'get/', self.raw_dir, 'ko', concurrency=4,
+                                                       rate=float('inf'), journal_file=journal_file)
+        written = pd.read_csv(os.path.join(self.raw_dir, GET_TABLES['ko'][0]), sep='\t', dtype=str)
+        pd.testing.assert_frame_equal(written, parsed.astype(str))
+        requested = {id for url in partial_kegg.urls for id in url[len(KEGG_REST_URL + 'get/'):].split('+')}
+        self.assertFalse(requested & set(entries))
+        self.assertEqual(len(written), len(read_journal(journal_file)[0]))
@@ -0,0 +1,105 @@
+import io
+import random
+import threading
+import time
+import unittest
+
+from urllib3.exceptions import ProtocolError
+from urllib3.response import HTTPResponse
+
+from kg_converter.utils.fetch_utils import FetchError, Session, TokenBucket, fetch, fetch_all
+
+
+class FakeKEGG:
+    """Answers each URL with its own name, after a random delay, failing the first requests with the given statuses"""
+
+    def __init__(self, statuses=()) -> None:
+        self.statuses = list(statuses)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def request(self, method: str, url: str, preload_content: bool = True, **kwargs) -> HTTPResponse:
+        with self.lock:
+            self.requests += 1
+            status = self.statuses.pop(0) if self.statuses else 200
+        time.sleep(random.uniform(0, 0.01))
+        return HTTPResponse(body=io.BytesIO(url.encode()), status=status, preload_content=preload_content)
+
+
+class BrokenBody(io.BytesIO):
+    """Body losing its connection half way"""
+
+    def read(self, *args) -> bytes:
+        raise ProtocolError('Connection broken')
+
+
+class BrokenKEGG(FakeKEGG):
+    """FakeKEGG whose successful responses are all cut short"""
+
+    def request(self, method: str, url: str, preload_content: bool = True, **kwargs) -> HTTPResponse:
+        response = super().request(method, url, preload_content=preload_content, **kwargs)
+        if response.status >= 400:
+            return response
+        return HTTPResponse(body=BrokenBody(), status=response.status, preload_content=preload_content)
+
+
+class TestFetchUtils(unittest.TestCase):
+
+    def test_fetch_all_keeps_input_order(self):
+        urls = ['http://rest.kegg.jp/get/ko:K{:05d}'.format(i) for i in range(50)]
+        bodies = fetch_all(urls, concurrency=8, rate=float('inf'), http=FakeKEGG())
+        self.assertEqual([url.encode() for url in urls], bodies)
+
+    def test_token_bucket_rate(self):
+        limiter = TokenBucket(rate=50)
+        start = time.monotonic()
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(11)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # One token is available up front, the other 10 come at 50 per second
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_backoff_on_rate_limiting(self):
+        http = FakeKEGG(statuses=[429, 503])
+        self.assertEqual(b'url', fetch(http, 'url', TokenBucket(float('inf')), backoff=0.01))
+        self.assertEqual(3, http.requests)
+
+    def test_missing_entry(self):
+        self.assertEqual(b'', fetch(FakeKEGG(statuses=[404]), 'url', TokenBucket(float('inf'))))
+
+    def test_errors(self):
+        with self.assertRaises(FetchError):
+            fetch(FakeKEGG(statuses=[400]), 'url', TokenBucket(float('inf')))
+        with self.assertRaises(FetchError):
+            fetch(FakeKEGG(statuses=[500] * 3), 'url', TokenBucket(float('inf')), retries=2, backoff=0.01)
+
+    def test_broken_bodies_share_the_retries(self):
+        # Failed requests and broken bodies take from the same retries, one request per attempt
+        http = BrokenKEGG(statuses=[503])
+        session = Session(retries=3, backoff=0.01, http=http)
+        with self.assertRaises(FetchError):
+            session.get('url')
+        self.assertEqual(4, http.requests)
+        summary = session.stats.summary()
+        self.assertEqual(3, summary['retries'])
+        self.assertEqual(4, summary['errors'])
+
+    def test_session_counters(self):
+        session = Session(backoff=0.01, http=FakeKEGG(statuses=[503]))
+        urls = ['http://rest.kegg.jp/get/ko:K{:05d}'.format(i) for i in range(20)]
+        fetch_all(urls, concurrency=4, rate=float('inf'), session=session)
+        with session.stream(urls[0]) as response:
+            self.assertEqual(urls[0].encode(), response.read())
+        summary = session.report()
+        self.assertEqual(22, summary['requests'])
+        self.assertEqual(1, summary['retries'])
+        self.assertEqual(1, summary['errors'])
+        self.assertEqual(sum(len(url) for url in urls) + len(urls[0]), summary['bytes'])
+        self.assertLessEqual(summary['latency_p50_ms'], summary['latency_p99_ms'])
+
+    def test_session_stream_missing(self):
+        with self.assertRaises(FetchError):
+            with Session(http=FakeKEGG(statuses=[404])).stream('url'):
+                pass
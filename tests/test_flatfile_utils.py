@@ -0,0 +1,87 @@
+import io
+import os
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+from kg_converter.utils.download_utils import parse_get_entry
+from kg_converter.utils.flatfile_utils import iter_fields, flatten, parse_records
+
+KO_RECORD = '''ENTRY       K00001                      KO
+NAME        alcohol dehydrogenase [EC:1.1.1.1]
+PATHWAY     map00010  Glycolysis / Gluconeogenesis
+            map00071  Fatty acid degradation
+DBLINKS     RN: R00623 R00754
+            COG: COG1012
+REFERENCE   PMID:12345
+  AUTHORS   Smith J, Doe A
+REFERENCE   PMID:6789
+COMMENT     First line
+            NADH  second line
+///
+'''
+
+PATHWAY_RECORD = '''ENTRY       map00010                    Pathway
+NAME        Glycolysis / Gluconeogenesis
+DESCRIPTION Glycolysis is the process of converting glucose into pyruvate.
+CLASS       Metabolism; Carbohydrate metabolism
+PATHWAY_MAP map00010  Glycolysis / Gluconeogenesis
+DBLINKS     GO: 0006096 0006094
+///
+'''
+
+
+class TestFlatfileUtils(unittest.TestCase):
+
+    def test_structured_record(self):
+        record = next(parse_records(io.StringIO(KO_RECORD)))
+        self.assertEqual('K00001                      KO', record['ENTRY'])
+        self.assertEqual('alcohol dehydrogenase [EC:1.1.1.1]', record['NAME'])
+        self.assertEqual(['map00010  Glycolysis / Gluconeogenesis', 'map00071  Fatty acid degradation'],
+                         record['PATHWAY'])
+        self.assertEqual({'RN': ['R00623', 'R00754'], 'COG': ['COG1012']}, record['DBLINKS'])
+        self.assertEqual(['PMID:12345', 'PMID:6789'], record['REFERENCE'])
+        self.assertEqual('Smith J, Doe A', record['AUTHORS'])
+        # A continuation line starting with an upper case word is not a field
+        self.assertEqual(['First line', 'NADH  second line'], record['COMMENT'])
+        self.assertNotIn('NADH', record)
+
+    def test_flatten(self):
+        row = parse_get_entry(KO_RECORD)
+        self.assertEqual('K00001 KO', row['ENTRY'])
+        self.assertEqual('map00010 Glycolysis / Gluconeogenesis | map00071-Fatty acid degradation', row['PATHWAY'])
+        self.assertEqual('RN: R00623 R00754 | COG: COG1012', row['DBLINKS'])
+        self.assertEqual('PMID:12345 | PMID:6789', row['REFERENCE'])
+        self.assertEqual('First line NADH second line', row['COMMENT'])
+
+    def test_flatten_full_width_fields(self):
+        row = flatten(next(iter_fields(io.StringIO(PATHWAY_RECORD))))
+        self.assertEqual('Glycolysis / Gluconeogenesis | DESCRIPTION Glycolysis is the process of converting '
+                         'glucose into pyruvate.', row['NAME'])
+        self.assertEqual('Metabolism; Carbohydrate metabolism | PATHWAY_MAP map00010-Glycolysis / Gluconeogenesis',
+                         row['CLASS'])
+        # Structured records keep them apart
+        record = next(parse_records(io.StringIO(PATHWAY_RECORD)))
+        self.assertEqual('Metabolism; Carbohydrate metabolism', record['CLASS'])
+        self.assertEqual('map00010  Glycolysis / Gluconeogenesis', record['PATHWAY_MAP'])
+
+    @parameterized.expand([('text',), ('bytes',), ('binary',), ('path',)])
+    def test_sources(self, kind):
+        text = KO_RECORD + PATHWAY_RECORD
+        if kind == 'text':
+            source = io.StringIO(text)
+        elif kind == 'bytes':
+            source = text.encode()
+        elif kind == 'binary':
+            source = io.BytesIO(text.encode())
+        else:
+            source = os.path.join(tempfile.mkdtemp(), 'records.txt')
+            with open(source, 'w') as f:
+                f.write(text)
+        self.assertEqual(['K00001', 'map00010'], [r['ENTRY'].split()[0] for r in parse_records(source)])
+
+    def test_truncated_record(self):
+        records = list(parse_records(io.StringIO(KO_RECORD + 'ENTRY       K00002                      KO\nNAME        x\n')))
+        self.assertEqual('x', records[-1]['NAME'])
+        self.assertEqual({}, parse_get_entry(''))
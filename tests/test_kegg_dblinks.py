@@ -0,0 +1,31 @@
+import unittest
+
+import pandas as pd
+from parameterized import parameterized
+
+from kg_converter.transform_utils.kegg.dblinks import DBLinksNormalizer
+
+
+class TestDBLinksNormalizer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.normalize = DBLinksNormalizer()
+
+    @parameterized.expand([
+        ('RN: R00200 R00430 | COG: COG0469 | GO: 0004743',
+         'KEGG.REACTION:R00200|KEGG.REACTION:R00430|COG:COG0469|GO:0004743'),
+        ('TC: 3.A.1.1.1 | CAZy: GH13 | UniProt: P0ABH7 Q8X8H7',
+         'tcdb:3.A.1.1.1|cazy:GH13|uniprot:P0ABH7|uniprot:Q8X8H7'),
+        ('GO: 0006096 0006094', 'GO:0006096|GO:0006094'),
+        ('RHEA: 11628', 'RHEA:11628'),
+        ('PDB: 1ABC 2DEF', 'PDB:1ABC|PDB:2DEF'),
+    ])
+    def test_normalize(self, dblinks, expected):
+        self.assertEqual(expected, self.normalize(pd.Series([dblinks]))[0])
+
+    def test_missing_values(self):
+        self.assertTrue(self.normalize(pd.Series(['GO: 0006096', None])).isna()[1])
+
+    def test_custom_prefixes(self):
+        normalize = DBLinksNormalizer({'GO': 'obo:GO'})
+        self.assertEqual('obo:GO:0006096|RN:R00200', normalize(pd.Series(['GO: 0006096 | RN: R00200']))[0])
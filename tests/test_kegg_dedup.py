@@ -0,0 +1,130 @@
+import os
+import random
+import tempfile
+import tracemalloc
+from unittest import mock
+
+from parameterized import parameterized
+
+from kg_converter.transform_utils.kegg import KEGGTransform, dedup
+from kg_converter.transform_utils.kegg.dedup import BloomSet, ExternalSortSet, HashSet, drop_rows, file_keys
+from kg_converter.transform_utils.kegg.registry import GraphRegistry
+from kg_converter.utils.synthetic_utils import write_synthetic_kegg
+from tests.kegg_utils import KEGGTransformTestCase
+
+
+def first_occurrences(keys):
+    seen = set()
+    return [row for row, key in enumerate(keys) if key in seen or seen.add(key)]
+
+
+class TestKEGGDedup(KEGGTransformTestCase):
+
+    def setUp(self) -> None:
+        rng = random.Random(0)
+        self.keys = ['ko:K{:05d}\tpath:map{:05d}'.format(rng.randrange(50), rng.randrange(20)) for _ in range(2000)]
+
+    @parameterized.expand([
+        ('hash', {}),
+        ('external', {}),
+        ('bloom', {}),
+        ('external', {'engine': 'streaming', 'chunk_size': 100}),
+        ('bloom', {'engine': 'sqlite'}),
+        ('external', {'workers': 2}),
+        ('hash', {'compress': True}),
+        ('external', {'compress': True}),
+    ])
+    def test_matches_interned(self, backend, kwargs):
+        input_dir = tempfile.mkdtemp()
+        write_synthetic_kegg(input_dir, scale=0.005, seed=3)
+        self.assert_same_output(self.run_transform(input_dir, **kwargs),
+                                self.run_transform(input_dir, dedup=backend, **kwargs))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            KEGGTransform(input_dir='tests/resources/kegg/raw/', output_dir=tempfile.mkdtemp(), dedup='unknown')
+
+    def test_hash_set(self):
+        # Sized for far fewer keys, the table doubles several times
+        key_set = HashSet(capacity=4)
+        new = [key_set.add(key) for key in self.keys]
+        self.assertEqual(first_occurrences(self.keys), [row for row, is_new in enumerate(new) if not is_new])
+
+    def test_external_sort_runs(self):
+        # Many small runs of (hash, row) pairs and of duplicate rows
+        key_set = ExternalSortSet(tmp_dir=tempfile.mkdtemp(), run_size=64)
+        self.assertTrue(all(key_set.add(key) for key in self.keys))
+        self.assertEqual(first_occurrences(self.keys), list(key_set.duplicates(self.keys)))
+        self.assertEqual([], os.listdir(key_set.tmp_dir))
+
+    @mock.patch.object(dedup, 'BLOCK_SIZE', 100)
+    def test_bloom_verification(self):
+        # A filter far too small for the keys reports almost all of them, spilled in many candidate runs,
+        # and the verification pass keeps it exact
+        tmp_dir = tempfile.mkdtemp()
+        key_set = BloomSet(capacity=10, tmp_dir=tmp_dir, run_size=64)
+        size = len(key_set.bits)
+        self.assertTrue(all(key_set.add(key) for key in self.keys))
+        self.assertEqual(size, len(key_set.bits))
+        self.assertGreater(len(key_set.candidates.files), 1)
+        self.assertEqual(first_occurrences(self.keys), list(key_set.duplicates(self.keys)))
+        self.assertEqual([], os.listdir(tmp_dir))
+
+    def test_bloom_capacity(self):
+        t = KEGGTransform(input_dir='tests/resources/kegg/raw/', output_dir=tempfile.mkdtemp(), dedup='bloom')
+        link_rows = dedup.count_rows(t.input_tables()[2])
+        registry = t.new_registry(t.input_tables()[2])
+        self.assertEqual(BloomSet(link_rows).size, registry.key_sets['edges'].size)
+        self.assertEqual(BloomSet(2 * link_rows).size, registry.key_sets['nodes'].size)
+
+    @staticmethod
+    def peak_memory(key_set, count: int) -> int:
+        # Keys generated on the fly, as read from the output file
+        keys = lambda: ('hsa:{}\tpath:hsa{:05d}'.format(i % (count // 2), i % 400) for i in range(count))
+        tracemalloc.start()
+        try:
+            for key in keys():
+                key_set.add(key)
+            for _ in key_set.duplicates(keys()):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    @parameterized.expand([
+        ('external', lambda: ExternalSortSet(tempfile.mkdtemp(), run_size=1000, merge_size=500)),
+        ('bloom', lambda: BloomSet(500, tmp_dir=tempfile.mkdtemp(), run_size=1000, merge_size=500)),
+    ])
+    @mock.patch.object(dedup, 'BLOCK_SIZE', 500)
+    def test_memory_is_flat(self, _, make_key_set):
+        # Four times the rows, many more runs, about the same peak
+        small, large = self.peak_memory(make_key_set(), 10000), self.peak_memory(make_key_set(), 40000)
+        self.assertLess(large, 1.5 * small)
+
+    def test_hash_memory(self):
+        # Nodes and edges kept by each backend, their CURIEs generated on the fly as read from the link files
+        def registry_memory(backend: str) -> int:
+            tracemalloc.start()
+            try:
+                registry = GraphRegistry(backend)
+                for i in range(20000):
+                    subject, object = 'hsa:{}'.format(100000 + i), 'ko:K{:05d}'.format(i)
+                    registry.add_node(subject)
+                    registry.add_node(object)
+                    registry.add_edge(subject, object)
+                return tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+
+        self.assertLess(registry_memory('hash'), registry_memory('interned') / 3)
+
+    def test_drop_rows(self):
+        file = os.path.join(tempfile.mkdtemp(), 'edges.tsv')
+        with open(file, 'w') as f:
+            f.write('subject\tpredicate\tobject\trelation\n' + ''.join('{}\tp\t{}\tr\n'.format(*key.split('\t'))
+                                                                          for key in self.keys))
+        key = lambda line: '\t'.join(line.split('\t')[0:3:2])
+        self.assertEqual(self.keys, list(file_keys(file, key)))
+        dropped = first_occurrences(self.keys)
+        self.assertEqual(dropped, list(drop_rows(file, iter(dropped))))
+        self.assertEqual(sorted(set(self.keys), key=self.keys.index), list(file_keys(file, key)))
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+from parameterized import parameterized
+
+from kg_converter.transform_utils.kegg import KEGGTransform, loader
+from kg_converter.utils.synthetic_utils import write_synthetic_kegg
+
+
+class TestKEGGLoader(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.t = KEGGTransform(input_dir='tests/resources/kegg/raw/', output_dir=tempfile.mkdtemp())
+
+    def assert_same_descriptions(self, table: str, usecols, type: str) -> None:
+        expected = self.t.prune_columns(pd.read_csv(table, low_memory=False, sep='\t', usecols=usecols), type)
+        actual = self.t.normalise_dblinks(loader.read_descriptions(table, type))
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True).astype(object), actual.astype(object))
+
+    @parameterized.expand(['pathway', 'rn', 'ko'])
+    @unittest.skipUnless(loader.available(), 'needs pyarrow')
+    def test_matches_prune_columns(self, db):
+        self.assert_same_descriptions(*self.t.input_tables()[1][db])
+
+    @parameterized.expand(['pathway', 'rn', 'ko'])
+    @unittest.skipUnless(loader.available(), 'needs pyarrow')
+    def test_streamed_blocks(self, db):
+        # Many blocks, each holding a few rows of the table
+        input_dir = tempfile.mkdtemp()
+        write_synthetic_kegg(input_dir, scale=0.005, seed=4)
+        table, usecols, type = KEGGTransform(input_dir=input_dir, output_dir=tempfile.mkdtemp()).input_tables()[1][db]
+        with mock.patch.object(loader, 'STREAM_BLOCK_SIZE', 4096):
+            self.assert_same_descriptions(table, usecols, type)
+
+    @unittest.skipUnless(loader.available(), 'needs pyarrow')
+    def test_row_longer_than_block(self):
+        # A KO with a few hundred KB of DBLINKS, read in blocks too small for it
+        table = os.path.join(tempfile.mkdtemp(), 'kegg-ko.tsv')
+        with open(table, 'w') as f:
+            f.write('ENTRY\tNAME\tDEFINITION\tPATHWAY\tDBLINKS\n'
+                    'K00001 KO\tx\tA\tmap00010\tRN: R00001\n'
+                    'K00002 KO\tx\tB\tmap00010\tGO: ' + ' '.join(['0000001'] * 50000) + '\n'
+                    'K00003 KO\tx\tC\tmap00010\tRN: R00003\n')
+        with mock.patch.object(loader, 'STREAM_BLOCK_SIZE', 4096):
+            self.assert_same_descriptions(table, ['ENTRY', 'DEFINITION', 'DBLINKS'], 'ko')
+        self.assertEqual(['K00001', 'K00002', 'K00003'], loader.read_descriptions(table, 'ko')['ID'].tolist())
+
+    @unittest.skipUnless(loader.available(), 'needs pyarrow')
+    def test_missing_values(self):
+        # Rows missing ENTRY, a description column or DBLINKS are dropped, 'NA' being missing as for pandas
+        table = os.path.join(tempfile.mkdtemp(), 'kegg-reactions.tsv')
+        with open(table, 'w') as f:
+            f.write('ENTRY\tNAME\tDEFINITION\tEQUATION\tENZYME\tDBLINKS\n'
+                    'R00001 Reaction\tx\tA <=> B\tC00001 <=> C00002\t1.1.1.1\tRHEA: 1\n'
+                    'R00002 Reaction\tx\tNA\tC00001 <=> C00002\t\tRHEA: 2\n'
+                    'R00003 Reaction\tx\tA <=> B\t\t\tRHEA: 3\n'
+                    'R00004 Reaction\tx\tA <=> B\tC00001 <=> C00002\t\t\n'
+                    '\tx\tA <=> B\tC00001 <=> C00002\t\tRHEA: 5\n')
+        self.assert_same_descriptions(table, ['ENTRY', 'DEFINITION', 'EQUATION', 'DBLINKS'], 'rn')
+        self.assertEqual(['R00001'], loader.read_descriptions(table, 'rn')['ID'].tolist())
+
+    @unittest.skipUnless(loader.available(), 'needs pyarrow')
+    def test_schema(self):
+        df = loader.read_table(self.t.full_path, 'path')
+        self.assertEqual(['ENTRY', 'NAME', 'CLASS', 'PATHWAY_MAP', 'DBLINKS', 'ID', 'ENTRY_TYPE', 'DESCRIPTION'],
+                         list(df.columns))
+        self.assertEqual(pd.StringDtype('pyarrow'), df['NAME'].dtype)
+        self.assertEqual('category', df['CLASS'].dtype.name)
+        self.assertEqual(['Pathway'], list(df['ENTRY_TYPE'].cat.categories))
+        self.assertEqual('map00010', df['ID'][0])
+        compounds = loader.read_table('tests/resources/kegg/raw/kegg-compounds.tsv', 'cpd', ['ENTRY', 'EXACT_MASS'])
+        self.assertEqual('float64', compounds['EXACT_MASS'].dtype.name)
+        self.assertNotIn('DESCRIPTION', compounds.columns)
+        with self.assertRaises(ValueError):
+            loader.read_table(self.t.full_path, 'unknown')
+
+    def test_fallback_without_pyarrow(self):
+        self.t.run()
+        t = KEGGTransform(input_dir='tests/resources/kegg/raw/', output_dir=tempfile.mkdtemp())
+        with mock.patch.object(loader, 'available', return_value=False):
+            t.run()
+        for fn in ['nodes.tsv', 'edges.tsv']:
+            with open(os.path.join(self.t.output_dir, fn)) as f, open(os.path.join(t.output_dir, fn)) as g:
+                self.assertEqual(f.read(), g.read())
@@ -0,0 +1,56 @@
+import os
+import unittest
+
+import pandas as pd
+from parameterized import parameterized
+
+from kg_converter.transform_utils.kegg.lookup import KEGGLookup
+
+
+class TestKEGGLookup(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.raw_dir = 'tests/resources/kegg/raw/'
+        list_dict = {
+            'cpd': os.path.join(self.raw_dir, 'compounds.tsv'),
+            'pathway': os.path.join(self.raw_dir, 'pathways.tsv'),
+            'ko': os.path.join(self.raw_dir, 'ko.tsv'),
+        }
+        desc_dict = {
+            'pathway': pd.DataFrame({'ID': ['map00010'],
+                                     'DESCRIPTION': ['Glycolysis'],
+                                     'DBLINKS': ['GO: 0006096']}),
+        }
+        self.lookup = KEGGLookup(list_dict, desc_dict)
+
+    @parameterized.expand([
+        ('pathwayId', 'path:map00010', 'path:map00010'),
+        ('pathwayId', 'path:rn00010', 'path:map00010'),
+        ('pathwayId', 'path:ko00010', 'path:map00010'),
+        ('koId', 'ko:K00873', 'ko:K00873'),
+    ])
+    def test_list_id(self, key, kegg_id, expected):
+        self.assertEqual(expected, KEGGLookup.list_id(key, kegg_id))
+
+    def test_get_names(self):
+        entry = self.lookup.get('cpdId', 'cpd:C00074')
+        self.assertEqual('Phosphoenolpyruvate', entry.name)
+        self.assertEqual('Phosphoenolpyruvic acid |  PEP', entry.synonyms)
+        self.assertEqual('', entry.description)
+        self.assertIsNone(entry.xrefs)
+
+    def test_get_description(self):
+        entry = self.lookup.get('pathwayId', 'path:map00010')
+        self.assertEqual('Glycolysis / Gluconeogenesis', entry.name)
+        self.assertEqual('Glycolysis', entry.description)
+        self.assertEqual('GO: 0006096', entry.xrefs)
+
+    def test_normalised_pathway_has_no_description(self):
+        entry = self.lookup.get('pathwayId', 'path:rn00010')
+        self.assertEqual('Glycolysis / Gluconeogenesis', entry.name)
+        self.assertEqual('', entry.description)
+        self.assertIsNone(entry.xrefs)
+
+    def test_unknown_id(self):
+        with self.assertRaises(KeyError):
+            self.lookup.get('koId', 'ko:K99999')
@@ -0,0 +1,27 @@
+import unittest
+
+from kg_converter.transform_utils.kegg.registry import GraphRegistry
+
+
+class TestGraphRegistry(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.registry = GraphRegistry()
+
+    def test_add_node(self):
+        self.assertTrue(self.registry.add_node('KEGG.COMPOUND:C00022', 'a.tsv'))
+        self.assertFalse(self.registry.add_node('KEGG.COMPOUND:C00022', 'b.tsv'))
+        self.assertEqual(0, self.registry.intern('KEGG.COMPOUND:C00022'))
+        self.assertEqual({'b.tsv': {'nodes': 1, 'edges': 0}}, self.registry.report())
+
+    def test_add_edge_is_directed(self):
+        self.assertTrue(self.registry.add_edge('KEGG.PATHWAY:map00010', 'KEGG.COMPOUND:C00022', 'a.tsv'))
+        self.assertTrue(self.registry.add_edge('KEGG.COMPOUND:C00022', 'KEGG.PATHWAY:map00010', 'a.tsv'))
+        self.assertFalse(self.registry.add_edge('KEGG.PATHWAY:map00010', 'KEGG.COMPOUND:C00022', 'a.tsv'))
+        self.assertEqual(2, len(self.registry.edge_keys))
+        self.assertEqual({'a.tsv': {'nodes': 0, 'edges': 1}}, self.registry.report())
+
+    def test_record_duplicates(self):
+        self.registry.record_duplicates('a.tsv', nodes=3, edges=2)
+        self.registry.record_duplicates('a.tsv', nodes=1)
+        self.assertEqual({'a.tsv': {'nodes': 4, 'edges': 2}}, self.registry.report())
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from kg_converter.transform_utils.kegg import KEGGTransform, store
+from kg_converter.utils.synthetic_utils import write_synthetic_kegg
+from tests.kegg_utils import KEGGTransformTestCase
+
+
+class TestKEGGStore(KEGGTransformTestCase):
+
+    def setUp(self) -> None:
+        # The store is built next to the inputs
+        self.input_dir = tempfile.mkdtemp()
+        for fn in os.listdir('tests/resources/kegg/raw/'):
+            shutil.copy(os.path.join('tests/resources/kegg/raw/', fn), self.input_dir)
+
+    def test_sqlite_matches_row(self):
+        self.assert_same_output(self.run_transform(self.input_dir),
+                                self.run_transform(self.input_dir, engine='sqlite', chunk_size=3))
+
+    def test_sqlite_matches_row_on_synthetic_data(self):
+        input_dir = tempfile.mkdtemp()
+        write_synthetic_kegg(input_dir, scale=0.005, seed=2)
+        self.assert_same_output(self.run_transform(input_dir, engine='vectorized'),
+                                self.run_transform(input_dir, engine='sqlite'))
+
+    def test_rebuilt_only_when_inputs_change(self):
+        with mock.patch.object(store, 'build_store', wraps=store.build_store) as build_store:
+            self.run_transform(self.input_dir, engine='sqlite')
+            self.run_transform(self.input_dir, engine='sqlite')
+            self.assertEqual(1, build_store.call_count)
+            with open(os.path.join(self.input_dir, 'reactionKoLink.tsv'), 'a') as f:
+                f.write('rn:R00014\tko:K00873\n')
+            t = self.run_transform(self.input_dir, engine='sqlite')
+            self.assertEqual(2, build_store.call_count)
+        self.assert_same_output(self.run_transform(self.input_dir), t)
+        self.assertFalse(os.path.exists(os.path.join(self.input_dir, store.STORE_FILE + '.tmp')))
+
+    def test_query(self):
+        t = KEGGTransform(input_dir=self.input_dir, output_dir=tempfile.mkdtemp())
+        with t.load_store(*t.input_tables()) as kegg_store:
+            compounds = kegg_store.query('SELECT l.pathwayId, c.name FROM pathwayCompoundLink l '
+                                         'JOIN compounds c ON c.id = l.cpdId WHERE l.pathwayId = ? '
+                                         'ORDER BY l.line', ('path:map00010',))
+            self.assertEqual(['Pyruvate', 'Phosphoenolpyruvate'], compounds['name'].str.split(';').str[0].tolist())
+            entry = kegg_store.query('SELECT * FROM kegg_pathways WHERE id = ?', ('map00010',))
+            self.assertEqual(1, len(entry))
+            self.assertIn('GO:0006096', kegg_store.query('SELECT dblinks FROM desc_pathway').iloc[0, 0])
+            compound = kegg_store.query('SELECT id, FORMULA FROM kegg_compounds WHERE id = ?', ('C00022',))
+            self.assertEqual([['C00022', 'C3H4O3']], compound.values.tolist())
+            indexes = kegg_store.query("SELECT name FROM sqlite_master WHERE type = 'index'")['name'].tolist()
+            self.assertIn('kegg_compounds_id', indexes)
+            self.assertIn('kegg-compounds.tsv', store.read_store_manifest(kegg_store.path)['inputs'])
+            plan = ' '.join(kegg_store.query('EXPLAIN QUERY PLAN SELECT * FROM reactionKoLink WHERE koId = ?',
+                                             ('ko:K00873',))['detail'])
+            self.assertIn('INDEX', plan)
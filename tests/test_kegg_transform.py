@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+from parameterized import parameterized
+
+from kg_converter.transform_utils.kegg import KEGGTransform
+from kg_converter.transform_utils.kegg.streaming import ChunkBudget, MIN_CHUNK_SIZE
+from kg_converter.utils import columnar_utils
+from kg_converter.utils.columnar_utils import read_graph_table
+from tests.kegg_utils import KEGGTransformTestCase
+
+
+class TestKEGGTransform(KEGGTransformTestCase):
+
+    def read_output(self, kegg_output_dir: str, fn: str) -> pd.DataFrame:
+        return pd.read_csv(os.path.join(kegg_output_dir, fn), sep='\t', dtype=str,
+                           keep_default_na=False)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            KEGGTransform(input_dir=self.input_dir, output_dir=tempfile.mkdtemp(), engine='spark')
+        with self.assertRaises(ValueError):
+            KEGGTransform(input_dir=self.input_dir, output_dir=tempfile.mkdtemp(), output_format='csv')
+
+    def test_vectorized_matches_row(self):
+        self.assert_same_output(self.run_transform(engine='row'), self.run_transform(engine='vectorized'))
+
+    def test_streaming_matches_row(self):
+        self.assert_same_output(self.run_transform(engine='row'), self.run_transform(engine='streaming', chunk_size=3))
+
+    @parameterized.expand([('parquet', False), ('arrow', True)])
+    @unittest.skipUnless(columnar_utils.pa is not None, 'needs pyarrow')
+    def test_columnar_output(self, output_format, compress):
+        kegg_dir = self.run_transform(engine='vectorized', output_format=output_format, compress=compress).output_dir
+        suffix = '.tsv.gz' if compress else '.tsv'
+        nodes = read_graph_table(os.path.join(kegg_dir, 'nodes.' + output_format))
+        edges = read_graph_table(os.path.join(kegg_dir, 'edges.' + output_format))
+        self.assertTrue(columnar_utils.pa.types.is_dictionary(nodes.schema.field('category').type))
+        self.assertTrue(columnar_utils.pa.types.is_dictionary(edges.schema.field('predicate').type))
+        self.assertTrue(columnar_utils.pa.types.is_list(nodes.schema.field('exact_match').type))
+
+        tsv_nodes = self.read_output(kegg_dir, 'nodes' + suffix)
+        tsv_edges = self.read_output(kegg_dir, 'edges' + suffix)
+        self.assertEqual(tsv_edges.values.tolist(), edges.to_pandas().astype(str).values.tolist())
+        columnar_nodes = nodes.to_pandas()
+        self.assertEqual(tsv_nodes['id'].tolist(), columnar_nodes['id'].tolist())
+        self.assertEqual(tsv_nodes['category'].tolist(), columnar_nodes['category'].astype(str).tolist())
+        compound = columnar_nodes[columnar_nodes['id'] == 'KEGG.COMPOUND:C00022'].iloc[0]
+        self.assertEqual(['Pyruvic acid', '2-Oxopropanoate', '2-Oxopropanoic acid', 'Pyroracemic acid'],
+                         list(compound['exact_match']))
+        self.assertEqual([], list(compound['close_match']))
+
+    @mock.patch('kg_converter.transform_utils.kegg.streaming.current_rss', return_value=2 ** 30)
+    def test_chunk_budget(self, mock_rss):
+        budget = ChunkBudget(chunk_size=4000, memory_budget=512)
+        budget.check()
+        self.assertEqual(2000, budget.chunk_size)
+        budget.check()
+        budget.check()
+        self.assertEqual(MIN_CHUNK_SIZE, budget.chunk_size)
+        self.assertTrue(budget.over_budget)
+
+    def test_workers_match_serial(self):
+        serial = self.run_transform()
+        for engine in ['row', 'vectorized']:
+            t = KEGGTransform(input_dir=self.input_dir, output_dir=tempfile.mkdtemp(), engine=engine, workers=3)
+            t.min_chunk_bytes = 1
+            t.run()
+            self.assert_same_output(serial, t)
+            self.assertFalse(os.path.exists(os.path.join(t.output_dir, 'shards')))
+
+    def test_nodes_and_edges_are_not_repeated(self):
+        kegg_output_dir = self.run_transform().output_dir
+        nodes = self.read_output(kegg_output_dir, 'nodes.tsv')
+        edges = self.read_output(kegg_output_dir, 'edges.tsv')
+        self.assertEqual(23, len(nodes))
+        self.assertEqual(34, len(edges))
+        self.assertFalse(nodes['id'].duplicated().any())
+        self.assertFalse(edges.duplicated(subset=['subject', 'object']).any())
+
+    def test_duplicate_report(self):
+        reports = []
+        for engine in ['row', 'vectorized']:
+            t = KEGGTransform(input_dir=self.input_dir, output_dir=tempfile.mkdtemp(), engine=engine)
+            t.run()
+            reports.append(t.registry.report())
+        self.assertEqual(reports[0], reports[1])
+        self.assertEqual({'nodes': 13, 'edges': 0}, reports[0]['pathwayReactionLink.tsv'])
+
+    def test_nodes_without_dblinks_have_no_xrefs(self):
+        nodes = self.read_output(self.run_transform(engine='vectorized').output_dir, 'nodes.tsv')
+        compound = nodes[nodes['id'] == 'KEGG.COMPOUND:C00022'].iloc[0]
+        self.assertEqual('', compound['close_match'])
+        pathway = nodes[nodes['id'] == 'KEGG.PATHWAY:ko00010'].iloc[0]
+        self.assertEqual('Glycolysis / Gluconeogenesis', pathway['name'])
+        self.assertEqual('', pathway['close_match'])
+
+    def test_incremental(self):
+        input_dir = tempfile.mkdtemp()
+        for fn in os.listdir(self.input_dir):
+            shutil.copy(os.path.join(self.input_dir, fn), input_dir)
+        output_dir = tempfile.mkdtemp()
+
+        def run_incremental() -> KEGGTransform:
+            t = KEGGTransform(input_dir=input_dir, output_dir=output_dir, incremental=True)
+            with mock.patch.object(t, 'load_lookup', wraps=t.load_lookup) as load_lookup:
+                t.run()
+            t.lookup_loaded = load_lookup.called
+            return t
+
+        def assert_matches_full_run() -> None:
+            t = KEGGTransform(input_dir=input_dir, output_dir=tempfile.mkdtemp())
+            t.run()
+            full_dir = t.output_dir
+            for fn in ['nodes.tsv', 'edges.tsv']:
+                with open(os.path.join(full_dir, fn)) as full, open(os.path.join(output_dir, 'kegg', fn)) as inc:
+                    self.assertEqual(full.read(), inc.read())
+            self.assertEqual(t.registry.report(), incremental.registry.report())
+
+        incremental = run_incremental()
+        self.assertTrue(incremental.lookup_loaded)
+        assert_matches_full_run()
+
+        # Nothing changed: the outputs are kept as they are
+        self.assertFalse(run_incremental().lookup_loaded)
+
+        with open(os.path.join(input_dir, 'reactionKoLink.tsv'), 'a') as f:
+            f.write('rn:R00014\tko:K00873\n')
+        parts = os.path.join(output_dir, 'kegg', 'parts')
+        mtimes = {fn: os.stat(os.path.join(parts, fn)).st_mtime_ns for fn in os.listdir(parts)}
+        incremental = run_incremental()
+        self.assertTrue(incremental.lookup_loaded)
+        assert_matches_full_run()
+        changed = [fn for fn in mtimes if os.stat(os.path.join(parts, fn)).st_mtime_ns != mtimes[fn]]
+        self.assertEqual(['reactionKoLink.tsv.edges.tsv', 'reactionKoLink.tsv.nodes.tsv'], sorted(changed))
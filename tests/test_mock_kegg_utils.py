@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import unittest
+
+import urllib3
+
+from kg_converter.benchmark import benchmark_download
+from kg_converter.utils import download_utils
+from kg_converter.utils.fetch_utils import FetchError, Session, TokenBucket
+from kg_converter.utils.mock_kegg_utils import LocalKEGG, MockKEGGServer
+from kg_converter.utils.synthetic_utils import LIST_FILES, write_synthetic_kegg
+
+
+class TestMockKEGGServer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.scale = 0.005
+        self.raw_dir = tempfile.mkdtemp()
+        write_synthetic_kegg(self.raw_dir, scale=self.scale, seed=1)
+        self.corpus = LocalKEGG(self.raw_dir, self.scale, seed=1)
+
+    def test_operations(self):
+        with MockKEGGServer(self.corpus) as server:
+            output_file = os.path.join(tempfile.mkdtemp(), 'ko.tsv')
+            download_utils.stream_response(server.url + 'list/ko', output_file)
+            with open(os.path.join(self.raw_dir, LIST_FILES['ko'][0])) as a, open(output_file) as b:
+                self.assertEqual(a.read(), b.read())
+
+            http = urllib3.PoolManager()
+            body = http.request('GET', server.url + 'get/ko:K00001+ko:K99999+ko:K00002').data.decode()
+            self.assertEqual(['K00001', 'K00002'], list(download_utils.split_get_entries(body)))
+            self.assertEqual(404, http.request('GET', server.url + 'get/ko:K99999').status)
+            self.assertEqual(404, http.request('GET', server.url + 'list/nothing').status)
+
+    def test_rate_limit(self):
+        with MockKEGGServer(self.corpus, rate_limit=2) as server:
+            session = Session(retries=0)
+            session.get(server.url + 'list/pathway')
+            session.get(server.url + 'list/pathway')
+            with self.assertRaises(FetchError):
+                session.get(server.url + 'list/pathway')
+            self.assertEqual(1, server.stats['forbidden'])
+            # Within the limit, requests go through
+            self.assertTrue(Session(retries=3, backoff=0.5).get(server.url + 'list/pathway', TokenBucket(2)))
+
+    def test_truncated_bodies_are_retried(self):
+        with MockKEGGServer(self.corpus, truncate=0.5, seed=3) as server:
+            session = Session(backoff=0.01, retries=10)
+            expected = self.corpus.body('get/ko:K00001+ko:K00002').encode()
+            for _ in range(5):
+                self.assertEqual(expected, session.get(server.url + 'get/ko:K00001+ko:K00002'))
+            output_file = os.path.join(tempfile.mkdtemp(), 'ko.tsv')
+            for _ in range(5):
+                download_utils.stream_response(server.url + 'list/ko', output_file, session)
+            self.assertGreater(server.stats['truncated'], 0)
+            self.assertEqual(server.stats['truncated'], session.stats.summary()['errors'])
+
+    def test_stream_response_retries_once_per_attempt(self):
+        with MockKEGGServer(self.corpus, truncate=1.0) as server:
+            output_file = os.path.join(tempfile.mkdtemp(), 'ko.tsv')
+            with self.assertRaises(FetchError):
+                download_utils.stream_response(server.url + 'list/ko', output_file, Session(backoff=0.01, retries=3))
+            self.assertEqual(4, server.stats['requests'])
+            self.assertEqual([], os.listdir(os.path.dirname(output_file)))
+
+    def test_benchmark_download(self):
+        output = os.path.join(tempfile.mkdtemp(), 'benchmark_download.json')
+        benchmark_download(output, scale=self.scale, repeat=1, jobs=4)
+        with open(output) as f:
+            report = json.load(f)['benchmarks']['download']
+        self.assertTrue(report['verified'])
+        self.assertGreater(report['runs'][0]['requests'], 0)
+        self.assertIsNone(report['rate_limit'])
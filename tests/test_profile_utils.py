@@ -0,0 +1,59 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from kg_converter.utils import profile_utils
+from run import transform
+
+
+class TestProfileUtils(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.mkdtemp()
+        self.report_file = os.path.join(self.tmp_dir, 'profile.json')
+
+    def read_report(self) -> dict:
+        with open(self.report_file) as f:
+            return json.load(f)
+
+    def test_stage_without_profiling(self):
+        with profile_utils.stage('load tables') as stage:
+            stage.rows_in += 3
+        self.assertIsNone(profile_utils._active)
+
+    def test_stages_accumulate(self):
+        with profile_utils.profiling(self.report_file):
+            for _ in range(2):
+                with profile_utils.stage('post_data a.tsv') as stage:
+                    stage.rows_in += 10
+                    with profile_utils.stage('write nodes.tsv') as write:
+                        write.rows_out += 4
+        stages = {s['name']: s for s in self.read_report()['stages']}
+        self.assertEqual(2, stages['post_data a.tsv']['calls'])
+        self.assertEqual(20, stages['post_data a.tsv']['rows_in'])
+        self.assertEqual(8, stages['write nodes.tsv']['rows_out'])
+        self.assertGreaterEqual(stages['post_data a.tsv']['seconds'], stages['write nodes.tsv']['seconds'])
+
+    def test_pstats_of_hot_stage(self):
+        pstats_file = os.path.join(self.tmp_dir, 'hot.pstats')
+        with profile_utils.profiling(self.report_file, pstats_file):
+            with profile_utils.stage('fast'):
+                pass
+            with profile_utils.stage('slow'):
+                sum(range(200000))
+        report = self.read_report()
+        self.assertEqual('slow', report['hot_stage'])
+        self.assertEqual(pstats_file, report['pstats'])
+        self.assertGreater(pstats.Stats(pstats_file).total_calls, 0)
+
+    def test_transform_profile(self):
+        result = CliRunner().invoke(transform, ['-i', 'tests/resources/kegg/raw/', '-o', self.tmp_dir,
+                                                '--profile', self.report_file])
+        self.assertEqual(0, result.exit_code, result.output)
+        names = [s['name'] for s in self.read_report()['stages']]
+        for name in ['load tables', 'normalise DBLINKS', 'post_data pathwayCompoundLink.tsv', 'write nodes.tsv']:
+            self.assertIn(name, names)
@@ -1,8 +1,11 @@
-from unittest import TestCase, skip
+import os
+import tempfile
+from unittest import TestCase, skip, skipUnless
 from click.testing import CliRunner
 from unittest import mock
 
-from run import download, transform, merge, holdouts, query
+from run import download, transform, merge, holdouts, query, columnar
+from kg_converter.utils import columnar_utils
 
 
 class TestRun(TestCase):
@@ -33,3 +36,19 @@ class TestRun(TestCase):
             self.assertRegexpMatches(result.output, "does not exist")
 
 
+
+    @skipUnless(columnar_utils.pa is not None, 'needs pyarrow')
+    def test_columnar(self):
+        # Merged graphs have their own columns, read from the files
+        tmp_dir = tempfile.mkdtemp()
+        nodes, edges = os.path.join(tmp_dir, 'merged-kg_nodes.tsv'), os.path.join(tmp_dir, 'merged-kg_edges.tsv')
+        with open(nodes, 'w') as f:
+            f.write('id\tcategory\tname\tprovided_by\nA:1\tbiolink:Gene\ta\tKEGG\nA:2\tbiolink:Gene\tb\tKEGG\n')
+        with open(edges, 'w') as f:
+            f.write('id\tsubject\tpredicate\tobject\nE:1\tA:1\tbiolink:related_to\tA:2\n')
+        result = self.runner.invoke(cli=columnar, args=['-n', nodes, '-e', edges, '-f', 'arrow'])
+        self.assertEqual(0, result.exit_code, result.output)
+        table = columnar_utils.read_graph_table(os.path.join(tmp_dir, 'merged-kg_nodes.arrow'))
+        self.assertEqual(['id', 'category', 'name', 'provided_by'], table.column_names)
+        self.assertEqual(['KEGG', 'KEGG'], table.column('provided_by').to_pylist())
+        self.assertTrue(os.path.exists(os.path.join(tmp_dir, 'merged-kg_edges.arrow')))
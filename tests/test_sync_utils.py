@@ -0,0 +1,78 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from kg_converter.utils import download_utils
+from kg_converter.utils.mock_kegg_utils import KEGG_REST_URL, LocalKEGG
+from kg_converter.utils.sync_utils import RELEASE_FILE, read_table, table_ids
+from kg_converter.utils.synthetic_utils import write_synthetic_kegg
+
+
+class CountingKEGG(LocalKEGG):
+    """LocalKEGG recording the requested URLs"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.urls = []
+
+    def request(self, method: str, url: str, **kwargs):
+        self.urls.append(url[len(KEGG_REST_URL):])
+        return super().request(method, url, **kwargs)
+
+
+def record(core_id: str, name: str) -> str:
+    return ('ENTRY       {}                      KO\nNAME        {}\nDEFINITION  {} enzyme\n'
+            'DBLINKS     GO: 0000001\n///\n').format(core_id, name, name)
+
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.scale = 0.005
+        self.raw_dir = tempfile.mkdtemp()
+        write_synthetic_kegg(self.raw_dir, scale=self.scale, seed=1)
+        self.kegg = CountingKEGG(self.raw_dir, self.scale, seed=1)
+        self.output_dir = tempfile.mkdtemp()
+
+    def download(self) -> None:
+        self.kegg.urls = []
+        with mock.patch.object(download_utils.urllib3, 'PoolManager', return_value=self.kegg):
+            download_utils.download_from_yaml('download.yaml', self.output_dir, rate=float('inf'), sync=True)
+
+    def test_sync(self):
+        self.download()
+        with open(os.path.join(self.output_dir, RELEASE_FILE)) as f:
+            self.assertEqual(['cpd', 'ko', 'pathway', 'rn'], sorted(json.load(f)))
+        before = read_table(os.path.join(self.output_dir, 'kegg-ko.tsv'))
+
+        # Same release: only 'info' requests
+        self.download()
+        self.assertTrue(all(url.startswith('info/') for url in self.kegg.urls), self.kegg.urls)
+
+        # New KO release: one entry removed, one renamed, one added
+        list_file = os.path.join(self.raw_dir, 'ko.tsv')
+        with open(list_file) as f:
+            rows = list(csv.reader(f, delimiter='\t'))
+        removed, renamed = rows[2][0], rows[3][0]
+        rows = rows[:2] + [[renamed, 'renamed; renamed enzyme']] + rows[4:] + [['ko:K99990', 'new; new enzyme']]
+        with open(list_file, 'w') as f:
+            csv.writer(f, delimiter='\t', lineterminator='\n').writerows(rows)
+        self.kegg.records = {renamed: record(renamed.split(':')[1], 'renamed'), 'ko:K99990': record('K99990', 'new')}
+        self.kegg.releases['ko'] = 'Release 2.0+/02-01, Feb 00'
+        self.download()
+
+        gets = [url for url in self.kegg.urls if url.startswith('get/')]
+        self.assertEqual(['get/{}+ko:K99990'.format(renamed)], gets)
+        self.assertFalse(any(url.startswith('list/') and not url.endswith('ko') for url in self.kegg.urls))
+        after = read_table(os.path.join(self.output_dir, 'kegg-ko.tsv'))
+        self.assertEqual([row[0].split(':')[1] for row in rows[1:]], list(table_ids(after)))
+        self.assertEqual('renamed', after.loc[table_ids(after) == renamed.split(':')[1], 'NAME'].iloc[0])
+        unchanged = ~table_ids(before).isin([removed.split(':')[1], renamed.split(':')[1]])
+        self.assertEqual(before[unchanged].values.tolist(), after[after['ENTRY'].isin(before['ENTRY'][unchanged])]
+                         [before.columns].values.tolist())
+        self.assertFalse(any(fn.endswith('.prev') or fn.endswith('.jsonl') for fn in os.listdir(self.output_dir)))
+        with open(os.path.join(self.output_dir, RELEASE_FILE)) as f:
+            self.assertEqual('Release 2.0+/02-01, Feb 00', json.load(f)['ko'])
@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+from parameterized import parameterized
+
+from kg_converter.benchmark import KEGG_REST_URL, LocalKEGG, benchmark
+from kg_converter.transform_utils.kegg import KEGGTransform
+from kg_converter.utils import download_utils
+from kg_converter.utils.synthetic_utils import GET_TABLES, write_synthetic_kegg
+
+
+class TestSyntheticKEGG(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.scale = 0.005
+        self.raw_dir = tempfile.mkdtemp()
+        self.rows = write_synthetic_kegg(self.raw_dir, scale=self.scale, seed=1)
+
+    def test_same_seed_same_files(self):
+        other_dir = tempfile.mkdtemp()
+        write_synthetic_kegg(other_dir, scale=self.scale, seed=1)
+        for fn in self.rows:
+            with open(os.path.join(self.raw_dir, fn)) as a, open(os.path.join(other_dir, fn)) as b:
+                self.assertEqual(a.read(), b.read())
+
+    @parameterized.expand([('pathways', 'pathway'), ('reactions', 'rn'), ('compounds', 'cpd'), ('ko', 'ko')])
+    def test_get_tables_match_parse_response_get(self, fn, db):
+        local_kegg = LocalKEGG(self.raw_dir, self.scale, seed=1)
+        with mock.patch.object(download_utils.urllib3, 'PoolManager', return_value=local_kegg):
+            parsed = download_utils.parse_response_get(KEGG_REST_URL + 'get/', self.raw_dir, fn,
+                                                       concurrency=4, rate=float('inf'))
+        written = pd.read_csv(os.path.join(self.raw_dir, GET_TABLES[db][0]), sep='\t', dtype=str)
+        pd.testing.assert_frame_equal(written, parsed.astype(str))
+
+    def test_transform_runs(self):
+        output_dir = tempfile.mkdtemp()
+        KEGGTransform(input_dir=self.raw_dir, output_dir=output_dir).run()
+        nodes = pd.read_csv(os.path.join(output_dir, 'kegg', 'nodes.tsv'), sep='\t')
+        self.assertGreater(len(nodes), 0)
+        self.assertFalse(nodes['id'].duplicated().any())
+
+    def test_benchmark_json(self):
+        output = os.path.join(tempfile.mkdtemp(), 'benchmark.json')
+        benchmark(output, scale=self.scale, repeat=1)
+        with open(output) as f:
+            report = json.load(f)
+        self.assertIn('KEGGTransform.run[row]', report['benchmarks'])
+        self.assertIn('parse_response_get', report['benchmarks'])
+        self.assertEqual(1, len(report['benchmarks']['parse_response']['seconds']))
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import yaml
+
+from kg_converter.utils import download_utils
+from kg_converter.utils.fetch_utils import FetchError, Session
+from kg_converter.utils.transfer_utils import META_SUFFIX, PARTIAL_SUFFIX, download_file, read_meta
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """Serves FileServer.data with ETag, Range (and 416), If-Range, cutting the first `truncate` responses short"""
+    protocol_version = 'HTTP/1.1'
+    server: 'FileServer'
+
+    def do_GET(self) -> None:
+        server = self.server
+        server.requests.append(dict(self.headers))
+        etag = '"{}"'.format(hashlib.md5(server.data).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get('Range') and self.headers.get('If-Range') == etag:
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+        if start >= len(server.data) > 0:
+            self.send_response(416)
+            self.send_header('Content-Range', 'bytes */{}'.format(len(server.data)))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = server.data[start:]
+        self.send_response(206 if start else 200)
+        self.send_header('ETag', etag)
+        if start:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, len(server.data) - 1, len(server.data)))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if server.truncate > 0:
+            server.truncate -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class FileServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, data: bytes) -> None:
+        super().__init__(('127.0.0.1', 0), FileHandler)
+        self.data = data
+        self.truncate = 0
+        self.requests = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:{}/data.bin'.format(self.server_address[1])
+
+
+class TestTransferUtils(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.data = os.urandom(3 * 2 ** 20 + 7)
+        self.server = FileServer(self.data)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.output_file = os.path.join(tempfile.mkdtemp(), 'data.bin')
+        self.session = Session(backoff=0.01)
+
+    def read(self) -> bytes:
+        with open(self.output_file, 'rb') as f:
+            return f.read()
+
+    def test_download_and_revalidate(self):
+        self.assertTrue(download_file(self.server.url, self.output_file, self.session))
+        self.assertEqual(self.data, self.read())
+        self.assertFalse(os.path.exists(self.output_file + PARTIAL_SUFFIX))
+        self.assertEqual(len(self.data), read_meta(self.output_file)['size'])
+
+        # Unchanged: answered 304
+        self.assertFalse(download_file(self.server.url, self.output_file, self.session, revalidate=True))
+        self.assertIn('If-None-Match', self.server.requests[-1])
+
+        # Changed: downloaded again
+        self.server.data = self.data = os.urandom(1000)
+        self.assertTrue(download_file(self.server.url, self.output_file, self.session, revalidate=True))
+        self.assertEqual(self.data, self.read())
+
+    def test_truncated_download_resumes(self):
+        self.server.truncate = 2
+        self.assertTrue(download_file(self.server.url, self.output_file, self.session))
+        self.assertEqual(self.data, self.read())
+        self.assertEqual(3, len(self.server.requests))
+        # Each retry picks up from what was written
+        offsets = [int(headers['Range'][6:-1]) for headers in self.server.requests[1:]]
+        self.assertTrue(0 < offsets[0] < offsets[1] < len(self.data), offsets)
+        self.assertEqual(2, self.session.stats.summary()['errors'])
+
+    def test_interrupted_run_resumes(self):
+        self.server.truncate = 1
+        with self.assertRaises(FetchError):
+            download_file(self.server.url, self.output_file, Session(retries=0))
+        self.assertFalse(os.path.exists(self.output_file))
+        offset = os.path.getsize(self.output_file + PARTIAL_SUFFIX)
+        self.assertGreater(offset, 0)
+
+        self.assertTrue(download_file(self.server.url, self.output_file, self.session))
+        self.assertEqual(self.data, self.read())
+        self.assertEqual('bytes={}-'.format(offset), self.server.requests[-1]['Range'])
+
+    def test_unsatisfiable_range_starts_over(self):
+        # A partial file without a known size, as left by a response without Content-Length, already complete
+        with open(self.output_file + PARTIAL_SUFFIX, 'wb') as f:
+            f.write(self.data)
+        etag = '"{}"'.format(hashlib.md5(self.data).hexdigest())
+        with open(self.output_file + META_SUFFIX, 'w') as f:
+            json.dump({'url': self.server.url, 'partial': {'etag': etag}}, f)
+        self.assertTrue(download_file(self.server.url, self.output_file, self.session))
+        self.assertEqual(self.data, self.read())
+        self.assertEqual(['bytes={}-'.format(len(self.data)), None],
+                         [headers.get('Range') for headers in self.server.requests])
+
+    def test_checksum(self):
+        digest = hashlib.sha256(self.data).hexdigest()
+        self.assertTrue(download_file(self.server.url, self.output_file, self.session, 'sha256:' + digest.upper()))
+        with self.assertRaises(FetchError):
+            download_file(self.server.url, self.output_file + '2', self.session, 'sha256:' + '0' * 64)
+        self.assertFalse(os.path.exists(self.output_file + '2'))
+        self.assertFalse(os.path.exists(self.output_file + '2' + PARTIAL_SUFFIX))
+        with self.assertRaises(ValueError):
+            download_file(self.server.url, self.output_file, self.session, 'crc:1234')
+
+    def test_download_from_yaml(self):
+        output_dir = os.path.dirname(self.output_file)
+        yaml_file = os.path.join(output_dir, 'download.yaml')
+        with open(yaml_file, 'w') as f:
+            yaml.dump([{'url': self.server.url, 'local_name': 'data.bin',
+                        'checksum': 'md5:' + hashlib.md5(self.data).hexdigest()}], f)
+        with mock.patch.object(download_utils.transfer_utils, 'CHUNK_SIZE', 2 ** 16):
+            download_utils.download_from_yaml(yaml_file, output_dir)
+            self.assertEqual(self.data, self.read())
+            self.assertTrue(os.path.exists(self.output_file + META_SUFFIX))
+            # Cached, then revalidated
+            download_utils.download_from_yaml(yaml_file, output_dir)
+            self.assertEqual(1, len(self.server.requests))
+            download_utils.download_from_yaml(yaml_file, output_dir, sync=True)
+            self.assertEqual(2, len(self.server.requests))
+            self.assertIn('If-None-Match', self.server.requests[-1])
+            self.assertEqual(self.data, self.read())
+            # Downloaded again unconditionally
+            download_utils.download_from_yaml(yaml_file, output_dir, ignore_cache=True)
+            self.assertEqual(3, len(self.server.requests))
+            self.assertNotIn('If-None-Match', self.server.requests[-1])
+            self.assertEqual(self.data, self.read())
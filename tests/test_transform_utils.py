@@ -1,6 +1,12 @@
+import gzip
+import os
+import tempfile
 import unittest
+from unittest import mock
+
+import pandas as pd
 from parameterized import parameterized
-from kg_converter.utils.transform_utils import guess_bl_category, collapse_uniprot_curie
+from kg_converter.utils.transform_utils import guess_bl_category, collapse_uniprot_curie, NodeEdgeWriter
 
 
 class TestTransformUtils(unittest.TestCase):
@@ -23,3 +29,60 @@ class TestTransformUtils(unittest.TestCase):
     def test_collapse_uniprot_curie(self, curie, collapsed_curie):
         self.assertEqual(collapsed_curie, collapse_uniprot_curie(curie))
 
+
+class TestNodeEdgeWriter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.header = ['id', 'name', 'category']
+        self.tempdir = tempfile.mkdtemp()
+
+    def test_buffered_rows(self):
+        filename = os.path.join(self.tempdir, 'nodes.tsv')
+        with NodeEdgeWriter(filename, self.header, buffer_size=2) as writer:
+            for i in range(5):
+                writer.write(['id:{}'.format(i), 'name', 'biolink:NamedThing'])
+        with open(filename) as f:
+            lines = f.read().split('\n')
+        self.assertEqual('id\tname\tcategory', lines[0])
+        self.assertEqual('id:4\tname\tbiolink:NamedThing', lines[5])
+        self.assertEqual(7, len(lines))
+
+    def test_escapes_tabs_and_newlines(self):
+        filename = os.path.join(self.tempdir, 'nodes.tsv')
+        with NodeEdgeWriter(filename, self.header) as writer:
+            writer.write(['id:1', 'two\tlines\nname', 'biolink:NamedThing'])
+            writer.write_frame(pd.DataFrame({'id': ['id:2'], 'name': ['a\tb'], 'category': ['c']}))
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(['id:1', 'two\\tlines\\nname', 'biolink:NamedThing'], lines[1].split('\t'))
+        self.assertEqual(['id:2', 'a\\tb', 'c'], lines[2].split('\t'))
+
+    def test_wrong_column_count(self):
+        writer = NodeEdgeWriter(os.path.join(self.tempdir, 'nodes.tsv'), self.header)
+        writer.write(['id:1', 'name'])
+        with self.assertRaises(Exception):
+            writer.flush()
+
+    def test_gzip(self):
+        filename = os.path.join(self.tempdir, 'nodes.tsv.gz')
+        with NodeEdgeWriter(filename, self.header, buffer_size=1) as writer:
+            writer.write(['id:1', 'name', 'biolink:NamedThing'])
+            writer.write_lines(['id:2\tname\tbiolink:NamedThing\n'])
+        with NodeEdgeWriter(filename, self.header, mode='a') as writer:
+            writer.write(['id:3', 'name', 'biolink:NamedThing'])
+        with gzip.open(filename, 'rt') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(['id\tname\tcategory', 'id:1\tname\tbiolink:NamedThing',
+                          'id:2\tname\tbiolink:NamedThing', 'id:3\tname\tbiolink:NamedThing'], lines)
+
+    def test_gzip_error(self):
+        # More blocks than the queue holds after the compression thread fails: no write blocks, and the
+        # error comes out of the writer
+        writer = NodeEdgeWriter(os.path.join(self.tempdir, 'nodes.tsv.gz'), self.header, buffer_size=1)
+        with mock.patch.object(writer.fh, 'write', side_effect=RuntimeError('disk full')):
+            with self.assertRaisesRegex(RuntimeError, 'disk full'):
+                for i in range(20):
+                    writer.write(['id:{}'.format(i), 'name', 'biolink:NamedThing'])
+                writer.close()
+        with self.assertRaisesRegex(RuntimeError, 'disk full'):
+            writer.close()
+        self.assertFalse(writer.thread.is_alive())